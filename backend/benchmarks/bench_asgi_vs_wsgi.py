@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Side-by-side benchmark of the read endpoints under WSGI and ASGI.
+
+Starts gunicorn twice on the database in DATABASE_URL, with the same number
+of workers:
+
+  wsgi   sync workers, DRF views             (ASYNC_READ_VIEWS=False)
+  asgi   uvicorn workers, async read views   (the Procfile deployment)
+
+and drives each with 1, 8, 32... concurrent clients that loop over the
+endpoints the dashboard polls: GET warranties/, warranties/stats/,
+notifications/unread_count/ and share/<token>/. It prints throughput (also
+per worker) and p50/p99 latency per concurrency level, so you can see how
+many requests in flight one worker sustains before latency climbs.
+
+Use PostgreSQL for meaningful numbers: with SQLite the queries never wait
+on the network, which is what the async views overlap. Seed users first:
+
+    python manage.py seed_vault --users 200
+
+Usage (from backend/):
+    python benchmarks/bench_asgi_vs_wsgi.py --workers 2 --concurrency 1 8 32 64
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from loadtest import SEED_EMAIL, SEED_PASSWORD, percentile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVERS = {
+    'wsgi': (['warranty_vault.wsgi:application'], {'ASYNC_READ_VIEWS': 'False'}),
+    'asgi': (['warranty_vault.asgi:application', '-k', 'uvicorn_worker.UvicornWorker'], {'ASYNC_READ_VIEWS': 'True'}),
+}
+
+# Every client shares one IP; keep the share throttles out of the measurement
+SERVER_ENV = {
+    'DEBUG': 'False',
+    'ALLOWED_HOSTS': '127.0.0.1,localhost',
+    'THROTTLE_SHARE_IP': '1000000/min',
+    'THROTTLE_SHARE_TOKEN': '1000000/min',
+    'THROTTLE_LOGIN_IP': '100000/min',
+    'THROTTLE_LOGIN_EMAIL': '100000/min',
+    'THROTTLE_PASSWORD_HASHING': '100000/s',
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(mode, workers, port, extra_env=None):
+    args, env = SERVERS[mode]
+    process = subprocess.Popen(
+        ['gunicorn', *args, '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=BACKEND_DIR,
+        env={**os.environ, **SERVER_ENV, **env, **(extra_env or {})},
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return process
+        except requests.ConnectionError:
+            if process.poll() is not None:
+                raise SystemExit(f'{mode} server exited with {process.returncode}')
+            time.sleep(0.2)
+    process.kill()
+    raise SystemExit(f'{mode} server did not start')
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def log_in(base_url, users):
+    """An access token and share tokens for each seed user (done once, outside the timing)."""
+    sessions = []
+    for index in range(users):
+        session = requests.Session()
+        response = session.post(
+            f'{base_url}/auth/login/', json={'email': SEED_EMAIL.format(index), 'password': SEED_PASSWORD}
+        )
+        if response.status_code != 200:
+            raise SystemExit(f'Login as {SEED_EMAIL.format(index)} failed ({response.status_code}); run seed_vault first')
+        headers = {'Authorization': f'Bearer {response.json()["access"]}'}
+        rows = session.get(f'{base_url}/warranties/', headers=headers).json()['results']
+        sessions.append((headers, [row['share_token'] for row in rows]))
+    return sessions
+
+
+def run_level(base_url, identities, clients, duration, seed):
+    """Run `clients` threads for `duration` seconds; return latencies and failures by status."""
+    latencies, errors = [], Counter()
+    deadline = time.monotonic() + duration
+    paths = ('/warranties/', '/warranties/stats/', '/notifications/unread_count/', 'share')
+
+    def client(index):
+        rng = random.Random(seed * 1000 + index)
+        headers, share_tokens = identities[index % len(identities)]
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        own_latencies, own_errors = [], Counter()
+        while time.monotonic() < deadline:
+            path = rng.choice(paths)
+            if path == 'share':
+                path, request_headers = f'/share/{rng.choice(share_tokens)}/', {}
+            else:
+                request_headers = headers
+            start = time.perf_counter()
+            try:
+                status = session.get(base_url + path, headers=request_headers, timeout=30).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            own_latencies.append(time.perf_counter() - start)
+            if status != 200:
+                own_errors[str(status)] += 1
+        latencies.extend(own_latencies)
+        errors.update(own_errors)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), dict(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level')
+    parser.add_argument('--users', type=int, default=50, help='Seed users the clients log in as')
+    parser.add_argument('--modes', nargs='+', choices=sorted(SERVERS), default=['wsgi', 'asgi'])
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON')
+    options = parser.parse_args()
+
+    results = {}
+    for mode in options.modes:
+        port = free_port()
+        process = start_server(mode, options.workers, port)
+        base_url = f'http://127.0.0.1:{port}/api'
+        try:
+            identities = log_in(base_url, options.users)
+            run_level(base_url, identities, 4, 2, options.seed)  # warm-up
+            for clients in options.concurrency:
+                latencies, errors = run_level(base_url, identities, clients, options.duration, options.seed)
+                rps = len(latencies) / options.duration
+                results.setdefault(mode, {})[clients] = {
+                    'requests': len(latencies),
+                    'errors': errors,
+                    'rps': rps,
+                    'rps_per_worker': rps / options.workers,
+                    'p50_ms': percentile(latencies, 0.50) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                }
+                row = results[mode][clients]
+                print(
+                    f'{mode} c={clients:<4} {row["rps"]:8.1f} req/s ({row["rps_per_worker"]:.1f}/worker)  '
+                    f'p50 {row["p50_ms"]:7.1f} ms  p99 {row["p99_ms"]:7.1f} ms  errors {errors or "-"}',
+                    file=sys.stderr,
+                )
+        finally:
+            stop_server(process)
+
+    print(f'\n{options.workers} workers each, {options.duration:g}s per level\n')
+    print(f'{"clients":>7} ' + ''.join(
+        f'{mode + " req/s":>12} {"/worker":>8} {"p50 ms":>8} {"p99 ms":>8}  ' for mode in results
+    ))
+    for clients in options.concurrency:
+        cells = []
+        for mode in results:
+            row = results[mode][clients]
+            cells.append(
+                f'{row["rps"]:>12.1f} {row["rps_per_worker"]:>8.1f} {row["p50_ms"]:>8.1f} {row["p99_ms"]:>8.1f}  '
+            )
+        print(f'{clients:>7} ' + ''.join(cells))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'workers': options.workers, 'duration': options.duration, 'results': results}, f, indent=2)
+    return 1 if any(row['errors'] for levels in results.values() for row in levels.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+"""
+Time to first good response, cold workers against preloaded, warmed ones.
+
+Starts gunicorn (the Procfile's ASGI command, picking up gunicorn.conf.py)
+in two ways:
+
+  cold   GUNICORN_PRELOAD=False GUNICORN_WARM_UP=False: each worker loads
+         the app itself and its first requests do the lazy imports
+  warm   the defaults: loaded and warmed up once in the master, forked
+
+and measures, each on a fresh server:
+  - seconds from spawning gunicorn to the first 200 from an authenticated
+    endpoint (GET warranties/stats/), and the proportional set size (PSS)
+    of master and workers together at that point, which shows how much
+    memory the workers share;
+  - once the workers are up (--settle), the latency of the first request
+    to each endpoint the frontend calls, next to the median of the
+    following ones.
+
+Uses the database in DATABASE_URL; seed it first (`manage.py seed_vault`).
+
+Usage (from backend/):
+    python benchmarks/bench_boot.py --workers 2 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import time
+
+import requests
+
+from bench_asgi_vs_wsgi import BACKEND_DIR, SERVER_ENV, free_port, stop_server
+from common import connection  # noqa: F401 - sets up Django
+
+from rest_framework_simplejwt.tokens import RefreshToken  # noqa: E402
+from warranties.models import Warranty  # noqa: E402
+
+MODES = {
+    'cold': {'GUNICORN_PRELOAD': 'False', 'GUNICORN_WARM_UP': 'False'},
+    'warm': {'GUNICORN_PRELOAD': 'True', 'GUNICORN_WARM_UP': 'True'},
+}
+READY_PATH = '/warranties/stats/'
+
+
+def endpoints(share_token):
+    return ['/warranties/', READY_PATH, '/notifications/', '/notifications/unread_count/',
+            '/auth/profile/', f'/share/{share_token}/']
+
+
+def process_tree(pid):
+    pids, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        pids.append(current)
+        try:
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pending.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def pss_mb(pid):
+    """PSS of a process and its children in MB (Linux only; None elsewhere)."""
+    total = 0
+    for current in process_tree(pid):
+        try:
+            with open(f'/proc/{current}/smaps_rollup') as f:
+                total += next(int(line.split()[1]) for line in f if line.startswith('Pss:'))
+        except (OSError, StopIteration):
+            return None
+    return total / 1024
+
+
+def spawn(mode, workers, port):
+    return subprocess.Popen(
+        ['gunicorn', 'warranty_vault.asgi:application', '-k', 'uvicorn_worker.UvicornWorker',
+         '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env={**os.environ, **SERVER_ENV, **MODES[mode]},
+    )
+
+
+def first_ok(mode, workers, headers):
+    """Seconds from spawning the server to a 200 from READY_PATH, and the PSS then."""
+    port = free_port()
+    started = time.monotonic()
+    process = spawn(mode, workers, port)
+    try:
+        session = requests.Session()
+        while True:
+            if process.poll() is not None:
+                raise SystemExit(f'{mode} server exited with {process.returncode}')
+            try:
+                if session.get(f'http://127.0.0.1:{port}/api{READY_PATH}', headers=headers, timeout=30).ok:
+                    return time.monotonic() - started, pss_mb(process.pid)
+            except requests.ConnectionError:
+                time.sleep(0.01)
+            if time.monotonic() - started > 60:
+                raise SystemExit(f'{mode} server gave no 200 within 60s')
+    finally:
+        stop_server(process)
+
+
+def first_requests(mode, workers, headers, paths, repeats, settle):
+    """Latency of the first and (median) following requests to each path, once the workers are up."""
+    port = free_port()
+    process = spawn(mode, workers, port)
+    try:
+        time.sleep(settle)
+        if process.poll() is not None:
+            raise SystemExit(f'{mode} server exited with {process.returncode}')
+        session = requests.Session()
+        first, steady = {}, {}
+        for path in paths:
+            timings = []
+            for _ in range(repeats + 1):
+                start = time.perf_counter()
+                response = session.get(f'http://127.0.0.1:{port}/api{path}', headers=headers, timeout=30)
+                timings.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise SystemExit(f'{mode}: GET {path} returned {response.status_code}')
+            first[path], steady[path] = timings[0], statistics.median(timings[1:])
+        return first, steady
+    finally:
+        stop_server(process)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--repeat', type=int, default=3, help='Server starts per mode')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per endpoint after the first')
+    parser.add_argument('--settle', type=float, default=3,
+                        help='Seconds to let workers boot before timing first requests')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON')
+    options = parser.parse_args()
+
+    warranty = Warranty.objects.select_related('user').order_by('pk').first()
+    if warranty is None:
+        raise SystemExit('No warranties in the database; run seed_vault first')
+    headers = {'Authorization': f'Bearer {RefreshToken.for_user(warranty.user).access_token}'}
+    paths = endpoints(warranty.share_token)
+
+    results = {}
+    for mode in options.modes:
+        boots = [first_ok(mode, options.workers, headers) for _ in range(options.repeat)]
+        runs = [
+            first_requests(mode, options.workers, headers, paths, options.requests, options.settle)
+            for _ in range(options.repeat)
+        ]
+        pss = [mb for _, mb in boots if mb is not None]
+        results[mode] = {
+            'first_ok_seconds': statistics.median(seconds for seconds, _ in boots),
+            'first_ms': {path: statistics.median(first[path] for first, _ in runs) * 1000 for path in paths},
+            'steady_ms': {path: statistics.median(steady[path] for _, steady in runs) * 1000 for path in paths},
+            'pss_mb': statistics.median(pss) if pss else None,
+        }
+
+    print(f'\n{options.workers} worker(s), median of {options.repeat} starts\n')
+    print(f'{"":32}' + ''.join(f'{mode:>20}' for mode in results))
+    print(f'{"spawn to first 200 (s)":32}' + ''.join(f'{row["first_ok_seconds"]:>20.3f}' for row in results.values()))
+    print(f'{"PSS, master + workers (MB)":32}' + ''.join(
+        f'{row["pss_mb"]:>20.1f}' if row['pss_mb'] is not None else f'{"-":>20}' for row in results.values()
+    ))
+    print('\nfirst request / steady state (ms)')
+    for path in paths:
+        label = path if len(path) <= 30 else path[:27] + '...'
+        print(f'{label:32}' + ''.join(
+            f'{row["first_ms"][path]:>11.1f} / {row["steady_ms"][path]:<6.1f}' for row in results.values()
+        ))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'workers': options.workers, 'repeat': options.repeat, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
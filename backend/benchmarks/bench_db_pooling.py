@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Request latency with and without database connection reuse.
+
+Starts gunicorn against the PostgreSQL database in DATABASE_URL once per
+connection setup:
+
+  none        ASGI, a new connection per request     (DB_POOL_MAX_SIZE=0)
+  pool        ASGI, the per-process pool             (the default)
+  persistent  WSGI, persistent connections           (DB_CONN_MAX_AGE=60)
+
+and drives each with the clients of bench_asgi_vs_wsgi.py, printing
+throughput and p50/p99 latency per concurrency level. The gap between
+`none` and the others is the connection setup (TCP, TLS, authentication)
+every request pays without reuse, so run it against a database as far
+away as production's, e.g. the managed one with `?sslmode=require`.
+Seed users first:
+
+    python manage.py seed_vault --users 200
+
+Usage (from backend/):
+    DATABASE_URL=postgres://... python benchmarks/bench_db_pooling.py --concurrency 1 8 32
+"""
+import argparse
+import json
+import os
+import sys
+
+from bench_asgi_vs_wsgi import free_port, log_in, run_level, start_server, stop_server
+from loadtest import percentile
+
+SETUPS = {
+    'none': ('asgi', {'DB_POOL_MAX_SIZE': '0', 'DB_CONN_MAX_AGE': '0'}),
+    'pool': ('asgi', {'DB_CONN_MAX_AGE': '0'}),
+    'persistent': ('wsgi', {'DB_POOL_MAX_SIZE': '0', 'DB_CONN_MAX_AGE': '60'}),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level')
+    parser.add_argument('--users', type=int, default=50, help='Seed users the clients log in as')
+    parser.add_argument('--setups', nargs='+', choices=list(SETUPS), default=list(SETUPS))
+    parser.add_argument('--pool-size', type=int, default=10, help='DB_POOL_MAX_SIZE for the pool setup')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON')
+    options = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL', '').startswith(('postgres://', 'postgresql://')):
+        raise SystemExit('Set DATABASE_URL to a PostgreSQL database; connection reuse only applies there')
+
+    results = {}
+    for name in options.setups:
+        mode, env = SETUPS[name]
+        if name == 'pool':
+            env = {**env, 'DB_POOL_MAX_SIZE': str(options.pool_size)}
+        port = free_port()
+        process = start_server(mode, options.workers, port, env)
+        base_url = f'http://127.0.0.1:{port}/api'
+        try:
+            identities = log_in(base_url, options.users)
+            run_level(base_url, identities, 4, 2, options.seed)  # warm-up
+            for clients in options.concurrency:
+                latencies, errors = run_level(base_url, identities, clients, options.duration, options.seed)
+                results.setdefault(name, {})[clients] = row = {
+                    'requests': len(latencies),
+                    'errors': errors,
+                    'rps': len(latencies) / options.duration,
+                    'p50_ms': percentile(latencies, 0.50) * 1000,
+                    'p99_ms': percentile(latencies, 0.99) * 1000,
+                }
+                print(
+                    f'{name:<10} c={clients:<4} {row["rps"]:8.1f} req/s  '
+                    f'p50 {row["p50_ms"]:7.1f} ms  p99 {row["p99_ms"]:7.1f} ms  errors {errors or "-"}',
+                    file=sys.stderr,
+                )
+        finally:
+            stop_server(process)
+
+    print(f'\n{options.workers} workers each, {options.duration:g}s per level\n')
+    print(f'{"clients":>7} ' + ''.join(f'{name + " req/s":>17} {"p50 ms":>8} {"p99 ms":>8}  ' for name in results))
+    for clients in options.concurrency:
+        print(f'{clients:>7} ' + ''.join(
+            f'{results[name][clients]["rps"]:>17.1f} {results[name][clients]["p50_ms"]:>8.1f} '
+            f'{results[name][clients]["p99_ms"]:>8.1f}  '
+            for name in results
+        ))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'workers': options.workers, 'duration': options.duration, 'results': results}, f, indent=2)
+    return 1 if any(row['errors'] for levels in results.values() for row in levels.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
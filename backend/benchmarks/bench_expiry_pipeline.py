@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+"""
+Benchmark for the daily expiry sweep (check_warranties_and_notify).
+
+Seeds a throwaway database with seed_vault's generator (the alert history
+ends yesterday, so today's alerts are still due), then runs the sweep with
+the locmem email backend. For each stage it reports wall time, queries,
+query time, peak Python heap and throughput:
+
+  seed      generating and inserting the population
+  sweep     the whole check_warranties_and_notify() call, made of
+    scan      iterating active warranties and the duplicate checks
+    create    create_notification() calls
+    email     send_email_notification() calls
+
+Results are compared with the stored baseline for the same population
+(benchmarks/baselines/expiry_pipeline.json); a stage whose time, queries
+or memory grew by more than --tolerance exits non-zero.
+
+Usage (from backend/):
+    python benchmarks/bench_expiry_pipeline.py --warranties 100000
+    python benchmarks/bench_expiry_pipeline.py --warranties 1000000 --save-baseline
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date, timedelta
+from unittest import mock
+
+from common import benchmark_database
+
+from django.db import connection
+from django.test.utils import override_settings
+
+from notifications import services
+from warranties.seeding import VaultSeeder
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'expiry_pipeline.json')
+# Lower is better for these; items_per_second is compared the other way round
+COMPARED = ('seconds', 'queries', 'peak_heap_mb')
+
+
+class StageRecorder:
+    """Attributes wall time and queries to whichever stage is running."""
+
+    def __init__(self):
+        self.stages = {}
+        self.current = None
+
+    def _stage(self, name):
+        return self.stages.setdefault(name, {
+            'seconds': 0.0, 'queries': 0, 'query_seconds': 0.0, 'calls': 0, 'items': 0,
+        })
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if self.current is not None:
+                stage = self._stage(self.current)
+                stage['queries'] += 1
+                stage['query_seconds'] += time.perf_counter() - start
+
+    @contextmanager
+    def stage(self, name):
+        previous, self.current = self.current, name
+        stage = self._stage(name)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            elapsed = time.perf_counter() - start
+            stage['seconds'] += elapsed
+            stage['calls'] += 1
+            self.current = previous
+            if previous is not None:
+                # Nested stages are carved out of their parent's own time
+                self._stage(previous)['seconds'] -= elapsed
+
+    def wrap(self, name, func):
+        def wrapper(*args, **kwargs):
+            with self.stage(name) as stage:
+                result = func(*args, **kwargs)
+                stage['items'] += 1 if result else 0
+                return result
+        return wrapper
+
+
+@contextmanager
+def heap_peak(stage, enabled):
+    if enabled:
+        tracemalloc.reset_peak()
+    yield
+    if enabled:
+        stage['peak_heap_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+
+
+def run(options):
+    recorder = StageRecorder()
+    seeder = VaultSeeder(
+        seed=options.seed,
+        today=date.today() - timedelta(days=1),
+        warranties_per_user=options.per_user,
+        batch_size=options.batch_size,
+    )
+    users = max(1, options.warranties // options.per_user)
+
+    with connection.execute_wrapper(recorder):
+        with recorder.stage('seed') as stage, heap_peak(stage, options.memory):
+            seeded = seeder.run(users)
+            stage['items'] = seeded.warranties
+
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'), \
+                mock.patch.object(services, 'create_notification',
+                                  recorder.wrap('create', services.create_notification)), \
+                mock.patch.object(services, 'send_email_notification',
+                                  recorder.wrap('email', services.send_email_notification)):
+            with recorder.stage('sweep') as sweep, heap_peak(sweep, options.memory):
+                with recorder.stage('scan'):
+                    result = services.check_warranties_and_notify()
+            sweep['items'] = result['notifications_created']
+
+    stages = recorder.stages
+    stages['scan']['items'] = seeded.warranties
+    sweep_total = stages['sweep']
+    for name in ('scan', 'create', 'email'):
+        sweep_total['seconds'] += stages[name]['seconds']
+        sweep_total['queries'] += stages[name]['queries']
+        sweep_total['query_seconds'] += stages[name]['query_seconds']
+    for stage in stages.values():
+        stage['items_per_second'] = stage['items'] / stage['seconds'] if stage['seconds'] else 0.0
+    return {
+        'warranties': seeded.warranties,
+        'notifications_seeded': seeded.notifications,
+        'notifications_created': result['notifications_created'],
+        'emails_sent': result['emails_sent'],
+        'heap_tracked': options.memory,
+        'stages': {name: stages[name] for name in ('seed', 'sweep', 'scan', 'create', 'email') if name in stages},
+    }
+
+
+def print_results(results):
+    print(
+        f'{results["warranties"]} warranties, {results["notifications_seeded"]} notifications seeded; '
+        f'sweep created {results["notifications_created"]} notifications, sent {results["emails_sent"]} emails\n'
+    )
+    print(f'{"stage":10} {"seconds":>9} {"queries":>9} {"query s":>9} {"items":>9} {"items/s":>10} {"heap MB":>8}')
+    for name, stage in results['stages'].items():
+        indent = '  ' if name in ('scan', 'create', 'email') else ''
+        heap = f'{stage["peak_heap_mb"]:.1f}' if 'peak_heap_mb' in stage else '-'
+        print(
+            f'{indent + name:10} {stage["seconds"]:>9.2f} {stage["queries"]:>9} {stage["query_seconds"]:>9.2f} '
+            f'{stage["items"]:>9} {stage["items_per_second"]:>10.0f} {heap:>8}'
+        )
+
+
+def compare(results, baseline, tolerance):
+    """Print changes against the baseline; return the regressions."""
+    regressions = []
+    print(f'\nAgainst baseline ({baseline.get("recorded", "unknown date")}):')
+    compared = COMPARED + ('items_per_second',)
+    if baseline.get('heap_tracked', True) != results['heap_tracked']:
+        # tracemalloc slows everything several times over: only queries compare
+        print('  (baseline was recorded with a different --memory setting; comparing queries only)')
+        compared = ('queries',)
+    for name, stage in results['stages'].items():
+        before = baseline['stages'].get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in compared:
+            if metric not in stage or not before.get(metric):
+                continue
+            change = (stage[metric] - before[metric]) / before[metric]
+            worse = -change if metric == 'items_per_second' else change
+            changes.append(f'{metric} {change:+.0%}')
+            if worse > tolerance:
+                regressions.append(f'{name}.{metric}: {before[metric]:.3g} -> {stage[metric]:.3g}')
+        print(f'  {name:8} ' + ', '.join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--warranties', type=int, default=100000)
+    parser.add_argument('--per-user', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    parser.add_argument('--memory', action=argparse.BooleanOptionalAction, default=True,
+                        help='Track the peak Python heap per stage (tracemalloc slows everything down)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the baseline for this population size')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Allowed relative regression before failing (default 0.25)')
+    options = parser.parse_args()
+
+    if options.memory:
+        tracemalloc.start()
+    with benchmark_database():
+        results = run(options)
+    print_results(results)
+
+    baselines = {}
+    if os.path.exists(options.baseline):
+        with open(options.baseline) as f:
+            baselines = json.load(f)
+    key = str(options.warranties)
+
+    if options.save_baseline:
+        results['recorded'] = date.today().isoformat()
+        results['database'] = connection.vendor
+        baselines[key] = results
+        os.makedirs(os.path.dirname(options.baseline), exist_ok=True)
+        with open(options.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'\nBaseline for {key} warranties saved to {options.baseline}')
+        return 0
+
+    if key not in baselines:
+        print(f'\nNo baseline for {key} warranties; run with --save-baseline to record one')
+        return 0
+    regressions = compare(results, baselines[key], options.tolerance)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Rendering and compression cost of a full warranty list.
+
+Seeds one user with --count warranties in a throwaway database, serializes
+them with the list endpoint's serializer, and reports for DRF's
+JSONRenderer and FastJSONRenderer (orjson) the time to render and the size
+of the body, then the time and size of that body compressed with gzip and
+brotli as CompressionMiddleware does it.
+
+Usage (from backend/):
+    python benchmarks/bench_json_rendering.py --count 5000 --repeat 20
+"""
+import argparse
+import io
+import sys
+import time
+
+from common import benchmark_database
+
+from django.core.management import call_command  # noqa: E402
+from django.utils.text import compress_string  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from warranties.models import Warranty  # noqa: E402
+from warranties.serializers import WarrantyListSerializer  # noqa: E402
+from warranty_vault.middleware import BROTLI_QUALITY, CompressionMiddleware, brotli  # noqa: E402
+from warranty_vault.renderers import FastJSONRenderer  # noqa: E402
+
+
+def best_of(function, repeat):
+    """Return (fastest wall time, result) of `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=5000, help='Warranties in the list')
+    parser.add_argument('--repeat', type=int, default=20, help='Runs per step, best time is reported')
+    args = parser.parse_args()
+
+    with benchmark_database():
+        call_command('seed_vault', users=1, warranties_per_user=args.count, stdout=io.StringIO())
+        warranties = list(Warranty.objects.order_by('-created_at'))
+        elapsed, data = best_of(lambda: WarrantyListSerializer(warranties, many=True).data, args.repeat)
+        print(f'{len(data)} warranties, best of {args.repeat}; serializing took {elapsed * 1000:.1f} ms\n')
+
+        print(f'{"renderer":<12}{"ms":>10}{"KiB":>10}')
+        bodies = {}
+        for name, renderer in (('stdlib', JSONRenderer()), ('orjson', FastJSONRenderer())):
+            elapsed, bodies[name] = best_of(lambda: renderer.render(data), args.repeat)
+            print(f'{name:<12}{elapsed * 1000:>10.2f}{len(bodies[name]) / 1024:>10.1f}')
+        if bodies['stdlib'] != bodies['orjson']:
+            print('ERROR: the renderers produced different bodies')
+            return 1
+
+        body = bodies['orjson']
+        encoders = [('gzip', lambda: compress_string(body, max_random_bytes=CompressionMiddleware.max_random_bytes))]
+        if brotli is not None:
+            encoders.append(('br', lambda: brotli.compress(body, quality=BROTLI_QUALITY)))
+        print(f'\n{"encoding":<12}{"ms":>10}{"KiB":>10}{"ratio":>10}')
+        print(f'{"identity":<12}{0:>10.2f}{len(body) / 1024:>10.1f}{1:>10.2f}')
+        for name, encode in encoders:
+            elapsed, compressed = best_of(encode, args.repeat)
+            print(f'{name:<12}{elapsed * 1000:>10.2f}{len(compressed) / 1024:>10.1f}'
+                  f'{len(body) / len(compressed):>10.2f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""
+Warranty list serialization: model instances through WarrantyListSerializer
+against values_list() rows through WarrantyListSerializer.serialize_values.
+
+Seeds one user with --count warranties in a throwaway database and reports,
+best of --repeat, the time to fetch and serialize the whole list each way,
+and the serialization step alone. Both outputs are rendered and compared
+byte for byte first.
+
+Usage (from backend/):
+    python benchmarks/bench_list_serializer.py --count 5000 --repeat 10
+"""
+import argparse
+import io
+import sys
+import time
+
+from common import benchmark_database
+
+from django.core.management import call_command  # noqa: E402
+from rest_framework.renderers import JSONRenderer  # noqa: E402
+
+from warranties.models import Warranty  # noqa: E402
+from warranties.serializers import WarrantyListSerializer  # noqa: E402
+
+
+def best_of(function, repeat):
+    """Return the fastest wall time of `repeat` calls."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=5000, help='Warranties in the list')
+    parser.add_argument('--repeat', type=int, default=10, help='Runs per step, best time is reported')
+    args = parser.parse_args()
+
+    with benchmark_database():
+        call_command('seed_vault', users=1, warranties_per_user=args.count, stdout=io.StringIO())
+        queryset = Warranty.objects.all()
+        rows_queryset = queryset.values_list(*WarrantyListSerializer.value_fields)
+        instances, rows = list(queryset), list(rows_queryset)
+
+        renderer = JSONRenderer()
+        if renderer.render(WarrantyListSerializer(instances, many=True).data) != renderer.render(
+            WarrantyListSerializer.serialize_values(rows)
+        ):
+            print('ERROR: the two paths produced different JSON')
+            return 1
+
+        steps = {
+            'serializer': (
+                lambda: WarrantyListSerializer(list(queryset.all()), many=True).data,
+                lambda: WarrantyListSerializer(instances, many=True).data,
+            ),
+            'values': (
+                lambda: WarrantyListSerializer.serialize_values(list(rows_queryset.all())),
+                lambda: WarrantyListSerializer.serialize_values(rows),
+            ),
+        }
+        print(f'{len(rows)} warranties, best of {args.repeat}')
+        print(f'{"path":<12}{"fetch + serialize ms":>22}{"serialize ms":>14}')
+        results = {}
+        for name, (full, serialize_only) in steps.items():
+            results[name] = best_of(full, args.repeat), best_of(serialize_only, args.repeat)
+            print(f'{name:<12}{results[name][0] * 1000:>22.1f}{results[name][1] * 1000:>14.1f}')
+        print(f'speedup: {results["serializer"][0] / results["values"][0]:.1f}x with the query, '
+              f'{results["serializer"][1] / results["values"][1]:.1f}x serializing alone')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
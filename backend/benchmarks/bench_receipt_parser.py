@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Throughput benchmark for receipt field extraction.
+
+Compares the reference parsers (ReceiptTextParser) with the single-scan
+CompiledReceiptParser on the regression corpus plus generated receipts.
+
+Usage (from backend/):
+    python benchmarks/bench_receipt_parser.py --count 5000 --repeat 5
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'warranty_vault.settings')
+
+from warranties.receipt_parser import CompiledReceiptParser, ReceiptTextParser  # noqa: E402
+from warranties.tests import RECEIPT_CORPUS, generate_receipts  # noqa: E402
+
+
+def best_of(parser, receipts, repeat):
+    """Return the fastest wall time of `repeat` runs over all receipts."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in receipts:
+            parser.extract(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=5000, help='Number of generated receipts')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per parser, best time is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    receipts = RECEIPT_CORPUS + generate_receipts(args.count, seed=args.seed)
+    total_chars = sum(len(text) for text in receipts)
+    reference = ReceiptTextParser()
+    compiled = CompiledReceiptParser()
+
+    mismatches = sum(1 for text in receipts if reference.extract(text) != compiled.extract(text))
+    if mismatches:
+        print(f'ERROR: {mismatches} receipts differ between parsers')
+        return 1
+
+    print(f'{len(receipts)} receipts, {total_chars / 1024:.0f} KiB of text, best of {args.repeat}')
+    print(f'{"parser":<12}{"seconds":>10}{"receipts/s":>14}{"MiB/s":>10}')
+    results = {}
+    for name, instance in (('reference', reference), ('compiled', compiled)):
+        elapsed = best_of(instance, receipts, args.repeat)
+        results[name] = elapsed
+        print(f'{name:<12}{elapsed:>10.3f}{len(receipts) / elapsed:>14,.0f}'
+              f'{total_chars / elapsed / 2 ** 20:>10.2f}')
+    print(f'speedup: {results["reference"] / results["compiled"]:.2f}x')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
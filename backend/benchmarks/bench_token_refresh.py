@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+"""
+Throughput benchmark for POST /api/auth/token/refresh/.
+
+Fills the revoked token table, then refreshes fresh tokens through the real
+view with three revocation checks:
+
+  none   - no revocation check (the old behaviour)
+  table  - look the jti up in the table on every refresh, then insert it
+           (what enabling the stock token_blacklist app amounts to)
+  bloom  - users.revocation.RevocationStore (filter first, table on hits)
+
+Usage (from backend/):
+    python benchmarks/bench_token_refresh.py --revoked 200000 --requests 2000
+"""
+import argparse
+import time
+from datetime import timedelta
+from unittest import mock
+from uuid import uuid4
+
+from common import benchmark_database
+
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users import views
+from users.models import RevokedToken, User
+from users.revocation import RevocationStore
+
+
+class NoRevocation:
+    def is_revoked(self, jti):
+        return False
+
+    def revoke(self, jti, expires_at):
+        return True
+
+
+class TableRevocation(RevocationStore):
+    def is_revoked(self, jti):
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def populate(count):
+    expires_at = timezone.now() + timedelta(days=7)
+    batch = []
+    for _ in range(count):
+        batch.append(RevokedToken(jti=uuid4().hex, expires_at=expires_at))
+        if len(batch) == 10_000:
+            RevokedToken.objects.bulk_create(batch)
+            batch = []
+    RevokedToken.objects.bulk_create(batch)
+
+
+def run(store, tokens):
+    client = APIClient()
+    with mock.patch.object(views, 'revocation_store', store):
+        client.post('/api/auth/token/refresh/', {'refresh': tokens[0]}, format='json')
+        start = time.perf_counter()
+        for token in tokens[1:]:
+            response = client.post('/api/auth/token/refresh/', {'refresh': token}, format='json')
+            assert response.status_code == 200, response.content
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--revoked', type=int, default=200_000, help='rows preloaded into revoked_tokens')
+    parser.add_argument('--requests', type=int, default=2000, help='refreshes per strategy')
+    args = parser.parse_args()
+
+    with benchmark_database():
+        user = User.objects.create_user(email='bench@example.com', name='Bench', password='pass12345')
+        populate(args.revoked)
+        print(f'revoked rows: {RevokedToken.objects.count()}, refreshes per strategy: {args.requests}')
+
+        strategies = [
+            ('none', NoRevocation()),
+            ('table', TableRevocation()),
+            ('bloom', RevocationStore(capacity=args.revoked * 2)),
+        ]
+        for name, store in strategies:
+            tokens = [str(RefreshToken.for_user(user)) for _ in range(args.requests + 1)]
+            elapsed = run(store, tokens)
+            print(f'{name:>6}: {args.requests / elapsed:8.0f} refresh/s  ({elapsed * 1000 / args.requests:.3f} ms each)')
+
+        # The revocation check alone, for tokens that were never revoked
+        jtis = [uuid4().hex for _ in range(args.requests * 10)]
+        for name, store in strategies[1:]:
+            store.is_revoked(jtis[0])
+            start = time.perf_counter()
+            for jti in jtis:
+                store.is_revoked(jti)
+            elapsed = time.perf_counter() - start
+            print(f'{name:>6}: {len(jtis) / elapsed:8.0f} checks/s   (is_revoked only)')
+
+
+if __name__ == '__main__':
+    main()
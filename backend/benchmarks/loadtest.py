@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+"""
+Load test a running server with the frontend's request flows.
+
+Each simulated client logs in as one seed_vault user (one thread and one
+keep-alive connection per client) and then loops over the flows the
+frontend runs, picked at random with these weights:
+
+  dashboard      GET warranties/stats/ + GET warranties/      (Dashboard.jsx)
+  notifications  GET notifications/ + GET unread_count/       (NotificationBell.jsx)
+  poll           GET notifications/changes/?since=            (delta sync)
+  share          GET share/<token>/ without credentials       (PublicWarrantyView.jsx)
+  add warranty   POST warranties/
+
+It prints throughput and p50/p95/p99 latency per endpoint, and with
+--json writes the same numbers for comparing runs.
+
+Seed users first and raise the rate limits of the server under test, which
+sees every client on one IP:
+
+    python manage.py seed_vault --users 1000
+    THROTTLE_LOGIN_IP=100000/min THROTTLE_LOGIN_EMAIL=1000/min \\
+    THROTTLE_PASSWORD_HASHING=1000/s THROTTLE_SHARE_IP=1000000/min \\
+    THROTTLE_SHARE_TOKEN=1000000/min \\
+        gunicorn warranty_vault.asgi:application -k uvicorn_worker.UvicornWorker -w 4
+
+Usage (from backend/):
+    python benchmarks/loadtest.py --clients 50 --duration 60
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SEED_EMAIL = 'seed{}@seed.warrantyvault.test'
+SEED_PASSWORD = 'seed-password'
+
+FLOWS = (
+    ('dashboard', 35),
+    ('notifications', 20),
+    ('poll', 25),
+    ('share', 12),
+    ('add_warranty', 8),
+)
+
+
+class Stats:
+    """Latencies and status codes per endpoint for one client (merged at the end)."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, endpoint, seconds, status):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def merge(self, other):
+        for endpoint, latencies in other.latencies.items():
+            self.latencies[endpoint].extend(latencies)
+        for endpoint, statuses in other.statuses.items():
+            self.statuses[endpoint].update(statuses)
+
+
+class Client(threading.Thread):
+    def __init__(self, index, options, deadline, start_delay):
+        super().__init__(daemon=True)
+        self.index = index
+        self.options = options
+        self.deadline = deadline
+        self.start_delay = start_delay
+        self.base_url = options.base_url.rstrip('/') + '/api'
+        self.rng = random.Random(options.seed * 100003 + index)
+        self.stats = Stats()
+        self.session = requests.Session()
+        self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        self.headers = {}
+        self.share_tokens = []
+        self.since = None
+        self.error = None
+
+    def call(self, method, path, endpoint, authenticated=True, **kwargs):
+        headers = self.headers if authenticated else {}
+        start = time.perf_counter()
+        try:
+            response = self.session.request(
+                method, self.base_url + path, headers=headers, timeout=self.options.timeout, **kwargs
+            )
+            status = response.status_code
+        except requests.RequestException as e:
+            response, status = None, type(e).__name__
+        self.stats.record(endpoint, time.perf_counter() - start, status)
+        return response
+
+    def login(self):
+        email = SEED_EMAIL.format(self.index % self.options.users)
+        while time.monotonic() < self.deadline:
+            response = self.call(
+                'POST', '/auth/login/', 'POST auth/login/', authenticated=False,
+                json={'email': email, 'password': SEED_PASSWORD}
+            )
+            if response is not None and response.status_code == 200:
+                self.headers = {'Authorization': f'Bearer {response.json()["access"]}'}
+                return True
+            if response is not None and response.status_code in (429, 503):
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+                continue
+            self.error = f'login as {email} failed: {response.status_code if response is not None else "no response"}'
+            return False
+        return False
+
+    def dashboard(self):
+        self.call('GET', '/warranties/stats/', 'GET warranties/stats/')
+        response = self.call('GET', '/warranties/', 'GET warranties/')
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            rows = data['results'] if isinstance(data, dict) else data
+            self.share_tokens = [row['share_token'] for row in rows if row.get('share_token')]
+
+    def notifications(self):
+        self.call('GET', '/notifications/', 'GET notifications/')
+        self.call('GET', '/notifications/unread_count/', 'GET notifications/unread_count/')
+
+    def poll(self):
+        params = {} if self.since is None else {'since': self.since}
+        response = self.call('GET', '/notifications/changes/', 'GET notifications/changes/', params=params)
+        if response is None:
+            return
+        if response.status_code == 200:
+            self.since = response.json()['since']
+        elif response.status_code == 410:
+            self.since = None
+
+    def share(self):
+        if not self.share_tokens:
+            self.dashboard()
+        if self.share_tokens:
+            token = self.rng.choice(self.share_tokens)
+            self.call('GET', f'/share/{token}/', 'GET share/<token>/', authenticated=False)
+
+    def add_warranty(self):
+        self.call('POST', '/warranties/', 'POST warranties/', json={
+            'product_name': f'Load test item {self.rng.randrange(10 ** 6)}',
+            'brand': self.rng.choice(['Sony', 'Bosch', 'Apple', 'IKEA']),
+            'category': self.rng.choice(['Electronics', 'Home Appliances', 'Furniture']),
+            'purchase_date': date.today().isoformat(),
+            'warranty_period': self.rng.choice([12, 24]),
+        })
+
+    def run(self):
+        time.sleep(self.start_delay)
+        if not self.login():
+            return
+        self.dashboard()
+        flows = [getattr(self, name) for name, _ in FLOWS]
+        weights = [weight for _, weight in FLOWS]
+        while time.monotonic() < self.deadline:
+            self.rng.choices(flows, weights)[0]()
+            if self.options.think:
+                time.sleep(self.rng.expovariate(1 / self.options.think))
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(sorted_values) - 1, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(stats, elapsed):
+    summary = {}
+    for endpoint in sorted(stats.latencies):
+        latencies = sorted(stats.latencies[endpoint])
+        statuses = stats.statuses[endpoint]
+        summary[endpoint] = {
+            'requests': len(latencies),
+            'rps': len(latencies) / elapsed,
+            'errors': sum(count for status, count in statuses.items() if not (isinstance(status, int) and status < 400)),
+            'statuses': {str(status): count for status, count in statuses.items()},
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'max_ms': latencies[-1] * 1000,
+        }
+    return summary
+
+
+def print_summary(summary, elapsed, clients):
+    total = sum(row['requests'] for row in summary.values())
+    print(f'\n{clients} clients, {elapsed:.1f}s, {total} requests, {total / elapsed:.1f} req/s\n')
+    print(f'{"endpoint":34} {"reqs":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}  errors')
+    for endpoint, row in summary.items():
+        errors = ', '.join(f'{status}x{count}' for status, count in row['statuses'].items()
+                           if not (status.isdigit() and int(status) < 400))
+        print(
+            f'{endpoint:34} {row["requests"]:>7} {row["rps"]:>8.1f} {row["p50_ms"]:>8.1f} '
+            f'{row["p95_ms"]:>8.1f} {row["p99_ms"]:>8.1f} {row["max_ms"]:>8.1f}  {errors or "-"}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+    parser.add_argument('--clients', type=int, default=20, help='Concurrent simulated users')
+    parser.add_argument('--users', type=int, default=1000, help='Seed users to log in as (seed0..seedN-1)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds, including ramp-up')
+    parser.add_argument('--ramp', type=float, default=5, help='Seconds over which clients start')
+    parser.add_argument('--think', type=float, default=0, help='Mean pause between flows, in seconds')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', metavar='PATH', help='Also write the summary as JSON')
+    options = parser.parse_args()
+
+    started = time.monotonic()
+    deadline = started + options.duration
+    clients = [
+        Client(index, options, deadline, options.ramp * index / options.clients)
+        for index in range(options.clients)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - started
+
+    failures = [client.error for client in clients if client.error]
+    for failure in sorted(set(failures))[:5]:
+        print(f'client error: {failure}', file=sys.stderr)
+
+    stats = Stats()
+    for client in clients:
+        stats.merge(client.stats)
+    summary = summarize(stats, elapsed)
+    if not summary:
+        print('No requests completed; is the server running?', file=sys.stderr)
+        return 1
+    print_summary(summary, elapsed, options.clients)
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'clients': options.clients, 'seconds': elapsed, 'endpoints': summary}, f, indent=2)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
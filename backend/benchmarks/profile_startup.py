@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+"""
+Where a worker's startup time goes, from `python -X importtime`.
+
+Runs a fresh interpreter that imports the ASGI application (what gunicorn
+loads) and then runs the warm-up, and summarizes both phases: total import
+time, the packages and the single modules that cost the most. The second
+phase is what first requests used to import on their own.
+
+Usage (from backend/):
+    python benchmarks/profile_startup.py --top 15
+    python benchmarks/profile_startup.py --app warranty_vault.wsgi --json startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASE_MARKER = '--- warm-up ---'
+
+SCRIPT = f"""
+import sys
+import {{app}}
+sys.stderr.write({PHASE_MARKER!r} + '\\n')
+from warranty_vault.warmup import warm_up
+warm_up()
+"""
+
+
+def run_importtime(app):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', SCRIPT.format(app=app)],
+        cwd=BACKEND_DIR, env={'DJANGO_SETTINGS_MODULE': 'warranty_vault.settings', **os.environ},
+        capture_output=True, text=True,
+    )
+    if result.returncode:
+        raise SystemExit(result.stderr[-2000:])
+    return result.stderr.splitlines()
+
+
+def parse(lines):
+    """{phase: [(module, self_us, cumulative_us)]} from importtime's stderr."""
+    phases, phase = {'boot': [], 'warm-up': []}, 'boot'
+    for line in lines:
+        if line == PHASE_MARKER:
+            phase = 'warm-up'
+            continue
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        phases[phase].append((name.strip(), int(own), int(cumulative)))
+    return phases
+
+
+def summarize(rows, top):
+    by_package = defaultdict(int)
+    for name, own, _ in rows:
+        by_package[name.split('.')[0]] += own
+    return {
+        'modules': len(rows),
+        'total_ms': sum(own for _, own, _ in rows) / 1000,
+        'packages': [
+            {'package': package, 'ms': own / 1000}
+            for package, own in sorted(by_package.items(), key=lambda item: -item[1])[:top]
+        ],
+        'slowest_modules': [
+            {'module': name, 'self_ms': own / 1000, 'cumulative_ms': cumulative / 1000}
+            for name, own, cumulative in sorted(rows, key=lambda row: -row[1])[:top]
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', default='warranty_vault.asgi', help='Module gunicorn loads')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--json', metavar='PATH', help='Also write the summary as JSON')
+    options = parser.parse_args()
+
+    summary = {phase: summarize(rows, options.top) for phase, rows in parse(run_importtime(options.app)).items()}
+    for phase, data in summary.items():
+        print(f'\n{phase}: {data["modules"]} modules, {data["total_ms"]:.1f} ms importing')
+        print('  by package: ' + ', '.join(f'{row["package"]} {row["ms"]:.1f}' for row in data['packages']))
+        for row in data['slowest_modules']:
+            print(f'  {row["self_ms"]:8.1f} ms self {row["cumulative_ms"]:8.1f} ms cumulative  {row["module"]}')
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
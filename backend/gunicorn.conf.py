@@ -0,0 +1,62 @@
+"""
+Gunicorn settings; read from backend/, where every start command runs.
+
+The app is loaded once in the master (preload_app) and warmed up there
+(warranty_vault/warmup.py), so workers fork with Django, DRF, every view
+and serializer, compiled templates and URL patterns already in memory and
+answer their first request as fast as their hundredth. Garbage collection
+is paused while loading and everything loaded is frozen before forking
+(gc.freeze), so the workers' collections don't write to those pages and
+they stay shared copy-on-write. Each worker then opens its own database
+connection before taking traffic.
+
+GUNICORN_PRELOAD=False loads the app in each worker instead (code changes
+are then picked up by a HUP reload); GUNICORN_WARM_UP=False skips the
+warm-up. `python benchmarks/bench_boot.py` compares the two.
+"""
+
+import gc
+import time
+
+import decouple
+
+
+preload_app = decouple.config('GUNICORN_PRELOAD', default=True, cast=bool)
+warm_up_enabled = decouple.config('GUNICORN_WARM_UP', default=True, cast=bool)
+
+if preload_app:
+    gc.disable()
+
+
+def _warm_up(log):
+    from warranty_vault.warmup import warm_up
+
+    start = time.perf_counter()
+    stages = warm_up()
+    log.info(
+        'Warmed up in %.0f ms (%s)', (time.perf_counter() - start) * 1000,
+        ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in stages.items()),
+    )
+
+
+def when_ready(server):
+    # Master, app already loaded when preloading; runs before the first fork
+    if preload_app:
+        if warm_up_enabled:
+            _warm_up(server.log)
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+
+
+def post_worker_init(worker):
+    if not warm_up_enabled:
+        return
+    if not preload_app:
+        _warm_up(worker.log)
+    from warranty_vault.warmup import warm_up_database
+
+    warm_up_database()
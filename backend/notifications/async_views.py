@@ -0,0 +1,15 @@
+"""
+Async (ASGI) version of the notification bell's unread count endpoint.
+
+Routed instead of NotificationViewSet.unread_count when ASYNC_READ_VIEWS
+is on; see warranty_vault.async_api.
+"""
+
+from warranty_vault.async_api import async_api_view
+from .counters import aget_unread_count
+
+
+@async_api_view()
+async def unread_count(request):
+    """GET notifications/unread_count/"""
+    return {'count': await aget_unread_count(request.user.pk)}
@@ -0,0 +1,94 @@
+"""
+Per-user unread notification counters.
+
+Every path that changes a notification's read state adjusts the user's
+UnreadCounter row with an F() expression, so `/unread_count/` is a
+primary-key read instead of a COUNT over the user's notifications.
+"""
+
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Notification, UnreadCounter
+
+
+def adjust_unread_count(user_id, delta):
+    """
+    Atomically add `delta` to the user's counter.
+
+    A missing row is left missing: get_unread_count() creates it from a
+    real count on first read. That also keeps a user deletion (which
+    cascades to both tables) from re-creating the row.
+    """
+    if delta:
+        UnreadCounter.objects.filter(user_id=user_id).update(unread=F('unread') + delta)
+
+
+def get_unread_count(user_id):
+    """Return the user's unread count, creating the counter row if needed."""
+    unread = UnreadCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+    if unread is not None:
+        return unread
+
+    # Insert the row before counting, not after: an adjustment made between
+    # a COUNT and the insert would find no row and be lost. Adjustments
+    # committed after the row apply on top of the count. One committing
+    # while the row is being created can still be missed (its UPDATE doesn't
+    # see the uncommitted row, nor the COUNT its change); that drift is left
+    # to repair_unread_counters.
+    with transaction.atomic():
+        counter, created = UnreadCounter.objects.select_for_update().get_or_create(
+            user_id=user_id, defaults={'unread': 0}
+        )
+        if not created:
+            return counter.unread
+        unread_notifications = (
+            Notification.objects.filter(user_id=OuterRef('user_id'), is_read=False)
+            .order_by().values('user_id').annotate(count=Count('id')).values('count')
+        )
+        UnreadCounter.objects.filter(pk=counter.pk).update(unread=Coalesce(Subquery(unread_notifications), 0))
+        return UnreadCounter.objects.values_list('unread', flat=True).get(pk=counter.pk)
+
+
+async def aget_unread_count(user_id):
+    """Async get_unread_count(); a missing counter row is created by the sync version."""
+    unread = await UnreadCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).afirst()
+    if unread is not None:
+        return unread
+    return await sync_to_async(get_unread_count)(user_id)
+
+
+def get_unread_counts(user_ids):
+    """Return {user_id: unread} for users that have a counter row."""
+    return dict(UnreadCounter.objects.filter(user_id__in=user_ids).values_list('user_id', 'unread'))
+
+
+def repair_unread_counters(user_ids, batch_size=1000):
+    """
+    Recompute counters from the notifications table for the given user ids.
+
+    Returns the number of counters whose stored value was wrong.
+    """
+    user_ids = list(user_ids)
+    repaired = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        actual = dict(
+            Notification.objects.filter(user_id__in=batch, is_read=False)
+            .values('user_id').annotate(count=Count('id')).order_by()
+            .values_list('user_id', 'count')
+        )
+        stored = get_unread_counts(batch)
+        wrong = [
+            UnreadCounter(user_id=user_id, unread=actual.get(user_id, 0))
+            for user_id in batch
+            if stored.get(user_id) != actual.get(user_id, 0)
+        ]
+        if wrong:
+            UnreadCounter.objects.bulk_create(
+                wrong, update_conflicts=True, unique_fields=['user'], update_fields=['unread']
+            )
+        repaired += sum(1 for counter in wrong if counter.user_id in stored)
+    return repaired
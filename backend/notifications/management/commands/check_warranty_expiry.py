@@ -1,15 +1,41 @@
+import json
+from datetime import datetime, timezone
+
 from django.core.management.base import BaseCommand
 from notifications.services import check_warranties_and_notify
+from notifications.tracing import SweepTrace, tracing
 
 
 class Command(BaseCommand):
     help = 'Check warranties and send notifications for expiring warranties'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--report', choices=('text', 'json'),
+                            help='Time each stage of the sweep and print a report '
+                                 '(json prints only the report, for monitoring)')
+        parser.add_argument('--slowest', type=int, default=5,
+                            help='Slowest items listed per stage in the report')
+
     def handle(self, *args, **options):
-        self.stdout.write('Checking warranties for expiry notifications...')
-        
-        result = check_warranties_and_notify()
-        
+        report = options['report']
+        if report != 'json':
+            self.stdout.write('Checking warranties for expiry notifications...')
+
+        if report:
+            started_at = datetime.now(timezone.utc)
+            with tracing(SweepTrace(keep_slowest=options['slowest'])) as trace:
+                result = check_warranties_and_notify()
+        else:
+            result = check_warranties_and_notify()
+
+        if report == 'json':
+            self.stdout.write(json.dumps({
+                'started_at': started_at.isoformat(),
+                **result,
+                **trace.as_dict(),
+            }))
+            return
+
         self.stdout.write(
             self.style.SUCCESS(
                 f'[SUCCESS] Notifications created: {result["notifications_created"]}'
@@ -20,8 +46,26 @@ class Command(BaseCommand):
                 f'[SUCCESS] Emails sent: {result["emails_sent"]}'
             )
         )
-        
+
         if result["notifications_created"] == 0:
             self.stdout.write(
                 self.style.WARNING('No warranties require notifications at this time.')
             )
+
+        if report == 'text':
+            self.write_text_report(trace)
+
+    def write_text_report(self, trace):
+        self.stdout.write(f'\nSweep took {trace.duration:.3f}s')
+        self.stdout.write(
+            f'{"stage":16} {"count":>8} {"total s":>9} {"own s":>9} {"mean ms":>9} {"max ms":>9}  slowest'
+        )
+        for name, stats in sorted(trace.spans.items(), key=lambda pair: -pair[1].total):
+            data = stats.as_dict()
+            slowest = ', '.join(
+                f'{entry["item"]} ({entry["seconds"] * 1000:.1f}ms)' for entry in data['slowest']
+            )
+            self.stdout.write(
+                f'{name:16} {data["count"]:>8} {data["total_seconds"]:>9.3f} {data["own_seconds"]:>9.3f} '
+                f'{data["mean_seconds"] * 1000:>9.2f} {data["max_seconds"] * 1000:>9.2f}  {slowest or "-"}'
+            )
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from notifications.models import Notification, NotificationChange
+from notifications.retention import purge_change_log, purge_notifications, table_size
+
+
+def format_bytes(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024
+
+
+class Command(BaseCommand):
+    help = 'Delete notifications and change log rows outside the retention policy, in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--read-days', type=int, default=settings.NOTIFICATION_RETENTION_READ_DAYS,
+                            help='Delete read notifications created more than this many days ago')
+        parser.add_argument('--expired-warranty-days', type=int,
+                            default=settings.NOTIFICATION_RETENTION_EXPIRED_WARRANTY_DAYS,
+                            help='Delete notifications of warranties expired more than this many days ago')
+        parser.add_argument('--change-log-days', type=int, default=settings.NOTIFICATION_CHANGE_LOG_RETENTION_DAYS,
+                            help='Delete delta sync log rows older than this many days')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.1,
+                            help='Seconds to sleep between batches')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count what would be deleted')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='VACUUM ANALYZE both tables afterwards (PostgreSQL)')
+
+    def handle(self, *args, **options):
+        for name in ('read_days', 'expired_warranty_days', 'change_log_days'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be at least 1')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        tables = (Notification, NotificationChange)
+        size_before = {model: table_size(model) for model in tables}
+
+        notifications = purge_notifications(
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+            read_days=options['read_days'],
+            expired_warranty_days=options['expired_warranty_days'],
+        )
+        changes = purge_change_log(
+            days=options['change_log_days'],
+            batch_size=options['batch_size'] * 10,
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+
+        if options['vacuum'] and not options['dry_run'] and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for model in tables:
+                    cursor.execute(f'VACUUM ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        for model, result in ((Notification, notifications), (NotificationChange, changes)):
+            line = (
+                f'{verb} {result.rows} rows from {model._meta.db_table} '
+                f'in {result.batches} batches, {format_bytes(result.bytes)} of row data'
+            )
+            before, after = size_before[model], table_size(model)
+            if before is not None and after is not None:
+                line += f' (table and indexes: {format_bytes(before)} -> {format_bytes(after)})'
+            self.stdout.write(line)
+
+        verb = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[SUCCESS] {verb} {notifications.rows + changes.rows} rows, '
+                f'{format_bytes(notifications.bytes + changes.bytes)}'
+            )
+        )
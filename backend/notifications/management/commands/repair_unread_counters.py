@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from notifications.counters import repair_unread_counters
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized unread notification counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only repair this user id (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = options['user_ids']
+        if not user_ids:
+            user_ids = get_user_model().objects.order_by('pk').values_list('pk', flat=True)
+        
+        repaired = repair_unread_counters(user_ids, batch_size=options['batch_size'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'[SUCCESS] Unread counters corrected: {repaired}')
+        )
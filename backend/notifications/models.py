@@ -45,3 +45,63 @@ class Notification(models.Model):
     
     def __str__(self):
         return f"{self.user.email} - {self.title}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored read state so signals can tell what a save changed
+        instance._loaded_is_read = instance.__dict__.get('is_read')
+        return instance
+
+
+class NotificationChange(models.Model):
+    """
+    Append-only log of notification changes, one row per create, update or
+    delete. The auto-increment id is the watermark for delta sync
+    (`/api/notifications/changes/?since=<id>`).
+    """
+    
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='notification_changes',
+        db_index=False
+    )
+    notification_id = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'notification_changes'
+        verbose_name = 'Notification Change'
+        verbose_name_plural = 'Notification Changes'
+        indexes = [
+            # Covers the delta query: user_id = ? AND id > ?, reading notification_id
+            models.Index(fields=['user', 'id', 'notification_id'], name='notif_change_user_id_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} - {self.notification_id} (#{self.pk})"
+
+
+class UnreadCounter(models.Model):
+    """
+    Denormalized count of a user's unread notifications, kept in step with
+    F() updates (see notifications.services.adjust_unread_count). Created
+    from a real count on first read; `repair_unread_counters` recomputes it.
+    """
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    unread = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'notification_unread_counters'
+        verbose_name = 'Unread Counter'
+        verbose_name_plural = 'Unread Counters'
+    
+    def __str__(self):
+        return f"{self.user_id}: {self.unread}"
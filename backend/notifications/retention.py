@@ -0,0 +1,156 @@
+"""
+Retention policy for the notifications tables.
+
+Notifications are deleted when they were read more than
+NOTIFICATION_RETENTION_READ_DAYS ago (by creation time) or belong to a
+warranty that expired more than NOTIFICATION_RETENTION_EXPIRED_WARRANTY_DAYS
+ago; notifications of deleted warranties already go with them (CASCADE).
+The expiry sweep only looks at warranties expiring today or later, so none
+of these are ever re-created.
+
+Rows are removed in keyset batches by primary key, each in its own short
+transaction, so a run never holds long locks or a long-running DELETE.
+Unread counters are adjusted and tombstones logged per batch, exactly as a
+user's own delete would.
+
+The change log (notification_changes) is only needed by clients syncing
+from an old watermark, so rows older than NOTIFICATION_CHANGE_LOG_RETENTION_DAYS
+are dropped too. The newest row is always kept, which lets
+is_watermark_expired() tell a client that its watermark predates the
+retained log and that it must do a full sync.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max, Min, Q, Sum
+from django.db.models.functions import Length
+from django.utils import timezone
+
+from .models import Notification, NotificationChange
+from .services import delete_notifications
+
+
+# Fixed-width columns and tuple header, for the size estimate on databases
+# that cannot measure a row (everything but PostgreSQL)
+ESTIMATED_ROW_OVERHEAD = 64
+ESTIMATED_CHANGE_ROW_BYTES = 48
+
+
+@dataclass
+class PurgeResult:
+    rows: int = 0
+    bytes: int = 0
+    batches: int = 0
+
+    def add(self, rows, size):
+        self.rows += rows
+        self.bytes += size
+        self.batches += 1
+
+
+def retention_filter(read_days=None, expired_warranty_days=None, now=None):
+    """Q() matching the notifications the retention policy removes."""
+    now = now or timezone.now()
+    if read_days is None:
+        read_days = settings.NOTIFICATION_RETENTION_READ_DAYS
+    if expired_warranty_days is None:
+        expired_warranty_days = settings.NOTIFICATION_RETENTION_EXPIRED_WARRANTY_DAYS
+    return (
+        Q(is_read=True, created_at__lt=now - timedelta(days=read_days))
+        | Q(warranty__expiry_date__lt=(now - timedelta(days=expired_warranty_days)).date())
+    )
+
+
+def measure_rows(model, ids):
+    """Return the bytes taken by these rows (table data only, not indexes)."""
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COALESCE(SUM(pg_column_size(t.*)), 0) FROM {connection.ops.quote_name(table)} t '
+                'WHERE t.id = ANY(%s)',
+                [list(ids)]
+            )
+            return cursor.fetchone()[0]
+    if model is Notification:
+        sizes = Notification.objects.filter(id__in=ids).aggregate(
+            title=Sum(Length('title')), message=Sum(Length('message'))
+        )
+        return (sizes['title'] or 0) + (sizes['message'] or 0) + ESTIMATED_ROW_OVERHEAD * len(ids)
+    return ESTIMATED_CHANGE_ROW_BYTES * len(ids)
+
+
+def purge_notifications(batch_size=500, pause=0.1, dry_run=False, measure=True, **policy):
+    """Delete notifications outside the retention policy; returns a PurgeResult."""
+    candidates = Notification.objects.filter(retention_filter(**policy)).order_by('id')
+    result = PurgeResult()
+    last_id = 0
+    while True:
+        rows = list(candidates.filter(id__gt=last_id).values_list('id', 'user_id', 'is_read')[:batch_size])
+        if not rows:
+            return result
+        last_id = rows[-1][0]
+        ids = [row[0] for row in rows]
+        size = measure_rows(Notification, ids) if measure else 0
+        result.add(len(rows) if dry_run else delete_notifications(rows), size)
+        if len(rows) < batch_size:
+            return result
+        if pause and not dry_run:
+            time.sleep(pause)
+
+
+def purge_change_log(days=None, batch_size=5000, pause=0.1, dry_run=False, measure=True, now=None):
+    """Drop change log rows older than `days`, always keeping the newest one."""
+    if days is None:
+        days = settings.NOTIFICATION_CHANGE_LOG_RETENTION_DAYS
+    cutoff = (now or timezone.now()) - timedelta(days=days)
+    newest = NotificationChange.objects.aggregate(last=Max('id'))['last']
+    result = PurgeResult()
+    if newest is None:
+        return result
+    candidates = NotificationChange.objects.filter(id__lt=newest, created_at__lt=cutoff).order_by('id')
+    last_id = 0
+    while True:
+        ids = list(candidates.filter(id__gt=last_id).values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return result
+        last_id = ids[-1]
+        size = measure_rows(NotificationChange, ids) if measure else 0
+        if not dry_run:
+            NotificationChange.objects.filter(id__in=ids).delete()
+        result.add(len(ids), size)
+        if len(ids) < batch_size:
+            return result
+        if pause and not dry_run:
+            time.sleep(pause)
+
+
+def is_watermark_expired(since):
+    """
+    True when change ids after `since` may have been purged, so a delta
+    from it could miss deletions. An index-only MIN() on the primary key.
+    """
+    oldest = NotificationChange.objects.aggregate(first=Min('id'))['first']
+    return oldest is not None and since + 1 < oldest
+
+
+def table_size(model):
+    """Total on-disk size of the table and its indexes, or None if unknown."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                'SELECT data_length + index_length FROM information_schema.tables '
+                'WHERE table_schema = DATABASE() AND table_name = %s',
+                [table]
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+    return None
@@ -1,3 +1,5 @@
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Notification
 
@@ -21,22 +23,55 @@ class NotificationSerializer(serializers.ModelSerializer):
     
     def get_time_ago(self, obj):
         """Get human-readable time ago."""
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        now = timezone.now()
-        diff = now - obj.created_at
-        
-        if diff < timedelta(minutes=1):
-            return 'Just now'
-        elif diff < timedelta(hours=1):
-            minutes = int(diff.total_seconds() / 60)
-            return f'{minutes} minute{"s" if minutes > 1 else ""} ago'
-        elif diff < timedelta(days=1):
-            hours = int(diff.total_seconds() / 3600)
-            return f'{hours} hour{"s" if hours > 1 else ""} ago'
-        elif diff < timedelta(days=7):
-            days = diff.days
-            return f'{days} day{"s" if days > 1 else ""} ago'
-        else:
-            return obj.created_at.strftime('%b %d, %Y')
+        return format_time_ago(obj.created_at, timezone.now())
+
+
+def format_time_ago(created_at, now):
+    """Human-readable age of `created_at` as seen at `now`."""
+    diff = now - created_at
+    
+    if diff < timedelta(minutes=1):
+        return 'Just now'
+    elif diff < timedelta(hours=1):
+        minutes = int(diff.total_seconds() / 60)
+        return f'{minutes} minute{"s" if minutes > 1 else ""} ago'
+    elif diff < timedelta(days=1):
+        hours = int(diff.total_seconds() / 3600)
+        return f'{hours} hour{"s" if hours > 1 else ""} ago'
+    elif diff < timedelta(days=7):
+        days = diff.days
+        return f'{days} day{"s" if days > 1 else ""} ago'
+    else:
+        return created_at.strftime('%b %d, %Y')
+
+
+# Columns for the list fast path: one joined query, no model instances
+NOTIFICATION_LIST_VALUES = (
+    'id', 'warranty_id', 'warranty__product_name', 'warranty__brand',
+    'notification_type', 'title', 'message', 'is_read', 'created_at',
+)
+
+
+def serialize_notification_values(rows, now=None):
+    """
+    Serialize rows from `queryset.values(*NOTIFICATION_LIST_VALUES)` exactly
+    as NotificationSerializer would, with every `time_ago` measured against
+    the same `now`.
+    """
+    now = now or timezone.now()
+    format_datetime = serializers.DateTimeField().to_representation
+    return [
+        {
+            'id': row['id'],
+            'warranty_id': row['warranty_id'],
+            'warranty_product_name': row['warranty__product_name'],
+            'warranty_brand': row['warranty__brand'],
+            'notification_type': row['notification_type'],
+            'title': row['title'],
+            'message': row['message'],
+            'is_read': row['is_read'],
+            'created_at': format_datetime(row['created_at']),
+            'time_ago': format_time_ago(row['created_at'], now),
+        }
+        for row in rows
+    ]
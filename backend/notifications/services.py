@@ -1,11 +1,24 @@
-from datetime import date
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import date, timedelta
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from django.conf import settings
-from .models import Notification
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from .counters import adjust_unread_count
+from .models import Notification, NotificationChange
+from .serializers import NOTIFICATION_LIST_VALUES
+from .stream import broker
+from .tracing import span
 from warranties.models import Warranty
 
 
+_bulk = threading.local()
+
+
 def get_notification_message(notification_type, warranty):
     """Generate notification title and message based on type."""
     messages = {
@@ -46,29 +59,25 @@ def get_notification_message(notification_type, warranty):
 
 def create_notification(user, warranty, notification_type):
     """Create in-app notification."""
-    msg = get_notification_message(notification_type, warranty)
+    with span('format_message'):
+        msg = get_notification_message(notification_type, warranty)
     
-    notification = Notification.objects.create(
-        user=user,
-        warranty=warranty,
-        notification_type=notification_type,
-        title=msg['title'],
-        message=msg['message']
-    )
+    # The post_save handler adjusts the unread counter: commit both together,
+    # so get_unread_count() can't count the new row and then see it adjusted
+    with transaction.atomic():
+        notification = Notification.objects.create(
+            user=user,
+            warranty=warranty,
+            notification_type=notification_type,
+            title=msg['title'],
+            message=msg['message']
+        )
     return notification
 
 
-def send_email_notification(notification):
-    """Send email notification to user."""
-    try:
-        subject = notification.title
-        warranty = notification.warranty
-        
-        # Plain text message
-        plain_message = notification.message
-        
-        # HTML message
-        html_message = f"""
+def format_email_html(notification, warranty):
+    """HTML body of a notification email."""
+    return f"""
         <!DOCTYPE html>
         <html>
         <head>
@@ -133,18 +142,34 @@ def send_email_notification(notification):
         </body>
         </html>
         """
+
+
+def send_email_notification(notification):
+    """Send email notification to user."""
+    try:
+        subject = notification.title
+        warranty = notification.warranty
         
-        send_mail(
-            subject=subject,
-            message=plain_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[notification.user.email],
-            html_message=html_message,
-            fail_silently=False,
-        )
+        # Plain text message
+        plain_message = notification.message
+        
+        # HTML message
+        with span('format_email'):
+            html_message = format_email_html(notification, warranty)
+        
+        with span('smtp', notification.pk):
+            send_mail(
+                subject=subject,
+                message=plain_message,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                recipient_list=[notification.user.email],
+                html_message=html_message,
+                fail_silently=False,
+            )
         
-        notification.email_sent = True
-        notification.save()
+        with span('mark_sent'):
+            notification.email_sent = True
+            notification.save()
         return True
     except Exception as e:
         print(f"Failed to send email to {notification.user.email}: {e}")
@@ -157,8 +182,13 @@ def check_warranties_and_notify():
     notifications_created = 0
     emails_sent = 0
     
-    # Get all active warranties
-    for warranty in Warranty.objects.filter(expiry_date__gte=today):
+    # Get all active warranties, streamed in chunks rather than all held in memory
+    warranties = Warranty.objects.filter(expiry_date__gte=today).iterator(chunk_size=2000)
+    while True:
+        with span('scan'):
+            warranty = next(warranties, None)
+        if warranty is None:
+            break
         days_remaining = (warranty.expiry_date - today).days
         
         notification_type = None
@@ -181,25 +211,159 @@ def check_warranties_and_notify():
         
         if notification_type:
             # Check if notification already exists
-            existing = Notification.objects.filter(
-                warranty=warranty,
-                notification_type=notification_type
-            ).exists()
+            with span('duplicate_check', warranty.pk):
+                existing = Notification.objects.filter(
+                    warranty=warranty,
+                    notification_type=notification_type
+                ).exists()
             
             if not existing:
                 # Create in-app notification
-                notification = create_notification(
-                    warranty.user,
-                    warranty,
-                    notification_type
-                )
+                with span('create', warranty.pk):
+                    notification = create_notification(
+                        warranty.user,
+                        warranty,
+                        notification_type
+                    )
                 notifications_created += 1
                 
                 # Send email
-                if send_email_notification(notification):
+                with span('email', notification.pk):
+                    sent = send_email_notification(notification)
+                if sent:
                     emails_sent += 1
     
     return {
         'notifications_created': notifications_created,
         'emails_sent': emails_sent
     }
+
+
+def record_notification_changes(user_id, notification_ids):
+    """
+    Log changed notifications for delta sync and wake the user's streams.
+
+    The log rows are written after the surrounding transaction commits, so
+    they never point at a change that was rolled back. Their ids still need
+    not become visible in order: two concurrent inserts can commit the
+    higher id first. get_notification_changes() holds its watermark back
+    for that.
+    """
+    notification_ids = list(notification_ids)
+    if not notification_ids:
+        return
+    
+    def record():
+        try:
+            NotificationChange.objects.bulk_create([
+                NotificationChange(user_id=user_id, notification_id=notification_id)
+                for notification_id in notification_ids
+            ])
+        except IntegrityError:
+            # The user was deleted in the same transaction
+            return
+        broker.publish(user_id)
+    
+    transaction.on_commit(record)
+
+
+@contextmanager
+def bulk_notification_changes():
+    """Silence the per-row signal handlers; the caller accounts for the rows itself."""
+    previous = in_bulk_change()
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        # Nested inside another bulk change, the handlers stay silenced
+        _bulk.active = previous
+
+
+def in_bulk_change():
+    return getattr(_bulk, 'active', False)
+
+
+def delete_notifications(rows):
+    """
+    Delete notifications given as (id, user_id, is_read) tuples, adjusting
+    unread counters and logging tombstones with one statement per user
+    rather than per row. Returns the number deleted.
+
+    The tuples only say which rows to delete. The rows are locked and read
+    again before the delete, and the counters are adjusted from what was
+    actually deleted: a row marked read or deleted by another request since
+    the caller read it is not counted a second time.
+    """
+    notification_ids = [row[0] for row in rows]
+    if not notification_ids:
+        return 0
+    
+    with transaction.atomic(), bulk_notification_changes():
+        rows = list(
+            Notification.objects.select_for_update()
+            .filter(id__in=notification_ids)
+            .values_list('id', 'user_id', 'is_read')
+        )
+        if not rows:
+            return 0
+        unread = Counter(user_id for _, user_id, is_read in rows if not is_read)
+        by_user = defaultdict(list)
+        for notification_id, user_id, _ in rows:
+            by_user[user_id].append(notification_id)
+        
+        deleted, _ = Notification.objects.filter(id__in=[row[0] for row in rows]).delete()
+        for user_id, count in unread.items():
+            adjust_unread_count(user_id, -count)
+        for user_id, notification_ids in by_user.items():
+            record_notification_changes(user_id, notification_ids)
+    return deleted
+
+
+def get_notification_changes(user, since=None, limit=500):
+    """
+    Return (notification rows, deleted_ids, watermark, has_more) for delta
+    sync; rows are `.values(*NOTIFICATION_LIST_VALUES)` dicts.
+    
+    Without `since` every current notification is returned. Otherwise only
+    notifications created, updated or deleted after change id `since`, at
+    most `limit` changes at a time; deleted ones come back as ids only.
+    
+    Change ids are allocated before their insert commits, so a lower id can
+    become visible after a higher one. The watermark therefore never moves
+    past a change logged less than NOTIFICATION_CHANGE_SETTLE_SECONDS ago:
+    recent changes are returned but sent again on the next call, by which
+    time any lower id that was still in flight is visible too. Clients apply
+    changes by notification id, so the repeats are harmless.
+    """
+    changes = NotificationChange.objects.filter(user=user)
+    settled_before = timezone.now() - timedelta(seconds=settings.NOTIFICATION_CHANGE_SETTLE_SECONDS)
+    
+    if since is None:
+        # Read the watermark first: anything changing meanwhile is sent again.
+        # It is the newest settled id of the whole log, not just this user's,
+        # so it stays inside the retained log (see notifications.retention).
+        watermark = (
+            NotificationChange.objects.filter(created_at__lte=settled_before)
+            .order_by('-id').values_list('id', flat=True).first()
+        ) or 0
+        notifications = Notification.objects.filter(user=user).values(*NOTIFICATION_LIST_VALUES)
+        return list(notifications), [], watermark, False
+    
+    rows = list(
+        changes.filter(id__gt=since).order_by('id').values_list('id', 'notification_id', 'created_at')[:limit]
+    )
+    if not rows:
+        return [], [], since, False
+    
+    watermark = since
+    for change_id, _, created_at in rows:
+        if created_at > settled_before:
+            break
+        watermark = change_id
+    
+    changed_ids = {notification_id for _, notification_id, _ in rows}
+    notifications = list(
+        Notification.objects.filter(user=user, id__in=changed_ids).values(*NOTIFICATION_LIST_VALUES)
+    )
+    deleted_ids = sorted(changed_ids - {notification['id'] for notification in notifications})
+    return notifications, deleted_ids, watermark, len(rows) == limit and watermark == rows[-1][0]
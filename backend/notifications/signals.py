@@ -0,0 +1,30 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .counters import adjust_unread_count
+from .models import Notification
+from .services import in_bulk_change, record_notification_changes
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    """Keep the unread counter in step, log the change and wake open streams."""
+    if in_bulk_change():
+        return
+    if created:
+        adjust_unread_count(instance.user_id, 0 if instance.is_read else 1)
+    else:
+        was_read = getattr(instance, '_loaded_is_read', None)
+        if was_read is not None and was_read != instance.is_read:
+            adjust_unread_count(instance.user_id, -1 if instance.is_read else 1)
+    instance._loaded_is_read = instance.is_read
+    record_notification_changes(instance.user_id, [instance.pk])
+
+
+@receiver(post_delete, sender=Notification)
+def notification_deleted(sender, instance, **kwargs):
+    if in_bulk_change():
+        return
+    if not instance.is_read:
+        adjust_unread_count(instance.user_id, -1)
+    record_notification_changes(instance.user_id, [instance.pk])
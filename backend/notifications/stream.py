@@ -0,0 +1,296 @@
+"""
+Server-sent events for notifications.
+
+The stream is served by NotificationStreamHandler, which warranty_vault.asgi
+routes STREAM_PATH to ahead of the normal Django application. It skips the
+middleware chain and the per-request thread Django's ASGI handler keeps for
+sync code, so each open stream is one coroutine waiting on an
+asyncio.Event: no thread, no DB connection and no polling of its own while
+idle. The in-process broker sets a user's events when that user's
+notifications change in this process (see notifications.signals), and the
+stream then reads the new rows and the unread count once.
+
+Changes made elsewhere (the expiry cron, other workers) are picked up by a
+single poller per process that, every NOTIFICATION_STREAM_POLL_SECONDS,
+reads the notification change log past the last id it saw.
+
+EventSource cannot send headers, and an access token in the URL would end
+up in access logs. Browsers first POST for a stream ticket (see
+issue_stream_ticket) and open the stream with `?ticket=`.
+"""
+
+import asyncio
+import json
+import secrets
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from corsheaders.middleware import CorsMiddleware
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from django.db.models import Max
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from users.authentication import CachedJWTAuthentication
+
+from .counters import get_unread_count
+from .models import Notification, NotificationChange
+from .serializers import NOTIFICATION_LIST_VALUES, serialize_notification_values
+
+
+STREAM_PATH = '/api/notifications/stream/'
+
+
+def stream_ticket_key(ticket):
+    return f'notification-stream-ticket:{ticket}'
+
+
+def run_in_pool(func):
+    """
+    Run blocking ORM code on the event loop's shared thread pool, so the
+    threads and DB connections used are bounded by the pool size rather
+    than the number of open streams. The connection is given back after
+    each call, so idle pool threads don't hold pooled connections.
+    """
+    def wrapper(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=False)
+
+
+class Subscription:
+    def __init__(self, user_id, loop):
+        self.user_id = user_id
+        self.loop = loop
+        self.event = asyncio.Event()
+
+    def wake(self):
+        """Thread-safe: wake the stream from any thread."""
+        self.loop.call_soon_threadsafe(self.event.set)
+
+
+class NotificationBroker:
+    """In-process pub/sub keyed by user id, with a DB-polling fallback."""
+
+    def __init__(self, poll_interval=15):
+        self.poll_interval = poll_interval
+        self._subscriptions = defaultdict(set)
+        self._last_id = None
+        self._poller = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register the calling stream; must be called from the event loop."""
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(user_id, loop)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+            if self._poller is None or self._poller.done() or self._poller.get_loop() is not loop:
+                self._poller = loop.create_task(self._poll_forever())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+            if not self._subscriptions and self._poller is not None:
+                # Called from the stream's own loop, so cancelling is safe here
+                self._poller.cancel()
+                self._poller = None
+
+    def publish(self, user_id):
+        """Tell this user's open streams that their notifications changed."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.wake()
+
+    @property
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    async def _poll_forever(self):
+        self._last_id = None
+        while True:
+            with self._lock:
+                user_ids = list(self._subscriptions)
+            try:
+                changed = await run_in_pool(self.poll)(user_ids)
+            except Exception:
+                # Database hiccup: streams stay open, try again next round
+                changed = ()
+            for user_id in changed:
+                self.publish(user_id)
+            await asyncio.sleep(self.poll_interval)
+
+    def poll(self, user_ids):
+        """Return the ids of connected users whose notifications changed since the last poll."""
+        changes = NotificationChange.objects.all()
+        if self._last_id is None:
+            self._last_id = changes.aggregate(last=Max('id'))['last'] or 0
+            return set()
+        changed = set()
+        for row_id, user_id in changes.filter(id__gt=self._last_id).values_list('id', 'user_id'):
+            self._last_id = max(self._last_id, row_id)
+            changed.add(user_id)
+        return changed & set(user_ids)
+
+
+broker = NotificationBroker(poll_interval=settings.NOTIFICATION_STREAM_POLL_SECONDS)
+
+
+def issue_stream_ticket(user_id):
+    """
+    Return a random ticket that opens one notification stream for this user.
+
+    It is good for NOTIFICATION_STREAM_TICKET_SECONDS and for nothing but
+    the stream, so one read from a log is worth little.
+    """
+    ticket = secrets.token_urlsafe(32)
+    cache.set(stream_ticket_key(ticket), user_id, settings.NOTIFICATION_STREAM_TICKET_SECONDS)
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """Return the ticket's user id and invalidate it. Raises InvalidToken."""
+    key = stream_ticket_key(ticket)
+    user_id = cache.get(key)
+    # Only one of two concurrent redeemers deletes the key
+    if user_id is None or not cache.delete(key):
+        raise InvalidToken('Stream ticket is invalid or expired.')
+    return user_id
+
+
+def authenticate_stream(request):
+    """
+    Return the user id for a stream request, from the Authorization header
+    or a `?ticket=`. Raises InvalidToken or AuthenticationFailed.
+    """
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    if header:
+        raw_token = authentication.get_raw_token(header)
+        if not raw_token:
+            raise InvalidToken('Authentication credentials were not provided.')
+        return authentication.get_user(authentication.get_validated_token(raw_token)).pk
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        raise InvalidToken('Authentication credentials were not provided.')
+    return redeem_stream_ticket(ticket)
+
+
+def format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def load_changes(user_id, after_id):
+    """Return (serialized notifications with id > after_id, unread count)."""
+    queryset = Notification.objects.filter(user_id=user_id)
+    new_notifications = serialize_notification_values(
+        queryset.filter(id__gt=after_id).order_by('id').values(*NOTIFICATION_LIST_VALUES)
+    )
+    return new_notifications, get_unread_count(user_id)
+
+
+def latest_id(user_id):
+    return Notification.objects.filter(user_id=user_id).aggregate(last=Max('id'))['last'] or 0
+
+
+async def notification_events(user_id, last_event_id=None, heartbeat=25):
+    """
+    Yield SSE frames for one user until the client disconnects.
+
+    A reconnecting browser sends Last-Event-ID, and anything it missed is
+    replayed first; a fresh connection starts from the newest row.
+    """
+    subscription = broker.subscribe(user_id)
+    try:
+        after_id = last_event_id if last_event_id is not None else await run_in_pool(latest_id)(user_id)
+        yield f'retry: {settings.NOTIFICATION_STREAM_RETRY_MS}\n\n'
+        unread_count = None
+        while True:
+            subscription.event.clear()
+            notifications, count = await run_in_pool(load_changes)(user_id, after_id)
+            for notification in notifications:
+                after_id = notification['id']
+                yield format_event('notification', notification, event_id=notification['id'])
+            if count != unread_count:
+                unread_count = count
+                yield format_event('unread_count', {'count': count})
+
+            while True:
+                try:
+                    await asyncio.wait_for(subscription.event.wait(), timeout=heartbeat)
+                    break
+                except asyncio.TimeoutError:
+                    # Comment frame: keeps proxies from closing an idle stream
+                    yield ': ping\n\n'
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def stream_response(request):
+    """
+    `notification` for each new row and `unread_count` whenever the count
+    changes. Authenticated by the Authorization header or a `?ticket=`
+    (EventSource cannot set headers).
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    try:
+        user_id = await run_in_pool(authenticate_stream)(request)
+    except (InvalidToken, AuthenticationFailed) as e:
+        return JsonResponse({'detail': e.detail}, status=401)
+
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    response = StreamingHttpResponse(
+        notification_events(
+            user_id,
+            last_event_id=int(last_event_id) if last_event_id.isdigit() else None,
+            heartbeat=settings.NOTIFICATION_STREAM_HEARTBEAT_SECONDS,
+        ),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+class NotificationStreamHandler(ASGIHandler):
+    """
+    ASGI handler for STREAM_PATH only.
+
+    Reuses Django's request parsing, host validation, response sending and
+    disconnect handling, but answers with stream_response() directly (plus
+    CORS headers) instead of running the middleware chain.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.get_stream_response = CorsMiddleware(stream_response)
+
+    async def __call__(self, scope, receive, send):
+        # No ThreadSensitiveContext: it would keep a thread per open stream
+        await self.handle(scope, receive, send)
+
+    async def run_get_response(self, request):
+        response = await self.get_stream_response(request)
+        response._handler_class = self.__class__
+        return response
@@ -1,3 +1,486 @@
-from django.test import TestCase
+import asyncio
+from datetime import date, timedelta
+import json
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.db.models import Max
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.cache import user_cache
+from users.models import User
+from warranties.models import Warranty
+
+from .counters import adjust_unread_count, get_unread_count, repair_unread_counters
+from .models import Notification, NotificationChange, UnreadCounter
+from .retention import purge_change_log
+from .serializers import NotificationSerializer
+from .services import bulk_notification_changes, create_notification, delete_notifications, in_bulk_change
+from .stream import broker, issue_stream_ticket
+from .tracing import SweepTrace, span, tracing
+from .views import NotificationViewSet
+
+
+class StreamConnection:
+    """Drives warranty_vault.asgi.application like an ASGI server would."""
+
+    def __init__(self, path, headers=()):
+        self.path, _, self.query = path.partition('?')
+        self.headers = [(b'host', b'testserver')] + [(k.lower().encode(), v.encode()) for k, v in headers]
+        self.received = asyncio.Queue()
+        self.sent = asyncio.Queue()
+
+    async def __aenter__(self):
+        from warranty_vault.asgi import application
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': self.path, 'raw_path': self.path.encode(), 'root_path': '',
+            'query_string': self.query.encode(), 'headers': self.headers,
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        await self.received.put({'type': 'http.request', 'body': b'', 'more_body': False})
+        self.task = asyncio.create_task(application(scope, self.received.get, self.sent.put))
+        start = await asyncio.wait_for(self.sent.get(), 5)
+        self.status = start['status']
+        self.response_headers = {k.decode().lower(): v.decode() for k, v in start['headers']}
+        return self
+
+    async def read_frame(self, timeout=5):
+        """Return the next event, skipping heartbeats and the retry hint."""
+        while True:
+            message = await asyncio.wait_for(self.sent.get(), timeout)
+            frame = message['body'].decode()
+            if frame and not frame.startswith((':', 'retry:')):
+                return frame
+
+    async def __aexit__(self, *exc_info):
+        await self.received.put({'type': 'http.disconnect'})
+        await asyncio.wait_for(self.task, 5)
+
+
+class NotificationStreamTests(TransactionTestCase):
+    """The SSE endpoint pushes new rows and unread counts without client polling."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(email='stream@example.com', name='Stream', password='pass12345')
+        self.warranty = Warranty.objects.create(
+            user=self.user, product_name='TV', brand='Sony', category='Electronics',
+            purchase_date=date(2024, 1, 1), warranty_period=12,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(
+            user=self.user, warranty=self.warranty, notification_type='30_days',
+            title='Expiring', message='Soon', **kwargs
+        )
+
+    def notify_from_other_process(self):
+        """Write what another worker's save would, without this process's broker hearing of it."""
+        notification, = Notification.objects.bulk_create([
+            Notification(user=self.user, warranty=self.warranty, notification_type='expired', title='t', message='m')
+        ])
+        adjust_unread_count(self.user.pk, 1)
+        NotificationChange.objects.create(user=self.user, notification_id=notification.pk)
+
+    def open_stream(self, **headers):
+        return StreamConnection(f'/api/notifications/stream/?ticket={issue_stream_ticket(self.user.pk)}', headers.items())
+
+    async def test_pushes_new_notifications_and_counts(self):
+        await sync_to_async(self.notify)()
+        async with self.open_stream() as stream:
+            self.assertIn('"count": 1', await stream.read_frame())
+
+            notification = await sync_to_async(self.notify)()
+            frame = await stream.read_frame()
+            self.assertIn(f'id: {notification.pk}\nevent: notification', frame)
+            self.assertIn('"count": 2', await stream.read_frame())
+
+            notification.is_read = True
+            await sync_to_async(notification.save)()
+            self.assertIn('"count": 1', await stream.read_frame())
+
+    async def test_replays_after_last_event_id(self):
+        first = await sync_to_async(self.notify)()
+        second = await sync_to_async(self.notify)()
+        async with self.open_stream(**{'Last-Event-ID': str(first.pk)}) as stream:
+            self.assertIn(f'id: {second.pk}\n', await stream.read_frame())
+            self.assertIn('"count": 2', await stream.read_frame())
+
+    @override_settings(NOTIFICATION_STREAM_HEARTBEAT_SECONDS=0.05)
+    async def test_poller_picks_up_changes_from_other_processes(self):
+        self.addCleanup(setattr, broker, 'poll_interval', broker.poll_interval)
+        broker.poll_interval = 0.1
+        async with self.open_stream() as stream:
+            self.assertIn('"count": 0', await stream.read_frame())
+
+            await sync_to_async(self.notify_from_other_process)()
+            self.assertIn('event: notification', await stream.read_frame())
+            self.assertIn('"count": 1', await stream.read_frame())
+
+    async def test_requires_token(self):
+        async with StreamConnection('/api/notifications/stream/') as stream:
+            self.assertEqual(stream.status, 401)
+
+    async def test_ticket_opens_one_stream(self):
+        response = await sync_to_async(self.client.post)('/api/notifications/stream_ticket/')
+        self.assertEqual(response.data['expires_in'], 30)
+        ticket = response.data['ticket']
+        async with StreamConnection(f'/api/notifications/stream/?ticket={ticket}') as stream:
+            self.assertEqual(stream.status, 200)
+            await stream.read_frame()
+        async with StreamConnection(f'/api/notifications/stream/?ticket={ticket}') as stream:
+            self.assertEqual(stream.status, 401)
+
+    async def test_access_token_in_query_is_rejected(self):
+        token = RefreshToken.for_user(self.user).access_token
+        async with StreamConnection(f'/api/notifications/stream/?token={token}') as stream:
+            self.assertEqual(stream.status, 401)
+        async with StreamConnection('/api/notifications/stream/', [('Authorization', f'Bearer {token}')]) as stream:
+            self.assertEqual(stream.status, 200)
+            await stream.read_frame()
+
+    @override_settings(CORS_ALLOW_ALL_ORIGINS=False, CORS_ALLOWED_ORIGINS=['http://localhost:5173'])
+    async def test_disconnect_releases_subscription(self):
+        async with self.open_stream(Origin='http://localhost:5173') as stream:
+            self.assertEqual(stream.response_headers['content-type'], 'text/event-stream')
+            self.assertEqual(stream.response_headers['access-control-allow-origin'], 'http://localhost:5173')
+            await stream.read_frame()
+            self.assertEqual(broker.connection_count, 1)
+        self.assertEqual(broker.connection_count, 0)
+
+
+@override_settings(NOTIFICATION_CHANGE_SETTLE_SECONDS=0)
+class NotificationDeltaSyncTests(TestCase):
+    """`changes/?since=` returns only what changed, with tombstones for deletes."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(email='delta@example.com', name='Delta', password='pass12345')
+        self.warranty = Warranty.objects.create(
+            user=self.user, product_name='TV', brand='Sony', category='Electronics',
+            purchase_date=date(2024, 1, 1), warranty_period=12,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = self.notify()
+            self.second = self.notify()
+
+    def notify(self):
+        return Notification.objects.create(
+            user=self.user, warranty=self.warranty, notification_type='30_days', title='Expiring', message='Soon'
+        )
+
+    def sync(self, since=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.get('/api/notifications/changes/', {} if since is None else {'since': since})
+
+    def test_full_then_empty_delta(self):
+        response = self.sync()
+        self.assertEqual(len(response.data['notifications']), 2)
+        self.assertEqual(self.sync(response.data['since']).status_code, 204)
+
+    def test_delta_contains_only_changes(self):
+        since = self.sync().data['since']
+        deleted_id = self.second.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            third = self.notify()
+            response = self.client.post('/api/notifications/mark_read/', {'ids': [self.first.pk]}, format='json')
+            self.second.delete()
+        self.assertEqual(response.data['count'], 1)
+
+        delta = self.sync(since).data
+        self.assertEqual(
+            sorted((n['id'], n['is_read']) for n in delta['notifications']),
+            [(self.first.pk, True), (third.pk, False)]
+        )
+        self.assertEqual(delta['deleted'], [deleted_id])
+        self.assertEqual(self.sync(delta['since']).status_code, 204)
+
+    @override_settings(NOTIFICATION_CHANGE_SETTLE_SECONDS=60)
+    def test_watermark_waits_for_out_of_order_commits(self):
+        since = NotificationChange.objects.aggregate(last=Max('id'))['last']
+        NotificationChange.objects.filter(id__lte=since).update(created_at=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(self.sync().data['since'], since)
+
+        # Change since + 2 commits while since + 1 is still in flight
+        third = self.notify()
+        NotificationChange.objects.create(id=since + 2, user=self.user, notification_id=third.pk)
+        delta = self.sync(since).data
+        self.assertEqual([n['id'] for n in delta['notifications']], [third.pk])
+        self.assertEqual(delta['since'], since)
+
+        NotificationChange.objects.create(id=since + 1, user=self.user, notification_id=self.first.pk)
+        delta = self.sync(delta['since']).data
+        self.assertEqual(sorted(n['id'] for n in delta['notifications']), [self.first.pk, third.pk])
+        self.assertEqual(delta['since'], since)
+
+        NotificationChange.objects.update(created_at=timezone.now() - timedelta(minutes=1))
+        delta = self.sync(delta['since']).data
+        self.assertEqual(delta['since'], since + 2)
+        self.assertEqual(self.sync(delta['since']).status_code, 204)
+
+    def test_mark_read_batch_ignores_other_users(self):
+        other = User.objects.create_user(email='other@example.com', name='Other', password='pass12345')
+        foreign = Notification.objects.create(
+            user=other, warranty=self.warranty, notification_type='expired', title='t', message='m'
+        )
+        response = self.client.post('/api/notifications/mark_read/', {'ids': [foreign.pk]}, format='json')
+        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(
+            self.client.post('/api/notifications/mark_read/', {'ids': 'all'}, format='json').status_code, 400
+        )
+
+
+class UnreadCounterTests(TestCase):
+    """The denormalized counter follows every read-state change."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='counter@example.com', name='Counter', password='pass12345')
+        self.warranty = Warranty.objects.create(
+            user=self.user, product_name='TV', brand='Sony', category='Electronics',
+            purchase_date=date(2024, 1, 1), warranty_period=12,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.unread_count(), 0)
+
+    def notify(self, **kwargs):
+        return Notification.objects.create(
+            user=self.user, warranty=self.warranty, notification_type='30_days', title='t', message='m', **kwargs
+        )
+
+    def unread_count(self):
+        return self.client.get('/api/notifications/unread_count/').json()['count']
+
+    def test_counter_tracks_changes(self):
+        first, second, third = self.notify(), self.notify(), self.notify()
+        self.notify(is_read=True)
+        self.assertEqual(self.unread_count(), 3)
+
+        self.client.patch(f'/api/notifications/{first.pk}/mark_read/')
+        self.client.patch(f'/api/notifications/{first.pk}/mark_read/')
+        self.assertEqual(self.unread_count(), 2)
+
+        self.client.post('/api/notifications/mark_read/', {'ids': [second.pk, first.pk]}, format='json')
+        self.assertEqual(self.unread_count(), 1)
+
+        self.client.patch(f'/api/notifications/{second.pk}/', {'is_read': False}, format='json')
+        self.assertEqual(self.unread_count(), 2)
+
+        self.client.delete('/api/notifications/clear_all/')
+        self.assertEqual(self.unread_count(), 2)
+
+        third.delete()
+        self.assertEqual(self.unread_count(), 1)
+
+        self.client.post('/api/notifications/mark_all_read/')
+        self.assertEqual(self.unread_count(), 0)
+        self.assertEqual(Notification.objects.filter(is_read=False).count(), 0)
+
+    def test_concurrent_mark_read_decrements_once(self):
+        first = self.notify()
+        self.notify()
+        self.assertEqual(self.unread_count(), 2)
+        stale = Notification.objects.get(pk=first.pk)
+        self.client.patch(f'/api/notifications/{first.pk}/mark_read/')
+        # The second call loaded the row before the first one marked it read
+        with mock.patch.object(NotificationViewSet, 'get_object', return_value=stale):
+            self.client.patch(f'/api/notifications/{first.pk}/mark_read/')
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_delete_counts_rows_as_deleted(self):
+        read_since, deleted_since, unread = self.notify(), self.notify(), self.notify()
+        self.assertEqual(self.unread_count(), 3)
+        # The caller read all three as unread, then another request changed two
+        stale_rows = [(n.pk, self.user.pk, False) for n in (read_since, deleted_since, unread)]
+        self.client.patch(f'/api/notifications/{read_since.pk}/mark_read/')
+        deleted_since.delete()
+        self.assertEqual(self.unread_count(), 1)
+
+        self.assertEqual(delete_notifications(stale_rows), 2)
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_nested_bulk_changes_stay_silenced(self):
+        with bulk_notification_changes():
+            with bulk_notification_changes():
+                pass
+            # Accounted for by the outer caller, not the signal handlers
+            self.notify()
+        self.assertFalse(in_bulk_change())
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_sweep_commits_notification_and_count_together(self):
+        with mock.patch('notifications.signals.adjust_unread_count', side_effect=DatabaseError):
+            with self.assertRaises(DatabaseError):
+                create_notification(self.user, self.warranty, '30_days')
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(self.unread_count(), 0)
+
+    def test_unread_count_is_single_row_read(self):
+        self.notify()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_unread_count(self.user.pk), 1)
+
+    def test_repair(self):
+        self.notify()
+        UnreadCounter.objects.filter(user=self.user).update(unread=7)
+        self.assertEqual(repair_unread_counters([self.user.pk]), 1)
+        self.assertEqual(self.unread_count(), 1)
+
+
+class NotificationListQueryTests(TestCase):
+    """The list is one joined query whatever its size, with unchanged output."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='list@example.com', name='List', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_notifications(self, count):
+        for i in range(count):
+            warranty = Warranty.objects.create(
+                user=self.user, product_name=f'Product {i}', brand=f'Brand {i}', category='Electronics',
+                purchase_date=date(2024, 1, 1), warranty_period=12,
+            )
+            Notification.objects.create(
+                user=self.user, warranty=warranty, notification_type='30_days',
+                title=f'Title {i}', message='m', is_read=bool(i % 2)
+            )
+
+    def test_constant_queries(self):
+        for count in (1, 40):
+            self.add_notifications(count)
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/notifications/')
+            self.assertEqual(len(response.data), Notification.objects.filter(user=self.user).count())
+
+    def test_matches_model_serializer(self):
+        self.add_notifications(5)
+        expected = NotificationSerializer(
+            Notification.objects.filter(user=self.user).select_related('warranty'), many=True
+        ).data
+        self.assertEqual(self.client.get('/api/notifications/').json(), [dict(row) for row in expected])
+
+
+@override_settings(NOTIFICATION_CHANGE_SETTLE_SECONDS=0)
+class NotificationRetentionTests(TestCase):
+    """compact_notifications enforces the retention policy without breaking counters or delta sync."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='retention@example.com', name='Retention', password='pass12345')
+        self.current = Warranty.objects.create(
+            user=self.user, product_name='TV', brand='Sony', category='Electronics',
+            purchase_date=date.today(), warranty_period=12,
+        )
+        self.lapsed = Warranty.objects.create(
+            user=self.user, product_name='Radio', brand='Sony', category='Electronics',
+            purchase_date=date(2020, 1, 1), warranty_period=12,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def notify(self, warranty, is_read=False, age_days=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            notification = Notification.objects.create(
+                user=self.user, warranty=warranty, notification_type='30_days', title='t', message='m',
+                is_read=is_read
+            )
+        Notification.objects.filter(pk=notification.pk).update(created_at=timezone.now() - timedelta(days=age_days))
+        return notification
+
+    def compact(self, **options):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('compact_notifications', batch_size=1, pause=0, stdout=out, **options)
+        return out.getvalue()
+
+    def test_policy(self):
+        old_read = self.notify(self.current, is_read=True, age_days=100)
+        recent_read = self.notify(self.current, is_read=True, age_days=10)
+        old_unread = self.notify(self.current, age_days=100)
+        lapsed_unread = self.notify(self.lapsed)
+        self.assertEqual(get_unread_count(self.user.pk), 2)
+        since = self.client.get('/api/notifications/changes/').data['since']
+
+        self.assertIn('Would delete 2 rows from notifications', self.compact(dry_run=True))
+        self.assertEqual(Notification.objects.count(), 4)
+
+        output = self.compact()
+        self.assertIn('Deleted 2 rows from notifications in 2 batches', output)
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)), {recent_read.pk, old_unread.pk}
+        )
+        self.assertEqual(get_unread_count(self.user.pk), 1)
+        self.assertEqual(repair_unread_counters([self.user.pk]), 0)
+        delta = self.client.get('/api/notifications/changes/', {'since': since}).data
+        self.assertEqual(sorted(delta['deleted']), sorted([old_read.pk, lapsed_unread.pk]))
+
+    def test_purged_change_log_forces_full_sync(self):
+        self.notify(self.current)
+        stale_since = self.client.get('/api/notifications/changes/').data['since'] - 1
+        self.notify(self.current)
+        NotificationChange.objects.update(created_at=timezone.now() - timedelta(days=60))
+
+        self.assertEqual(purge_change_log(days=30, pause=0).rows, 1)
+        self.assertEqual(NotificationChange.objects.count(), 1)
+        response = self.client.get('/api/notifications/changes/', {'since': stale_since})
+        self.assertEqual(response.status_code, 410)
+
+        since = self.client.get('/api/notifications/changes/').data['since']
+        self.assertEqual(self.client.get('/api/notifications/changes/', {'since': since}).status_code, 204)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ExpirySweepReportTests(TestCase):
+    """check_warranty_expiry --report times each stage of the sweep."""
+
+    def setUp(self):
+        user = User.objects.create_user(email='sweep@example.com', name='Sweep', password='pass12345')
+        for days in (30, 10, 45):
+            warranty = Warranty.objects.create(
+                user=user, product_name=f'Item {days}', brand='Sony', category='Electronics',
+                purchase_date=date.today(), warranty_period=12,
+            )
+            Warranty.objects.filter(pk=warranty.pk).update(expiry_date=date.today() + timedelta(days=days))
+
+    def test_json_report(self):
+        out = StringIO()
+        call_command('check_warranty_expiry', report='json', slowest=1, stdout=out)
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['notifications_created'], 2)
+        self.assertEqual(report['emails_sent'], 2)
+        stages = report['stages']
+        self.assertEqual(stages['scan']['count'], 4)  # three warranties and the end of the scan
+        self.assertEqual(stages['duplicate_check']['count'], 2)
+        for name in ('create', 'format_message', 'email', 'format_email', 'smtp', 'mark_sent'):
+            self.assertEqual(stages[name]['count'], 2, name)
+        self.assertEqual(len(stages['email']['slowest']), 1)
+        self.assertLessEqual(stages['email']['own_seconds'], stages['email']['total_seconds'])
+        self.assertLessEqual(stages['email']['max_seconds'], report['duration_seconds'])
+
+    def test_untraced_spans_are_shared_no_ops(self):
+        self.assertIs(span('scan'), span('email', 1))
+        trace = SweepTrace(keep_slowest=2)
+        with tracing(trace):
+            for item in range(5):
+                with span('outer', item):
+                    with span('inner'):
+                        pass
+        self.assertIs(span('scan'), span('email', 1))
+        outer = trace.spans['outer'].as_dict()
+        self.assertEqual(outer['count'], 5)
+        self.assertEqual(len(outer['slowest']), 2)
+        self.assertAlmostEqual(outer['own_seconds'] + trace.spans['inner'].total, outer['total_seconds'])
@@ -0,0 +1,132 @@
+"""
+Stage timings for the expiry sweep.
+
+The sweep code marks its stages with `span(name, item)`. Unless a
+SweepTrace is active (`with tracing(trace):`), span() returns a shared
+no-op context manager, so an untraced sweep pays one ContextVar lookup per
+stage. With a trace active each stage collects its call count, total, own
+(children excluded) and max duration, and the slowest items, for
+check_warranty_expiry's --report.
+"""
+
+import heapq
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+
+_current = ContextVar('notification_sweep_trace', default=None)
+_NO_SPAN = nullcontext()
+
+
+class SpanStats:
+    __slots__ = ('count', 'total', 'own', 'max', 'slowest')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.own = 0.0
+        self.max = 0.0
+        # Min-heap of (seconds, sequence, item), bounded to SweepTrace.keep_slowest
+        self.slowest = []
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'total_seconds': self.total,
+            'own_seconds': self.own,
+            'max_seconds': self.max,
+            'mean_seconds': self.total / self.count if self.count else 0.0,
+            'slowest': [
+                {'item': item, 'seconds': seconds}
+                for seconds, _, item in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+class _Span:
+    __slots__ = ('trace', 'name', 'item', 'start', 'children')
+
+    def __init__(self, trace, name, item):
+        self.trace = trace
+        self.name = name
+        self.item = item
+        self.children = 0.0
+
+    def __enter__(self):
+        self.trace._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        stack = self.trace._stack
+        stack.pop()
+        if stack:
+            stack[-1].children += elapsed
+        self.trace._record(self.name, self.item, elapsed, elapsed - self.children)
+        return False
+
+
+class SweepTrace:
+    """Per-stage timings of one sweep; keeps the `keep_slowest` slowest items per stage."""
+
+    def __init__(self, keep_slowest=5):
+        self.keep_slowest = keep_slowest
+        self.spans = {}
+        self._stack = []
+        self._sequence = 0
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def span(self, name, item=None):
+        return _Span(self, name, item)
+
+    def _record(self, name, item, elapsed, own):
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = SpanStats()
+        stats.count += 1
+        stats.total += elapsed
+        stats.own += own
+        if elapsed > stats.max:
+            stats.max = elapsed
+        if item is not None and self.keep_slowest:
+            self._sequence += 1
+            entry = (elapsed, self._sequence, item)
+            if len(stats.slowest) < self.keep_slowest:
+                heapq.heappush(stats.slowest, entry)
+            elif elapsed > stats.slowest[0][0]:
+                heapq.heapreplace(stats.slowest, entry)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def duration(self):
+        return (self.finished or time.perf_counter()) - self.started
+
+    def as_dict(self):
+        return {
+            'duration_seconds': self.duration,
+            'stages': {name: stats.as_dict() for name, stats in self.spans.items()},
+        }
+
+
+def span(name, item=None):
+    """Time a sweep stage if a trace is active; `item` identifies it among the slowest."""
+    trace = _current.get()
+    if trace is None:
+        return _NO_SPAN
+    return trace.span(name, item)
+
+
+@contextmanager
+def tracing(trace):
+    """Record the spans run inside the block into `trace`."""
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.finish()
+        _current.reset(token)
@@ -1,8 +1,14 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from . import async_views
 from .views import NotificationViewSet
 
 router = DefaultRouter()
 router.register(r'', NotificationViewSet, basename='notification')
 
-urlpatterns = router.urls
+urlpatterns = []
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns.append(path('unread_count/', async_views.unread_count, name='notification-unread-count'))
+
+urlpatterns += router.urls
@@ -1,9 +1,18 @@
+from django.conf import settings
+from django.db import transaction
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Notification
-from .serializers import NotificationSerializer
+from .serializers import NOTIFICATION_LIST_VALUES, NotificationSerializer, serialize_notification_values
+from .counters import adjust_unread_count, get_unread_count
+from .retention import is_watermark_expired
+from .services import delete_notifications, get_notification_changes, record_notification_changes
+from .stream import issue_stream_ticket
+
+
+MAX_BATCH_IDS = 500
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -14,41 +23,119 @@ class NotificationViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Return notifications for the current user only."""
-        return Notification.objects.filter(user=self.request.user)
+        return Notification.objects.filter(user=self.request.user).select_related('warranty')
     
     def list(self, request, *args, **kwargs):
-        """List all notifications for the user."""
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        """List all notifications for the user (one joined query)."""
+        rows = self.get_queryset().values(*NOTIFICATION_LIST_VALUES)
+        return Response(serialize_notification_values(rows))
     
     @action(detail=False, methods=['get'])
     def unread_count(self, request):
         """Get count of unread notifications."""
-        count = self.get_queryset().filter(is_read=False).count()
-        return Response({'count': count})
+        return Response({'count': get_unread_count(request.user.pk)})
+    
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """Single-use ticket for opening the event stream (`?ticket=`)."""
+        return Response({
+            'ticket': issue_stream_ticket(request.user.pk),
+            'expires_in': settings.NOTIFICATION_STREAM_TICKET_SECONDS,
+        }, status=status.HTTP_201_CREATED)
     
     @action(detail=True, methods=['patch'])
     def mark_read(self, request, pk=None):
         """Mark a single notification as read."""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        # A conditional update, so concurrent calls decrement the counter once
+        self._mark_read(Notification.objects.filter(pk=notification.pk))
         return Response({'status': 'marked as read'})
     
+    @action(detail=False, methods=['post'], url_path='mark_read')
+    def mark_read_batch(self, request):
+        """Mark the notifications listed in `ids` as read."""
+        ids = request.data.get('ids')
+        if (
+            not isinstance(ids, list)
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+            or len(ids) > MAX_BATCH_IDS
+        ):
+            return Response(
+                {'error': f'ids must be a list of at most {MAX_BATCH_IDS} notification ids'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        updated_count = self._mark_read(self.get_queryset().filter(id__in=ids))
+        return Response({
+            'status': 'marked as read',
+            'count': updated_count
+        })
+    
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
         """Mark all notifications as read."""
-        updated_count = self.get_queryset().filter(is_read=False).update(is_read=True)
+        updated_count = self._mark_read(self.get_queryset())
         return Response({
             'status': 'all marked as read',
             'count': updated_count
         })
     
+    def _mark_read(self, queryset):
+        """Mark unread notifications in `queryset` as read and log the changes."""
+        with transaction.atomic():
+            ids = list(queryset.filter(is_read=False).order_by().values_list('id', flat=True))
+            # Counted from the rows this update changed, not the ones read above
+            updated_count = Notification.objects.filter(id__in=ids, is_read=False).update(is_read=True)
+            adjust_unread_count(self.request.user.pk, -updated_count)
+            if updated_count:
+                record_notification_changes(self.request.user.pk, ids)
+        return updated_count
+    
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Delta sync. Returns notifications created, updated or deleted after
+        the `since` change id, plus the watermark to send next time; 204 when
+        nothing changed. Without `since`, returns everything; 410 when the
+        change log no longer reaches back to `since` and the client must
+        start over that way.
+        """
+        since = request.query_params.get('since')
+        if since is not None and not since.isdigit():
+            return Response(
+                {'error': 'since must be a change id returned by a previous call'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if since is not None and is_watermark_expired(int(since)):
+            return Response(
+                {'error': 'since is older than the retained change log; sync again without it'},
+                status=status.HTTP_410_GONE
+            )
+        
+        notifications, deleted, watermark, has_more = get_notification_changes(
+            request.user, int(since) if since is not None else None
+        )
+        if since is not None and not notifications and not deleted:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        return Response({
+            'since': watermark,
+            'has_more': has_more,
+            'notifications': serialize_notification_values(notifications),
+            'deleted': deleted,
+        })
+    
     @action(detail=False, methods=['delete'])
     def clear_all(self, request):
-        """Delete all read notifications."""
-        deleted_count, _ = self.get_queryset().filter(is_read=True).delete()
+        """Delete all read notifications, a bounded batch at a time."""
+        read = self.get_queryset().filter(is_read=True).order_by('id')
+        deleted_count = 0
+        last_id = 0
+        while True:
+            rows = list(read.filter(id__gt=last_id).values_list('id', 'user_id', 'is_read')[:MAX_BATCH_IDS])
+            if not rows:
+                break
+            deleted_count += delete_notifications(rows)
+            last_id = rows[-1][0]
         return Response({
             'status': 'cleared',
             'count': deleted_count
@@ -0,0 +1,98 @@
+"""
+Process-local cache of User rows for JWT-authenticated requests.
+
+Entries are keyed by user id plus a version stamp. The stamp is bumped
+whenever a user is saved or deleted (profile update, password change,
+deactivation), which makes older entries unreachable. When
+JWT_USER_CACHE_ALIAS names a shared Django cache, the stamps live there so
+a bump in one worker is seen by all of them; otherwise each process keeps
+its own stamps and other workers catch up within JWT_USER_CACHE_TTL.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+
+class UserCache:
+    """Thread-safe TTL + LRU cache of user field values."""
+
+    def __init__(self, ttl=300, max_entries=1024, shared_cache_alias=''):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.shared_cache_alias = shared_cache_alias
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    @property
+    def shared_cache(self):
+        return caches[self.shared_cache_alias] if self.shared_cache_alias else None
+
+    @staticmethod
+    def _version_key(user_id):
+        return f'users:auth-version:{user_id}'
+
+    def get_version(self, user_id):
+        if self.shared_cache is not None:
+            return self.shared_cache.get(self._version_key(user_id), 0)
+        return self._versions.get(user_id, 0)
+
+    def bump_version(self, user_id):
+        """Invalidate every cached copy of this user."""
+        with self._lock:
+            self._entries.pop(user_id, None)
+            if self.shared_cache is None:
+                self._versions[user_id] = self._versions.get(user_id, 0) + 1
+                return
+        shared_cache = self.shared_cache
+        key = self._version_key(user_id)
+        # add() is a no-op when the key exists; incr() is atomic on
+        # memcached/redis backends.
+        shared_cache.add(key, 0, timeout=None)
+        try:
+            shared_cache.incr(key)
+        except ValueError:
+            shared_cache.set(key, 1, timeout=None)
+
+    def get(self, user_id):
+        """Return a fresh User instance from the cache, or None on a miss."""
+        version = self.get_version(user_id)
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            entry_version, expires_at, db_alias, values = entry
+            if entry_version != version or expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+
+        # A new instance per request, so views that mutate request.user
+        # never touch another request's object.
+        User = get_user_model()
+        return User.from_db(db_alias, [field.attname for field in User._meta.concrete_fields], values)
+
+    def set(self, user, version):
+        values = [getattr(user, field.attname) for field in user._meta.concrete_fields]
+        with self._lock:
+            self._entries[user.pk] = (version, time.monotonic() + self.ttl, user._state.db, values)
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+user_cache = UserCache(
+    ttl=settings.JWT_USER_CACHE_TTL,
+    max_entries=settings.JWT_USER_CACHE_MAX_ENTRIES,
+    shared_cache_alias=settings.JWT_USER_CACHE_ALIAS,
+)
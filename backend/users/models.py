@@ -40,3 +40,24 @@ class User(AbstractUser):
         db_table = 'users'
         verbose_name = 'User'
         verbose_name_plural = 'Users'
+
+
+class RevokedToken(models.Model):
+    """
+    Refresh token id (jti) that may no longer be used.
+
+    Rows are only needed until the token would have expired anyway; the
+    purge_revoked_tokens command deletes them after that.
+    """
+    
+    jti = models.CharField(max_length=255, unique=True)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return self.jti
+    
+    class Meta:
+        db_table = 'revoked_tokens'
+        verbose_name = 'Revoked Token'
+        verbose_name_plural = 'Revoked Tokens'
@@ -0,0 +1,152 @@
+"""
+Refresh-token revocation store.
+
+Revoked token ids (jti) are kept in the indexed `revoked_tokens` table and
+mirrored into an in-memory Bloom filter per process. A token the filter has
+never seen is definitely not revoked, so the common case is answered without
+touching the database; only filter hits are confirmed with an index lookup.
+
+Each process pulls rows added by other workers with a primary-key range
+query at most every TOKEN_REVOCATION_SYNC_SECONDS, and rebuilds its filter
+from unexpired rows every TOKEN_REVOCATION_REBUILD_SECONDS so purged
+tokens stop occupying it. Rotation itself does not depend on that window:
+`revoke()` inserts under the unique `jti` index, so two workers can never
+both accept the same refresh token.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings using blake2b double hashing."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationStore:
+    """Bloom-filter-fronted view of the RevokedToken table."""
+
+    def __init__(self, capacity=500_000, error_rate=0.001, sync_interval=2, rebuild_interval=3600):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._filter = None
+        self._last_id = 0
+        self._synced_at = 0
+        self._built_at = 0
+        self._lock = threading.Lock()
+
+    def _rebuild(self):
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        last_id = 0
+        rows = RevokedToken.objects.filter(expires_at__gt=timezone.now()).values_list('id', 'jti')
+        for row_id, jti in rows.iterator(chunk_size=10_000):
+            bloom.add(jti)
+            last_id = max(last_id, row_id)
+        # Rows inserted after the scan started are caught by the next sync
+        last_id = max(last_id, self._last_id) if self._filter is not None else last_id
+        self._filter, self._last_id = bloom, last_id
+        self._built_at = self._synced_at = time.monotonic()
+
+    def _sync(self):
+        new_rows = RevokedToken.objects.filter(id__gt=self._last_id).order_by('id').values_list('id', 'jti')
+        for row_id, jti in new_rows.iterator(chunk_size=10_000):
+            self._filter.add(jti)
+            self._last_id = row_id
+        self._synced_at = time.monotonic()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._synced_at < self.sync_interval:
+            return
+        if not self._lock.acquire(blocking=self._filter is None):
+            return  # another thread is already refreshing; use the current filter
+        try:
+            now = time.monotonic()
+            if self._filter is None or now - self._built_at >= self.rebuild_interval:
+                self._rebuild()
+            elif now - self._synced_at >= self.sync_interval:
+                self._sync()
+        finally:
+            self._lock.release()
+
+    def is_revoked(self, jti):
+        """Return True if the token id has been revoked."""
+        self._refresh()
+        if jti not in self._filter:
+            return False
+        return RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke(self, jti, expires_at):
+        """
+        Record a token id as revoked.
+
+        Returns False if it was already revoked, which for a refresh token
+        means it has been used before.
+        """
+        self._refresh()
+        if isinstance(expires_at, (int, float)):
+            expires_at = datetime.fromtimestamp(expires_at, tz=dt_timezone.utc)
+        try:
+            with transaction.atomic():
+                RevokedToken.objects.create(jti=jti, expires_at=expires_at)
+        except IntegrityError:
+            self._filter.add(jti)
+            return False
+        self._filter.add(jti)
+        return True
+
+    def purge_expired(self, batch_size=5000):
+        """Delete rows for tokens that have expired anyway; return the count."""
+        now = timezone.now()
+        deleted = 0
+        while True:
+            ids = list(
+                RevokedToken.objects.filter(expires_at__lte=now).values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return deleted
+            deleted += RevokedToken.objects.filter(id__in=ids).delete()[0]
+
+    def clear(self):
+        """Drop the filter; the next check rebuilds it from the table."""
+        with self._lock:
+            self._filter = None
+            self._last_id = 0
+
+
+revocation_store = RevocationStore(
+    capacity=settings.TOKEN_REVOCATION_BLOOM_CAPACITY,
+    error_rate=settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE,
+    sync_interval=settings.TOKEN_REVOCATION_SYNC_SECONDS,
+    rebuild_interval=settings.TOKEN_REVOCATION_REBUILD_SECONDS,
+)
@@ -0,0 +1,16 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import user_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """Bump the user's cache version on any save (profile, password, is_active) or delete."""
+    user_cache.bump_version(instance.pk)
+    # Bump again once committed, so a request that re-cached the old row
+    # before the commit cannot keep serving it.
+    transaction.on_commit(lambda: user_cache.bump_version(instance.pk))
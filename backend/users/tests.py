@@ -0,0 +1,135 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import user_cache
+from .models import RevokedToken, User
+from .revocation import revocation_store
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    """JWT requests resolve the user from the cache until the user changes."""
+
+    def setUp(self):
+        user_cache.clear()
+        self.user = User.objects.create_user(email='cache@example.com', name='Cache', password='pass12345')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def test_repeat_requests_skip_user_query(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/auth/profile/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['email'], 'cache@example.com')
+
+    def test_profile_update_invalidates(self):
+        self.client.get('/api/auth/profile/')
+        self.client.patch('/api/auth/profile/', {'name': 'Renamed'}, format='json')
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['name'], 'Renamed')
+
+    def test_deactivation_invalidates(self):
+        self.client.get('/api/auth/profile/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 401)
+
+
+class RefreshTokenRevocationTests(TestCase):
+    """Rotated refresh tokens are revoked and cannot be used again."""
+
+    def setUp(self):
+        revocation_store.clear()
+        self.user = User.objects.create_user(email='rotate@example.com', name='Rotate', password='pass12345')
+        self.client = APIClient()
+        self.refresh = str(RefreshToken.for_user(self.user))
+
+    def refresh_token(self, token):
+        return self.client.post('/api/auth/token/refresh/', {'refresh': token}, format='json')
+
+    def test_rotation_revokes_old_token(self):
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.data['refresh'], self.refresh)
+        self.assertEqual(RevokedToken.objects.count(), 1)
+
+        self.assertEqual(self.refresh_token(self.refresh).status_code, 401)
+        self.assertEqual(self.refresh_token(response.data['refresh']).status_code, 200)
+
+    def test_unrevoked_token_check_skips_database(self):
+        revocation_store.is_revoked('warm-up')
+        with self.assertNumQueries(0):
+            self.assertFalse(revocation_store.is_revoked(RefreshToken(self.refresh)['jti']))
+
+    def test_other_process_revocations_are_picked_up(self):
+        jti = RefreshToken(self.refresh)['jti']
+        revocation_store.is_revoked(jti)
+        RevokedToken.objects.create(jti=jti, expires_at=timezone.now() + timedelta(days=1))
+        revocation_store._synced_at = 0
+        self.assertTrue(revocation_store.is_revoked(jti))
+
+    def test_purge_removes_only_expired(self):
+        now = timezone.now()
+        RevokedToken.objects.create(jti='old', expires_at=now - timedelta(minutes=1))
+        RevokedToken.objects.create(jti='live', expires_at=now + timedelta(days=1))
+        self.assertEqual(revocation_store.purge_expired(batch_size=1), 1)
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), ['live'])
+
+
+def throttle_rates(**rates):
+    return override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {**settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'], **rates},
+    })
+
+
+class LoginThrottleTests(TestCase):
+    """Login is limited per email and per IP, and shed when hashing is saturated."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, email, ip='10.0.0.1'):
+        return self.client.post(
+            '/api/auth/login/', {'email': email, 'password': 'wrong'}, format='json', REMOTE_ADDR=ip
+        )
+
+    @throttle_rates(login_email='2/min', login_ip='100/min')
+    def test_per_email_limit(self):
+        self.assertEqual(self.login('a@example.com', ip='10.0.0.1').status_code, 401)
+        self.assertEqual(self.login('A@example.com ', ip='10.0.0.2').status_code, 401)
+        response = self.login('a@example.com', ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.login('b@example.com').status_code, 401)
+
+    @throttle_rates(login_email='100/min', login_ip='2/min')
+    def test_per_ip_limit(self):
+        self.login('a@example.com')
+        self.login('b@example.com')
+        self.assertEqual(self.login('c@example.com').status_code, 429)
+        self.assertEqual(self.login('c@example.com', ip='10.0.0.9').status_code, 401)
+
+    @throttle_rates(password_hashing='1/min')
+    def test_sheds_load_when_hashing_budget_spent(self):
+        self.login('a@example.com')
+        with self.assertNumQueries(0):
+            response = self.login('b@example.com', ip='10.0.0.2')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+    @throttle_rates(login_email='100/min', login_ip='1/min', password_hashing='2/min')
+    def test_throttled_client_leaves_hashing_budget_alone(self):
+        self.assertEqual(self.login('a@example.com').status_code, 401)
+        for _ in range(5):
+            self.assertEqual(self.login('a@example.com').status_code, 429)
+        # One hash spent of two: another client still gets through
+        self.assertEqual(self.login('b@example.com', ip='10.0.0.2').status_code, 401)
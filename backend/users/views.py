@@ -4,14 +4,24 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
+from warranty_vault.throttling import (
+    HashingBudgetMixin,
+    LoginEmailThrottle,
+    LoginIPThrottle,
+    RegisterIPThrottle,
+    TokenRefreshIPThrottle,
+)
+from .revocation import revocation_store
 from .serializers import UserSerializer, RegisterSerializer, LoginSerializer
 
 
-class RegisterView(generics.CreateAPIView):
+class RegisterView(HashingBudgetMixin, generics.CreateAPIView):
     """User registration endpoint."""
     
     permission_classes = (AllowAny,)
+    throttle_classes = (RegisterIPThrottle,)
     serializer_class = RegisterSerializer
     
     def create(self, request, *args, **kwargs):
@@ -29,10 +39,11 @@ class RegisterView(generics.CreateAPIView):
         }, status=status.HTTP_201_CREATED)
 
 
-class LoginView(APIView):
+class LoginView(HashingBudgetMixin, APIView):
     """User login endpoint."""
     
     permission_classes = (AllowAny,)
+    throttle_classes = (LoginIPThrottle, LoginEmailThrottle)
     serializer_class = LoginSerializer
     
     def post(self, request):
@@ -74,6 +85,7 @@ class TokenRefreshView(APIView):
     """Token refresh endpoint."""
     
     permission_classes = (AllowAny,)
+    throttle_classes = (TokenRefreshIPThrottle,)
     
     def post(self, request):
         try:
@@ -85,10 +97,23 @@ class TokenRefreshView(APIView):
                 )
             
             refresh = RefreshToken(refresh_token)
-            return Response({
-                'access': str(refresh.access_token),
-                'refresh': str(refresh),
-            })
+            jti = refresh[api_settings.JTI_CLAIM]
+            if revocation_store.is_revoked(jti):
+                raise TokenError('Token is blacklisted')
+
+            data = {'access': str(refresh.access_token)}
+
+            if api_settings.ROTATE_REFRESH_TOKENS:
+                # The unique insert fails if another request already rotated
+                # this token, so a refresh token can only be used once.
+                if not revocation_store.revoke(jti, refresh['exp']):
+                    raise TokenError('Token is blacklisted')
+                refresh.set_jti()
+                refresh.set_exp()
+                refresh.set_iat()
+
+            data['refresh'] = str(refresh)
+            return Response(data)
         except (InvalidToken, TokenError):
             return Response(
                 {'error': 'Invalid refresh token'},
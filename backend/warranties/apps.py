@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WarrantiesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'warranties'
+
+    def ready(self):
+        from warranty_vault import slow_queries
+        slow_queries.install()
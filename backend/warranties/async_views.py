@@ -0,0 +1,47 @@
+"""
+Async (ASGI) versions of the read-heavy warranty endpoints.
+
+Same URLs, serializers, pagination, throttles and responses as the DRF
+views in views.py, which still handle writes; see warranty_vault.async_api.
+Routed instead of the DRF views when ASYNC_READ_VIEWS is on.
+"""
+
+from datetime import date
+
+from rest_framework import status
+from rest_framework.permissions import AllowAny
+
+from warranty_vault.async_api import async_api_view, json_response, paginate
+from warranty_vault.throttling import PublicShareIPThrottle, ShareTokenThrottle
+from .models import Warranty
+from .serializers import PublicWarrantySerializer, WarrantyListSerializer
+from .views import WarrantyViewSet, format_stats, stats_aggregates
+
+
+@async_api_view(fallback=WarrantyViewSet.as_view({'get': 'list', 'post': 'create'}))
+async def warranty_list(request):
+    """GET warranties/: the user's warranties, paginated."""
+    return await paginate(
+        request,
+        Warranty.objects.filter(user_id=request.user.pk).values_list(*WarrantyListSerializer.value_fields),
+        WarrantyListSerializer.serialize_values,
+    )
+
+
+@async_api_view()
+async def warranty_stats(request):
+    """GET warranties/stats/: dashboard counts."""
+    counts = await Warranty.objects.filter(user_id=request.user.pk).aaggregate(**stats_aggregates(date.today()))
+    return format_stats(counts)
+
+
+@async_api_view(permission_classes=(AllowAny,), throttle_classes=(PublicShareIPThrottle, ShareTokenThrottle))
+async def public_warranty(request, share_token):
+    """GET share/<token>/: a shared warranty, no authentication required."""
+    try:
+        warranty = await Warranty.objects.aget(share_token=share_token)
+    except Warranty.DoesNotExist:
+        return json_response(
+            {'error': 'Warranty not found or link is invalid'}, status=status.HTTP_404_NOT_FOUND
+        )
+    return PublicWarrantySerializer(warranty, context={'request': request}).data
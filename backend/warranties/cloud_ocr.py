@@ -0,0 +1,216 @@
+"""
+Client for the OCR.space cloud OCR API.
+
+One client is shared per process so uploads reuse pooled HTTPS connections.
+Images are downscaled and recompressed before upload, concurrent calls are
+capped, and a circuit breaker stops calling the API after repeated failures
+so callers can fall back to local Tesseract straight away.
+"""
+
+import io
+import threading
+import time
+
+import requests
+from django.conf import settings
+from PIL import Image, ImageOps
+from requests.adapters import HTTPAdapter
+
+
+MIME_TYPES = {
+    'JPEG': 'image/jpeg',
+    'PNG': 'image/png',
+    'BMP': 'image/bmp',
+    'TIFF': 'image/tiff',
+}
+
+
+class CloudOCRError(Exception):
+    """The cloud OCR API could not extract text from an image."""
+
+
+class CloudOCRUnavailable(CloudOCRError):
+    """The cloud OCR API is not being called (circuit open or too busy)."""
+
+
+class CircuitBreaker:
+    """
+    Minimal thread-safe circuit breaker.
+
+    Closed: calls go through. After `failure_threshold` consecutive failures
+    it opens and rejects calls for `reset_timeout` seconds, then lets a
+    single trial call through (half-open); success closes it again, failure
+    reopens it.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=60, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Return True if a call may be made now."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def cancel(self):
+        """Give back a call allow() granted but that was never made."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+            self._trial_in_flight = False
+
+
+def prepare_image(image_path, max_dimension=2000, jpeg_quality=80):
+    """
+    Return (bytes, mime_type, filename) to upload for an image file.
+
+    The image is rotated per its EXIF orientation, converted to grayscale,
+    shrunk to fit `max_dimension` and re-encoded as JPEG. The original file
+    is sent instead when it is already small enough and no larger.
+    """
+    with open(image_path, 'rb') as f:
+        original = f.read()
+
+    with Image.open(io.BytesIO(original)) as image:
+        original_format = image.format
+        needs_resize = max(image.size) > max_dimension
+        image = ImageOps.exif_transpose(image).convert('L')
+        if needs_resize:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=jpeg_quality, optimize=True)
+        compressed = buffer.getvalue()
+
+    if not needs_resize and original_format in ('JPEG', 'PNG') and len(original) <= len(compressed):
+        extension = 'jpg' if original_format == 'JPEG' else 'png'
+        return original, MIME_TYPES[original_format], f'receipt.{extension}'
+    return compressed, MIME_TYPES['JPEG'], 'receipt.jpg'
+
+
+class CloudOCRClient:
+    """Pooled, size-aware and circuit-broken OCR.space client."""
+
+    def __init__(self, api_key, api_url, timeout=(5, 30), max_concurrency=4,
+                 max_dimension=2000, breaker=None, acquire_timeout=10):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_dimension = max_dimension
+        self.acquire_timeout = acquire_timeout
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def extract_text(self, image_path):
+        """Upload an image and return the parsed text."""
+        # Ask the breaker first: an image is only prepared for a call that goes out
+        if not self.breaker.allow():
+            raise CloudOCRUnavailable('Cloud OCR temporarily disabled after repeated failures')
+        try:
+            content, mime_type, filename = prepare_image(image_path, self.max_dimension)
+            if not self._slots.acquire(timeout=self.acquire_timeout):
+                raise CloudOCRUnavailable('Too many concurrent cloud OCR requests')
+        except BaseException:
+            self.breaker.cancel()
+            raise
+        try:
+            result = self._post(content, mime_type, filename)
+        finally:
+            self._slots.release()
+
+        if result.get('IsErroredOnProcessing'):
+            raise CloudOCRError(f"Cloud OCR error: {result.get('ErrorMessage', 'Unknown error')}")
+        if result.get('ParsedResults'):
+            return result['ParsedResults'][0].get('ParsedText', '')
+        raise CloudOCRError('No text extracted from image')
+
+    def _post(self, content, mime_type, filename):
+        """POST the image; transport errors, 429 and 5xx count against the breaker."""
+        try:
+            response = self.session.post(
+                self.api_url,
+                data={
+                    'apikey': self.api_key,
+                    'language': 'eng',
+                    'isOverlayRequired': False,
+                    'detectOrientation': True,
+                    'scale': True,
+                    'OCREngine': 2,
+                    'filetype': filename.rsplit('.', 1)[-1].upper(),
+                },
+                files={'file': (filename, content, mime_type)},
+                timeout=self.timeout,
+            )
+            if response.status_code == 429 or response.status_code >= 500:
+                raise CloudOCRError(f'Cloud OCR returned HTTP {response.status_code}')
+            result = response.json()
+        except (requests.RequestException, ValueError, CloudOCRError) as e:
+            self.breaker.record_failure()
+            if isinstance(e, CloudOCRError):
+                raise
+            raise CloudOCRError(f'Cloud OCR request failed: {e}') from e
+
+        self.breaker.record_success()
+        return result
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_cloud_ocr_client():
+    """Return the process-wide client configured from settings."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = CloudOCRClient(
+                    api_key=settings.OCR_API_KEY,
+                    api_url=settings.OCR_API_URL,
+                    timeout=(settings.OCR_API_CONNECT_TIMEOUT, settings.OCR_API_READ_TIMEOUT),
+                    max_concurrency=settings.OCR_CLOUD_MAX_CONCURRENCY,
+                    max_dimension=settings.OCR_CLOUD_MAX_DIMENSION,
+                    breaker=CircuitBreaker(
+                        failure_threshold=settings.OCR_CIRCUIT_FAILURE_THRESHOLD,
+                        reset_timeout=settings.OCR_CIRCUIT_RESET_SECONDS,
+                    ),
+                )
+    return _client
@@ -0,0 +1,123 @@
+"""
+iCalendar (RFC 5545) feed of a user's warranty expiries.
+
+Calendar apps poll subscribed feeds every few minutes, so a poll is made to
+cost one indexed query. `feed_state()` looks up the feed token and, in the
+same query, the user's warranty count and latest `updated_at`: a version
+stamp that changes with every create, edit and delete. The ETag is derived
+from it, so an unchanged feed is answered 304 without reading a single
+warranty, and the body is cached under it. Only when the stamp moves is the
+feed rebuilt, from a values_list() iterator over the (user, expiry_date)
+index.
+
+`?alarms=1` adds a reminder to each event at the in-app notification
+thresholds (notifications.services.check_warranties_and_notify).
+"""
+
+import hashlib
+from datetime import timedelta, timezone
+
+from django.db.models import Count, Max
+
+from .models import CalendarFeed, Warranty
+
+
+# Bump when the generated text changes, so cached bodies and ETags go stale
+FORMAT_VERSION = 1
+# Days before expiry of the 30_days ... 1_day notifications, and 0 for expired
+ALARM_DAYS = (30, 20, 10, 3, 2, 1, 0)
+UID_DOMAIN = 'digital-warranty-vault'
+CHUNK_SIZE = 500
+
+
+def feed_state(token, alarms=False):
+    """(user id, version digest) for a feed token, or None if no feed has it."""
+    state = (
+        CalendarFeed.objects.filter(token=token)
+        .values_list('user_id')
+        .annotate(count=Count('user__warranties'), updated=Max('user__warranties__updated_at'))
+    )
+    if not state:
+        return None
+    user_id, count, updated = state[0]
+    stamp = f'{FORMAT_VERSION}:{user_id}:{count}:{updated.timestamp() if updated else 0}:{alarms:d}'
+    return user_id, hashlib.sha1(stamp.encode()).hexdigest()
+
+
+def escape_text(value):
+    """TEXT value escaping (RFC 5545 3.3.11)."""
+    return (
+        value.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '\\n')
+    )
+
+
+def fold(line):
+    """Encode a content line, folded at 75 octets without splitting a character."""
+    data = line.encode()
+    if len(data) <= 75:
+        return data + b'\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        # Back off to the start of a UTF-8 sequence
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end])
+        start, limit = end, 74  # continuation lines begin with a space
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def format_date(value):
+    return value.strftime('%Y%m%d')
+
+
+def format_datetime(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def event_lines(pk, product_name, brand, category, purchase_date, expiry_date, updated_at, alarms):
+    summary = escape_text(f'Warranty expires: {product_name}')
+    yield 'BEGIN:VEVENT'
+    yield f'UID:warranty-{pk}@{UID_DOMAIN}'
+    yield f'DTSTAMP:{format_datetime(updated_at)}'
+    yield f'DTSTART;VALUE=DATE:{format_date(expiry_date)}'
+    yield f'DTEND;VALUE=DATE:{format_date(expiry_date + timedelta(days=1))}'
+    yield f'SUMMARY:{summary}'
+    yield 'DESCRIPTION:' + escape_text(
+        f'Brand: {brand}\nCategory: {category}\nPurchased: {purchase_date.isoformat()}'
+    )
+    yield 'TRANSP:TRANSPARENT'
+    if alarms:
+        for days in ALARM_DAYS:
+            yield 'BEGIN:VALARM'
+            yield 'ACTION:DISPLAY'
+            yield f'DESCRIPTION:{summary}'
+            yield f'TRIGGER:-P{days}D' if days else 'TRIGGER:PT0S'
+            yield 'END:VALARM'
+    yield 'END:VEVENT'
+
+
+def render_feed(user_id, alarms=False):
+    """The feed as bytes, built row by row from an iterator over the user's warranties."""
+    rows = (
+        Warranty.objects.filter(user_id=user_id, expiry_date__isnull=False)
+        .order_by('expiry_date', 'pk')
+        .values_list('pk', 'product_name', 'brand', 'category', 'purchase_date', 'expiry_date', 'updated_at')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    header = (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Digital Warranty Vault//Warranty Expiries//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Warranty expiries',
+        'REFRESH-INTERVAL;VALUE=DURATION:PT1H',
+        'X-PUBLISHED-TTL:PT1H',
+    )
+    chunks = [fold(line) for line in header]
+    for row in rows:
+        chunks.extend(fold(line) for line in event_lines(*row, alarms=alarms))
+    chunks.append(fold('END:VCALENDAR'))
+    return b''.join(chunks)
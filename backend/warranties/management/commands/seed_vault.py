@@ -0,0 +1,57 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from warranties.seeding import SEED_EMAIL_DOMAIN, SEED_PASSWORD, VaultSeeder
+
+
+class Command(BaseCommand):
+    help = 'Generate seed users with warranties and notification history for benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--warranties-per-user', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Same seed and --today give the same data')
+        parser.add_argument('--today', type=date.fromisoformat, default=None,
+                            help='Date the data is generated around (YYYY-MM-DD, default today)')
+        parser.add_argument('--history-days', type=int, default=365,
+                            help='Create the expiry alerts that fired within this many days')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Warranties written per transaction')
+        parser.add_argument('--no-copy', action='store_true',
+                            help="Use batched INSERTs even on PostgreSQL")
+
+    def handle(self, *args, **options):
+        for option, minimum in (('users', 1), ('warranties_per_user', 0), ('batch_size', 1)):
+            if options[option] < minimum:
+                raise CommandError(f'--{option.replace("_", "-")} must be at least {minimum}')
+
+        seeder = VaultSeeder(
+            seed=options['seed'],
+            today=options['today'],
+            warranties_per_user=options['warranties_per_user'],
+            history_days=options['history_days'],
+            batch_size=options['batch_size'],
+            use_copy=not options['no_copy'],
+        )
+        self.stdout.write(
+            f'Seeding {options["users"]} users x {options["warranties_per_user"]} warranties '
+            f'around {seeder.today} with {"COPY" if seeder.uses_copy else "batched INSERTs"}...'
+        )
+
+        def progress(result):
+            rate = result.warranties / result.seconds if result.seconds else 0
+            self.stdout.write(
+                f'  {result.users} users, {result.warranties} warranties, '
+                f'{result.notifications} notifications ({rate:,.0f} warranties/s)'
+            )
+
+        result = seeder.run(options['users'], progress=progress if options['verbosity'] > 1 else None)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[SUCCESS] Created {result.users} users, {result.warranties} warranties and '
+                f'{result.notifications} notifications in {result.seconds:.1f}s '
+                f'(emails seed<N>@{SEED_EMAIL_DOMAIN}, password "{SEED_PASSWORD}")'
+            )
+        )
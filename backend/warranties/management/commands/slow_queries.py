@@ -0,0 +1,73 @@
+import argparse
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from warranty_vault.slow_queries import capture, log, summarize
+
+
+class Command(BaseCommand):
+    help = 'Show captured slow queries, or run a command and show the ones it issued'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20, help='Rows to show')
+        parser.add_argument('--group', action='store_true',
+                            help='Group by normalized statement, biggest total time first')
+        parser.add_argument('--json', action='store_true', help='Print the entries as JSON')
+        parser.add_argument('--clear', action='store_true', help='Empty the buffers')
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='With --run: capture statements slower than this many ms')
+        parser.add_argument('--run', nargs=argparse.REMAINDER, metavar='COMMAND',
+                            help='Run this management command (and its arguments) under capture')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            log.clear()
+            self.stdout.write(self.style.SUCCESS('[SUCCESS] Slow query buffers cleared'))
+            return
+
+        if options['run']:
+            name, *command_args = options['run']
+            if name == 'slow_queries':
+                raise CommandError('slow_queries cannot run itself')
+            source = f'manage.py {name}'
+            with capture(options['threshold'], source):
+                call_command(name, *command_args, stdout=self.stderr)
+            entries = [entry for entry in log.entries() if entry['source'] == source]
+        else:
+            if not settings.SLOW_QUERY_DIR:
+                self.stderr.write(
+                    'SLOW_QUERY_DIR is not set, so other processes\' queries are not visible here; '
+                    'use /admin/slow-queries/ or --run.'
+                )
+            entries = log.collect()
+
+        if options['group']:
+            rows = summarize(entries)[:options['limit']]
+        else:
+            rows = entries[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+        if not rows:
+            self.stdout.write(self.style.WARNING('No slow queries recorded.'))
+            return
+        if options['group']:
+            for group in rows:
+                self.stdout.write(
+                    f'{group["count"]:>6}x {group["total_ms"]:>10.1f} ms total {group["max_ms"]:>9.1f} ms max  '
+                    f'{", ".join(group["sources"])}\n'
+                    f'        {group["normalized"]}\n'
+                    f'        from {", ".join(group["frames"])}'
+                )
+        else:
+            for entry in rows:
+                at = datetime.fromtimestamp(entry['at']).strftime('%Y-%m-%d %H:%M:%S')
+                self.stdout.write(
+                    f'{at} {entry["duration_ms"]:>9.1f} ms  {entry["source"]}  {entry["frame"]}\n'
+                    f'        {entry["sql"]}\n'
+                    f'        params {entry["params"]}'
+                )
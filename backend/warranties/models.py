@@ -1,9 +1,23 @@
 from django.db import models
 from django.conf import settings
-from datetime import date
+from datetime import date, timedelta
+import calendar
 import uuid
 
 
+def calculate_expiry_date(purchase_date, warranty_period, warranty_period_unit='months'):
+    """Add a warranty period (days or months) to a purchase date."""
+    if warranty_period_unit == 'days':
+        # For days, simply add the number of days
+        return purchase_date + timedelta(days=warranty_period)
+    # For months, clamp the day to the length of the target month
+    month = purchase_date.month - 1 + warranty_period
+    year = purchase_date.year + month // 12
+    month = month % 12 + 1
+    day = min(purchase_date.day, calendar.monthrange(year, month)[1])
+    return date(year, month, day)
+
+
 class Warranty(models.Model):
     """Warranty model for storing product warranty information."""
     
@@ -45,6 +59,30 @@ class Warranty(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields save() compares against their stored values
+    EXPIRY_FIELDS = ('purchase_date', 'warranty_period', 'warranty_period_unit', 'expiry_date')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored values so save() need not read the row again
+        loaded = instance.__dict__
+        if all(name in loaded for name in cls.EXPIRY_FIELDS):
+            instance._loaded_expiry_fields = {name: loaded[name] for name in cls.EXPIRY_FIELDS}
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using, fields, **kwargs)
+        # from_db() ran on a copy: keep what was reloaded, and forget values
+        # that may no longer match the row so save() reads it again
+        loaded = self.__dict__
+        if (fields is None or set(self.EXPIRY_FIELDS) <= set(fields)) and all(
+            name in loaded for name in self.EXPIRY_FIELDS
+        ):
+            self._loaded_expiry_fields = {name: loaded[name] for name in self.EXPIRY_FIELDS}
+        else:
+            loaded.pop('_loaded_expiry_fields', None)
+
     def save(self, *args, **kwargs):
         # Check if this is an update (has pk) or a new instance
         is_update = self.pk is not None
@@ -52,7 +90,11 @@ class Warranty(models.Model):
         if is_update:
             # Get the old instance to compare
             try:
-                old_instance = Warranty.objects.get(pk=self.pk)
+                loaded = getattr(self, '_loaded_expiry_fields', None)
+                if loaded is not None:
+                    old_instance = Warranty(**loaded)
+                else:
+                    old_instance = Warranty.objects.get(pk=self.pk)
                 # Check if warranty_period or purchase_date changed
                 period_changed = old_instance.warranty_period != self.warranty_period
                 date_changed = old_instance.purchase_date != self.purchase_date
@@ -72,28 +114,21 @@ class Warranty(models.Model):
                 self.expiry_date = self.calculate_expiry_date()
         
         super().save(*args, **kwargs)
+        self._loaded_expiry_fields = {name: getattr(self, name) for name in self.EXPIRY_FIELDS}
 
     def calculate_expiry_date(self):
         """Calculate expiry date based on purchase date and warranty period (days or months)."""
-        from datetime import timedelta
-        import calendar
-        
-        if self.warranty_period_unit == 'days':
-            # For days, simply add the number of days
-            return self.purchase_date + timedelta(days=self.warranty_period)
-        else:
-            # For months, use the existing logic
-            month = self.purchase_date.month - 1 + self.warranty_period
-            year = self.purchase_date.year + month // 12
-            month = month % 12 + 1
-            day = min(self.purchase_date.day, calendar.monthrange(year, month)[1])
-            return date(year, month, day)
+        return calculate_expiry_date(self.purchase_date, self.warranty_period, self.warranty_period_unit)
     
     class Meta:
         db_table = 'warranties'
         verbose_name = 'Warranty'
         verbose_name_plural = 'Warranties'
         ordering = ['-created_at']
+        indexes = [
+            # A user's warranties by expiry: the calendar feed, the stats counts
+            models.Index(fields=['user', 'expiry_date'], name='warranties_user_expiry_idx'),
+        ]
     
     def __str__(self):
         return f"{self.product_name} - {self.brand}"
@@ -120,3 +155,28 @@ class Warranty(models.Model):
         if self.expiry_date < today:
             return 0
         return (self.expiry_date - today).days
+
+
+class CalendarFeed(models.Model):
+    """
+    A user's subscribable calendar of warranty expiries (warranties.ics).
+
+    The token in the feed URL is its only credential; rotating it revokes
+    every existing subscription.
+    """
+    
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='calendar_feed'
+    )
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'calendar_feeds'
+        verbose_name = 'Calendar Feed'
+        verbose_name_plural = 'Calendar Feeds'
+    
+    def __str__(self):
+        return f"Calendar feed of {self.user_id}"
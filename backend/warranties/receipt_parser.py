@@ -0,0 +1,314 @@
+"""
+Receipt text parsing for the OCR pipeline.
+
+`ReceiptTextParser` holds the original field parsers. `CompiledReceiptParser`
+extracts the same fields with precompiled patterns and without strptime(),
+and is what `ReceiptOCRService.parse_receipt` uses. Both must produce
+identical output; see `warranties/tests.py` for the regression corpus and
+`benchmarks/bench_receipt_parser.py` for throughput.
+"""
+
+import calendar
+import re
+from datetime import date, datetime
+
+
+CATEGORY_KEYWORDS = {
+    'Electronics': ['laptop', 'computer', 'phone', 'mobile', 'tablet', 'camera', 'headphone',
+                   'speaker', 'monitor', 'keyboard', 'mouse', 'printer', 'scanner', 'tv',
+                   'television', 'smartwatch', 'earbuds', 'charger', 'electronics'],
+    'Home Appliances': ['refrigerator', 'fridge', 'washing machine', 'washer', 'dryer',
+                       'microwave', 'oven', 'dishwasher', 'vacuum', 'air conditioner', 'ac',
+                       'heater', 'fan', 'blender', 'mixer', 'toaster', 'appliance'],
+    'Furniture': ['sofa', 'couch', 'chair', 'table', 'desk', 'bed', 'mattress', 'cabinet',
+                 'shelf', 'wardrobe', 'furniture', 'dresser'],
+    'Automotive': ['car', 'vehicle', 'auto', 'tire', 'battery', 'automotive', 'motorcycle',
+                  'bike', 'scooter'],
+    'Accessories': ['watch', 'bag', 'wallet', 'belt', 'sunglasses', 'jewelry', 'accessory'],
+}
+
+WARRANTY_KEYWORDS = ['warranty', 'guarantee', 'coverage', 'protection plan']
+
+DATE_FORMATS = ['%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d', '%m-%d-%Y', '%d-%m-%Y', '%Y-%m-%d', '%B %d, %Y', '%b %d, %Y']
+
+
+class ReceiptTextParser:
+    """Reference field parsers. Each method rescans the whole text."""
+
+    CATEGORY_KEYWORDS = CATEGORY_KEYWORDS
+    WARRANTY_KEYWORDS = WARRANTY_KEYWORDS
+
+    def parse_product_name(self, text):
+        """Extract product name from receipt text."""
+        lines = text.split('\n')
+        # Look for product names (usually in first few lines or after keywords)
+        for line in lines[:15]:  # Check first 15 lines
+            line = line.strip()
+            if len(line) > 3 and not line.isdigit() and not re.match(r'^\d+[\/\-]\d+', line):
+                # Skip lines that are just dates, prices, or store names
+                if not re.search(r'^\$?\d+\.?\d*$', line) and not re.search(r'receipt|invoice|bill', line, re.I):
+                    # This might be a product name
+                    if len(line) > 5:
+                        return line[:100]  # Limit length
+        return ""
+
+    def parse_brand(self, text):
+        """Extract brand name from receipt text."""
+        # Common brand indicators
+        brand_patterns = [
+            r'brand[:\s]+([A-Za-z0-9\s]+)',
+            r'manufacturer[:\s]+([A-Za-z0-9\s]+)',
+            r'make[:\s]+([A-Za-z0-9\s]+)',
+        ]
+
+        for pattern in brand_patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                return match.group(1).strip()[:50]
+
+        # If no explicit brand, try to find capitalized words
+        words = text.split()
+        for word in words[:20]:
+            if word.isupper() and len(word) > 2:
+                return word[:50]
+
+        return ""
+
+    def parse_date(self, text):
+        """Extract purchase date from receipt text."""
+        # Common date patterns
+        date_patterns = [
+            r'(\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4})',  # MM/DD/YYYY or DD/MM/YYYY
+            r'(\d{4}[\/\-]\d{1,2}[\/\-]\d{1,2})',    # YYYY/MM/DD
+            r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{4}',  # Month DD, YYYY
+        ]
+
+        for pattern in date_patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                date_str = match.group(0)
+                # Try to parse the date
+                try:
+                    # Try different date formats
+                    for fmt in DATE_FORMATS:
+                        try:
+                            parsed_date = datetime.strptime(date_str, fmt)
+                            return parsed_date.strftime('%Y-%m-%d')
+                        except:
+                            continue
+                except:
+                    pass
+
+        # Default to today if no date found
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def parse_warranty_period(self, text):
+        """Extract warranty period from receipt text."""
+        # Look for warranty period patterns
+        warranty_patterns = [
+            r'(\d+)\s*year[s]?\s*warranty',
+            r'(\d+)\s*month[s]?\s*warranty',
+            r'warranty[:\s]+(\d+)\s*year[s]?',
+            r'warranty[:\s]+(\d+)\s*month[s]?',
+            r'(\d+)\s*yr[s]?\s*warranty',
+        ]
+
+        for pattern in warranty_patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                period = int(match.group(1))
+                # Check if it's years or months
+                if 'year' in match.group(0).lower() or 'yr' in match.group(0).lower():
+                    return period * 12  # Convert years to months
+                return period
+
+        # Default to 12 months if not found
+        return 12
+
+    def detect_category(self, text):
+        """Auto-detect product category based on keywords."""
+        text_lower = text.lower()
+
+        # Count keyword matches for each category
+        category_scores = {}
+        for category, keywords in self.CATEGORY_KEYWORDS.items():
+            score = sum(1 for keyword in keywords if keyword in text_lower)
+            if score > 0:
+                category_scores[category] = score
+
+        # Return category with highest score
+        if category_scores:
+            return max(category_scores, key=category_scores.get)
+
+        return 'Other'
+
+    def extract(self, text):
+        """Run every field parser over the text."""
+        return {
+            'product_name': self.parse_product_name(text),
+            'brand': self.parse_brand(text),
+            'purchase_date': self.parse_date(text),
+            'warranty_period': self.parse_warranty_period(text),
+            'category': self.detect_category(text),
+        }
+
+
+# Patterns used by ReceiptTextParser, compiled once and kept in priority order.
+_LEADING_DATE_RE = re.compile(r'^\d+[\/\-]\d+')
+_PRICE_RE = re.compile(r'^\$?\d+\.?\d*$')
+_DOCUMENT_WORD_RE = re.compile(r'receipt|invoice|bill', re.I)
+_BRAND_RES = [
+    re.compile(r'brand[:\s]+([A-Za-z0-9\s]+)', re.IGNORECASE),
+    re.compile(r'manufacturer[:\s]+([A-Za-z0-9\s]+)', re.IGNORECASE),
+    re.compile(r'make[:\s]+([A-Za-z0-9\s]+)', re.IGNORECASE),
+]
+_NUMERIC_DATE_RES = [
+    re.compile(r'\d{1,2}[\/\-]\d{1,2}[\/\-]\d{2,4}'),
+    re.compile(r'\d{4}[\/\-]\d{1,2}[\/\-]\d{1,2}'),
+]
+_TEXT_DATE_RE = re.compile(r'(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{4}', re.IGNORECASE)
+_WARRANTY_RES = [
+    (re.compile(r'(\d+)\s*year[s]?\s*warranty', re.IGNORECASE), 12),
+    (re.compile(r'(\d+)\s*month[s]?\s*warranty', re.IGNORECASE), 1),
+    (re.compile(r'warranty[:\s]+(\d+)\s*year[s]?', re.IGNORECASE), 12),
+    (re.compile(r'warranty[:\s]+(\d+)\s*month[s]?', re.IGNORECASE), 1),
+    (re.compile(r'(\d+)\s*yr[s]?\s*warranty', re.IGNORECASE), 12),
+]
+
+# strptime's own sub-expressions for %m, %d and %Y, so a matched date string
+# is accepted or rejected exactly as datetime.strptime() would.
+_MONTH = r'1[0-2]|0[1-9]|[1-9]'
+_DAY = r'3[01]|[12]\d|0[1-9]|[1-9]| [1-9]'
+_YEAR = r'\d\d\d\d'
+
+
+def _numeric_date_re(sep, order):
+    parts = {'m': f'(?P<m>{_MONTH})', 'd': f'(?P<d>{_DAY})', 'Y': f'(?P<Y>{_YEAR})'}
+    return re.compile(re.escape(sep).join(parts[key] for key in order), re.IGNORECASE)
+
+
+def _month_names_re(names):
+    names = sorted((name.lower() for name in names if name), key=len, reverse=True)
+    return f'(?P<month>{"|".join(names)})'
+
+
+# DATE_FORMATS grouped by the only date strings they can ever accept, in the
+# original order: numeric formats by separator, month-name formats for the
+# "Month DD, YYYY" pattern.
+_NUMERIC_DATE_FORMATS = {
+    sep: [_numeric_date_re(sep, 'mdY'), _numeric_date_re(sep, 'dmY'), _numeric_date_re(sep, 'Ymd')]
+    for sep in '/-'
+}
+_TEXT_DATE_FORMATS = [
+    re.compile(f'{_month_names_re(names)}\\s+(?P<d>{_DAY}),\\s+(?P<Y>{_YEAR})', re.IGNORECASE)
+    for names in (calendar.month_name, calendar.month_abbr)
+]
+_MONTH_NUMBERS = {
+    name.lower(): number
+    for names in (calendar.month_name, calendar.month_abbr)
+    for number, name in enumerate(names) if name
+}
+
+
+def _parse_date_string(date_str, formats):
+    """Return the ISO date for the first format accepting date_str, or None."""
+    for date_format in formats:
+        match = date_format.fullmatch(date_str)
+        if not match:
+            continue
+        parts = match.groupdict()
+        # IGNORECASE also accepts non-ASCII case variants such as "ſep",
+        # which strptime then rejects when looking the lowered name up.
+        month = int(parts['m']) if 'm' in parts else _MONTH_NUMBERS.get(parts['month'].lower())
+        if month is None:
+            continue
+        try:
+            return date(int(parts['Y']), month, int(parts['d'])).strftime('%Y-%m-%d')
+        except ValueError:
+            continue
+    return None
+
+
+class CompiledReceiptParser:
+    """
+    Fast receipt field extractor.
+
+    Gives the same results as `ReceiptTextParser.extract`. Patterns are
+    compiled once, the lowered text is shared between fields, patterns whose
+    required literal is absent are skipped, and matched dates are checked
+    against only the formats that can accept them instead of strptime().
+    """
+
+    def __init__(self, category_keywords=None):
+        self.category_keywords = category_keywords or CATEGORY_KEYWORDS
+
+    def extract(self, text):
+        """Extract product name, brand, purchase date, warranty period and category."""
+        text_lower = text.lower()
+        return {
+            'product_name': self.parse_product_name(text),
+            'brand': self.parse_brand(text, text_lower),
+            'purchase_date': self.parse_date(text),
+            'warranty_period': self.parse_warranty_period(text, text_lower),
+            'category': self.detect_category(text_lower),
+        }
+
+    def parse_product_name(self, text):
+        """Return the first plausible product line among the first 15 lines."""
+        for line in text.split('\n', 15)[:15]:
+            line = line.strip()
+            if (len(line) > 5 and not line.isdigit() and not _LEADING_DATE_RE.match(line)
+                    and not _PRICE_RE.search(line) and not _DOCUMENT_WORD_RE.search(line)):
+                return line[:100]
+        return ""
+
+    def parse_brand(self, text, text_lower):
+        """Return the value after brand/manufacturer/make, else the first all-caps word."""
+        if 'brand' in text_lower or 'manufacturer' in text_lower or 'make' in text_lower:
+            for pattern in _BRAND_RES:
+                match = pattern.search(text)
+                if match:
+                    return match.group(1).strip()[:50]
+
+        for word in text.split(maxsplit=20)[:20]:
+            if word.isupper() and len(word) > 2:
+                return word[:50]
+        return ""
+
+    def parse_date(self, text):
+        """Return the purchase date as YYYY-MM-DD, defaulting to today."""
+        if '/' in text or '-' in text:
+            for pattern in _NUMERIC_DATE_RES:
+                match = pattern.search(text)
+                if match:
+                    date_str = match.group(0)
+                    parsed = _parse_date_string(date_str, _NUMERIC_DATE_FORMATS['/' if '/' in date_str else '-'])
+                    if parsed:
+                        return parsed
+
+        match = _TEXT_DATE_RE.search(text)
+        if match:
+            parsed = _parse_date_string(match.group(0), _TEXT_DATE_FORMATS)
+            if parsed:
+                return parsed
+
+        return datetime.now().strftime('%Y-%m-%d')
+
+    def parse_warranty_period(self, text, text_lower):
+        """Return the warranty period in months, defaulting to 12."""
+        if 'warranty' in text_lower:
+            for pattern, months in _WARRANTY_RES:
+                match = pattern.search(text)
+                if match:
+                    return int(match.group(1)) * months
+        return 12
+
+    def detect_category(self, text_lower):
+        """Return the category with the most distinct keywords present."""
+        best_category, best_score = 'Other', 0
+        contains = text_lower.__contains__
+        for category, keywords in self.category_keywords.items():
+            score = sum(map(contains, keywords))
+            if score > best_score:
+                best_category, best_score = category, score
+        return best_category
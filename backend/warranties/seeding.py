@@ -0,0 +1,285 @@
+"""
+Deterministic large-scale test data (`manage.py seed_vault`).
+
+Every seeded user draws its profile, warranties and notification history
+from a random.Random seeded with (seed, user index), so the same --seed and
+--today give the same rows whatever the batch size or how many runs the
+users were split over. Rows are built as plain tuples and written in
+batches of single-row INSERTs through executemany(), or with COPY on
+PostgreSQL (psycopg2).
+
+Notifications are inserted directly, like another process's would be:
+unread counters are written alongside, but no delta sync log rows.
+"""
+
+import csv
+import io
+import random
+import uuid
+from bisect import bisect
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import accumulate
+from time import monotonic
+from types import SimpleNamespace
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+
+from notifications.models import Notification, UnreadCounter
+from notifications.services import get_notification_message
+from users.models import User
+
+from .models import Warranty, calculate_expiry_date
+
+
+SEED_EMAIL_DOMAIN = 'seed.warrantyvault.test'
+SEED_PASSWORD = 'seed-password'
+
+# category: (weight, [(brand, [products])])
+CATALOGUE = {
+    'Electronics': (40, [
+        ('Samsung', ['Galaxy S23', '55" QLED TV', 'Galaxy Tab S9', 'Soundbar HW-Q700']),
+        ('Apple', ['iPhone 15', 'MacBook Air M2', 'iPad Air', 'AirPods Pro']),
+        ('Sony', ['WH-1000XM5 Headphones', 'PlayStation 5', 'Bravia 65" TV']),
+        ('Dell', ['XPS 13 Laptop', 'UltraSharp 27" Monitor']),
+        ('LG', ['OLED C3 TV', 'Gram 16 Laptop']),
+        ('Canon', ['EOS R50 Camera', 'PIXMA Printer']),
+    ]),
+    'Home Appliances': (22, [
+        ('Bosch', ['Series 6 Dishwasher', 'Front Load Washing Machine']),
+        ('LG', ['Refrigerator 26 cu ft', 'Microwave Oven']),
+        ('Dyson', ['V15 Vacuum Cleaner', 'Pure Cool Fan']),
+        ('Whirlpool', ['Tumble Dryer', 'Split Air Conditioner']),
+        ('Philips', ['Air Fryer XXL', 'Steam Iron']),
+    ]),
+    'Furniture': (8, [
+        ('IKEA', ['KIVIK Sofa', 'MALM Bed Frame', 'BEKANT Desk']),
+        ('Herman Miller', ['Aeron Chair']),
+        ('Ashley', ['Dining Table Set']),
+    ]),
+    'Automotive': (8, [
+        ('Exide', ['Car Battery']),
+        ('Michelin', ['Pilot Sport Tyre Set']),
+        ('Bosch', ['Aerotwin Wiper Blades']),
+        ('Garmin', ['DriveSmart Sat Nav']),
+    ]),
+    'Accessories': (14, [
+        ('Anker', ['Power Bank 20000mAh', 'USB-C Charger']),
+        ('Logitech', ['MX Master Mouse', 'MX Keys Keyboard']),
+        ('Apple', ['Watch Sport Band']),
+        ('Samsonite', ['Cabin Suitcase']),
+    ]),
+    'Other': (8, [
+        ('Nintendo', ['Switch OLED']),
+        ('Garmin', ['Forerunner 265 Watch']),
+        ('Philips', ['Sonicare Toothbrush']),
+    ]),
+}
+
+# (warranty_period, warranty_period_unit, weight)
+PERIODS = [
+    (12, 'months', 45), (24, 'months', 20), (36, 'months', 8), (6, 'months', 6), (60, 'months', 4),
+    (120, 'months', 2), (30, 'days', 5), (90, 'days', 5), (180, 'days', 5),
+]
+
+# Days before expiry each notification type fires (check_warranties_and_notify)
+NOTIFICATION_OFFSETS = [
+    ('30_days', 30), ('20_days', 20), ('10_days', 10), ('3_days', 3), ('2_days', 2), ('1_day', 1), ('expired', 0),
+]
+
+FIRST_NAMES = ['Aarav', 'Priya', 'James', 'Maria', 'Chen', 'Fatima', 'Lucas', 'Amara', 'Noah', 'Sofia', 'Kenji', 'Olivia']
+LAST_NAMES = ['Sharma', 'Smith', 'Garcia', 'Wang', 'Khan', 'Müller', 'Okafor', 'Rossi', 'Tanaka', 'Silva', 'Patel', 'Brown']
+NOTES = ['', '', '', 'Bought online', 'Extended warranty purchased', 'Gift', 'Receipt in the kitchen drawer',
+         'Registered with the manufacturer', 'Store credit card purchase']
+
+# Purchases go back this far, most of them recent
+MAX_PURCHASE_AGE_DAYS = 6 * 365
+CRON_TIME = time(3, 30, tzinfo=timezone.utc)
+
+WARRANTY_FIELDS = (
+    'id', 'user_id', 'product_name', 'brand', 'category', 'warranty_period', 'warranty_period_unit',
+    'purchase_date', 'expiry_date', 'share_token', 'notes', 'created_at', 'updated_at',
+)
+NOTIFICATION_FIELDS = (
+    'user_id', 'warranty_id', 'notification_type', 'title', 'message', 'is_read', 'email_sent', 'created_at',
+)
+
+
+@dataclass
+class SeedResult:
+    users: int = 0
+    warranties: int = 0
+    notifications: int = 0
+    seconds: float = 0.0
+
+
+class InsertWriter:
+    """
+    Single-row INSERTs, `batch_size` rows per executemany() call, which
+    psycopg2 and sqlite3 run as one statement per row. Values are prepared
+    with each field's get_db_prep_save(), as bulk_create() does, but without
+    building model instances or going through the per-value pre_save()
+    machinery, which is most of bulk_create()'s cost at this volume.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def write(self, model, fields, rows):
+        db = connections[DEFAULT_DB_ALIAS]
+        model_fields = [model._meta.get_field(name) for name in fields]
+        quote = db.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in model_fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        preparers = [field.get_db_prep_save for field in model_fields]
+        with db.cursor() as cursor:
+            for start in range(0, len(rows), self.batch_size):
+                cursor.executemany(sql, [
+                    [prepare(value, db) for prepare, value in zip(preparers, row)]
+                    for row in rows[start:start + self.batch_size]
+                ])
+
+
+class CopyWriter:
+    """COPY ... FROM STDIN (csv) through psycopg2's copy_expert."""
+
+    def write(self, model, fields, rows):
+        buffer = io.StringIO()
+        # Quoted, so '' stays an empty string rather than NULL
+        csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(rows)
+        buffer.seek(0)
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+        with connection.cursor() as cursor:
+            cursor.cursor.copy_expert(
+                f'COPY {quote(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer
+            )
+
+    @staticmethod
+    def available():
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            return hasattr(cursor.cursor, 'copy_expert')
+
+
+class VaultSeeder:
+    """Generates seed users with their warranties and notification history."""
+
+    def __init__(self, seed=0, today=None, warranties_per_user=20, history_days=365,
+                 batch_size=10000, use_copy=True):
+        self.seed = seed
+        self.today = today or date.today()
+        self.warranties_per_user = warranties_per_user
+        self.history_days = history_days
+        self.batch_size = batch_size
+        self.writer = CopyWriter() if use_copy and CopyWriter.available() else InsertWriter(batch_size)
+
+        self.categories = list(CATALOGUE)
+        self.category_weights = list(accumulate(weight for weight, _ in CATALOGUE.values()))
+        self.periods = [(period, unit) for period, unit, _ in PERIODS]
+        self.period_weights = list(accumulate(weight for _, _, weight in PERIODS))
+
+    @property
+    def uses_copy(self):
+        return isinstance(self.writer, CopyWriter)
+
+    def _pick(self, rng, values, cumulative_weights):
+        return values[bisect(cumulative_weights, rng.random() * cumulative_weights[-1])]
+
+    def user_profile(self, index):
+        rng = random.Random(f'{self.seed}:{index}')
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        joined = datetime.combine(self.today - timedelta(days=rng.randrange(MAX_PURCHASE_AGE_DAYS)), CRON_TIME)
+        return rng, f'seed{index}@{SEED_EMAIL_DOMAIN}', name, joined
+
+    def warranty_rows(self, rng, user_id, first_id):
+        """Yield (warranty row, notification rows) for one user."""
+        for warranty_id in range(first_id, first_id + self.warranties_per_user):
+            category = self._pick(rng, self.categories, self.category_weights)
+            brand, products = rng.choice(CATALOGUE[category][1])
+            product_name = rng.choice(products)
+            period, unit = self._pick(rng, self.periods, self.period_weights)
+            age = int(rng.triangular(0, MAX_PURCHASE_AGE_DAYS, 0))
+            purchase_date = self.today - timedelta(days=age)
+            expiry_date = calculate_expiry_date(purchase_date, period, unit)
+            added = datetime.combine(
+                purchase_date + timedelta(days=rng.randint(0, min(age, 3))),
+                time(rng.randrange(8, 22), rng.randrange(60), tzinfo=timezone.utc)
+            )
+            share_token = uuid.UUID(int=rng.getrandbits(128), version=4)
+            warranty = (
+                warranty_id, user_id, product_name, brand, category, period, unit,
+                purchase_date, expiry_date, share_token, rng.choice(NOTES), added, added,
+            )
+            yield warranty, list(self.notification_rows(rng, user_id, warranty_id, product_name, brand, expiry_date))
+
+    def notification_rows(self, rng, user_id, warranty_id, product_name, brand, expiry_date):
+        history_start = self.today - timedelta(days=self.history_days)
+        subject = SimpleNamespace(product_name=product_name, brand=brand, expiry_date=expiry_date)
+        for notification_type, days_before in NOTIFICATION_OFFSETS:
+            fired = expiry_date - timedelta(days=days_before)
+            if not history_start <= fired <= self.today:
+                continue
+            # Older alerts have mostly been read
+            is_read = rng.random() < (0.9 if (self.today - fired).days > 14 else 0.4)
+            message = get_notification_message(notification_type, subject)
+            yield (
+                user_id, warranty_id, notification_type, message['title'], message['message'],
+                is_read, True, datetime.combine(fired, CRON_TIME),
+            )
+
+    def run(self, users, progress=None):
+        """Create `users` seed users after any seeded before; returns a SeedResult."""
+        result = SeedResult()
+        started = monotonic()
+        password = make_password(SEED_PASSWORD)
+        first_index = User.objects.filter(email__endswith=f'@{SEED_EMAIL_DOMAIN}').count()
+        next_warranty_id = (Warranty.objects.order_by('-id').values_list('id', flat=True).first() or 0) + 1
+        users_per_batch = max(1, self.batch_size // max(self.warranties_per_user, 1))
+
+        for start in range(first_index, first_index + users, users_per_batch):
+            indexes = range(start, min(start + users_per_batch, first_index + users))
+            profiles = [self.user_profile(index) for index in indexes]
+            with transaction.atomic():
+                User.objects.bulk_create([
+                    User(email=email, name=name, password=password, date_joined=joined)
+                    for _, email, name, joined in profiles
+                ])
+                user_ids = dict(
+                    User.objects.filter(email__in=[email for _, email, _, _ in profiles])
+                    .values_list('email', 'pk')
+                )
+                warranties, notifications, counters = [], [], []
+                for rng, email, _, _ in profiles:
+                    user_id = user_ids[email]
+                    unread = 0
+                    for warranty, history in self.warranty_rows(rng, user_id, next_warranty_id):
+                        warranties.append(warranty)
+                        notifications.extend(history)
+                        unread += sum(1 for row in history if not row[5])
+                    next_warranty_id += self.warranties_per_user
+                    counters.append(UnreadCounter(user_id=user_id, unread=unread))
+
+                self.writer.write(Warranty, WARRANTY_FIELDS, warranties)
+                self.writer.write(Notification, NOTIFICATION_FIELDS, notifications)
+                UnreadCounter.objects.bulk_create(counters)
+
+            result.users += len(profiles)
+            result.warranties += len(warranties)
+            result.notifications += len(notifications)
+            result.seconds = monotonic() - started
+            if progress:
+                progress(result)
+
+        # Warranty ids were assigned here, so move the sequence past them
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Warranty]):
+                cursor.execute(sql)
+        result.seconds = monotonic() - started
+        return result
@@ -1,3 +1,5 @@
+from datetime import date
+
 from rest_framework import serializers
 from .models import Warranty
 
@@ -35,12 +37,52 @@ class WarrantyListSerializer(serializers.ModelSerializer):
     status = serializers.ReadOnlyField()
     days_remaining = serializers.ReadOnlyField()
     
+    # Columns serialize_values() reads, in this order
+    value_fields = (
+        'id', 'product_name', 'brand', 'category',
+        'purchase_date', 'warranty_period', 'warranty_period_unit', 'expiry_date', 'share_token'
+    )
+    
     class Meta:
         model = Warranty
         fields = (
             'id', 'product_name', 'brand', 'category',
             'purchase_date', 'warranty_period', 'warranty_period_unit', 'expiry_date', 'status', 'days_remaining', 'share_token'
         )
+    
+    @classmethod
+    def serialize_values(cls, rows, today=None):
+        """
+        The same data as `WarrantyListSerializer(warranties, many=True).data`,
+        from `values_list(*value_fields)` rows instead of model instances.
+        
+        Skips building instances and running ~11 DRF fields per row, and
+        computes status and days_remaining (Warranty's properties) against
+        one `today` for the whole list. Several times faster on long lists.
+        """
+        today = today or date.today()
+        data = []
+        append = data.append
+        for pk, product_name, brand, category, purchase_date, period, unit, expiry_date, share_token in rows:
+            if expiry_date < today:
+                status, days_remaining = 'Expired', 0
+            else:
+                days_remaining = (expiry_date - today).days
+                status = 'Expiring Soon' if days_remaining <= 30 else 'Active'
+            append({
+                'id': pk,
+                'product_name': product_name,
+                'brand': brand,
+                'category': category,
+                'purchase_date': purchase_date.isoformat(),
+                'warranty_period': period,
+                'warranty_period_unit': unit,
+                'expiry_date': expiry_date.isoformat(),
+                'status': status,
+                'days_remaining': days_remaining,
+                'share_token': str(share_token),
+            })
+        return data
 
 
 class WarrantyCreateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,196 @@
+"""Receipt scanning helpers shared by the single and batch scan endpoints."""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import Warranty
+from .serializers import WarrantyCreateSerializer
+
+
+RECEIPT_EXTENSIONS = ['jpg', 'jpeg', 'png', 'pdf', 'bmp', 'tiff']
+
+_scan_executor = None
+_scan_executor_lock = threading.Lock()
+
+
+def get_scan_executor():
+    """
+    Return the process-wide OCR worker pool.
+
+    The pool is shared by all batch requests in this worker process, so the
+    number of concurrent OCR jobs stays at OCR_BATCH_WORKERS however many
+    batches are in flight.
+    """
+    global _scan_executor
+    if _scan_executor is None:
+        with _scan_executor_lock:
+            if _scan_executor is None:
+                _scan_executor = ThreadPoolExecutor(
+                    max_workers=settings.OCR_BATCH_WORKERS,
+                    thread_name_prefix='receipt-ocr'
+                )
+    return _scan_executor
+
+
+def get_file_extension(uploaded_file):
+    return uploaded_file.name.split('.')[-1].lower()
+
+
+def save_upload_to_temp(uploaded_file, file_ext):
+    """Write an uploaded file to a named temp file and return its path."""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as temp_file:
+        for chunk in uploaded_file.chunks():
+            temp_file.write(chunk)
+        return temp_file.name
+
+
+def _scan_temp_file(ocr_service, temp_file_path, file_ext):
+    """Run OCR on a temp file in a pool thread and always remove the file."""
+    try:
+        return ocr_service.parse_receipt(temp_file_path, file_ext)
+    except Exception as e:
+        return {'success': False, 'error': str(e), 'data': {}}
+    finally:
+        if os.path.exists(temp_file_path):
+            os.unlink(temp_file_path)
+
+
+def _build_draft(user, data):
+    """Validate OCR data like a normal create; return an unsaved Warranty or None."""
+    serializer = WarrantyCreateSerializer(data={
+        'product_name': data.get('product_name', ''),
+        'brand': data.get('brand', ''),
+        'category': data.get('category', 'Other'),
+        'purchase_date': data.get('purchase_date'),
+        'warranty_period': data.get('warranty_period', 12),
+        'notes': 'Draft created from a scanned receipt. Please review the details.',
+    })
+    if not serializer.is_valid():
+        return None
+    warranty = Warranty(user=user, **serializer.validated_data)
+    # bulk_create() skips Warranty.save(), which normally fills this in
+    warranty.expiry_date = warranty.calculate_expiry_date()
+    return warranty
+
+
+class _ReceiptBatch:
+    """State of one batch scan, shared by the sync and async line generators."""
+
+    def __init__(self, user, uploaded_files, create_drafts, min_confidence):
+        from .ocr_service import ReceiptOCRService
+
+        self.user = user
+        self.total = len(uploaded_files)
+        self.create_drafts = create_drafts
+        self.min_confidence = min_confidence
+        self.rejected = []
+        self.futures = {}
+        self.drafts = []
+        self.succeeded = 0
+
+        ocr_service = ReceiptOCRService()
+        executor = get_scan_executor()
+        for index, uploaded_file in enumerate(uploaded_files):
+            file_ext = get_file_extension(uploaded_file)
+            if file_ext not in RECEIPT_EXTENSIONS:
+                self.rejected.append(json.dumps({
+                    'index': index,
+                    'filename': uploaded_file.name,
+                    'success': False,
+                    'error': f'Unsupported file type. Allowed: {", ".join(RECEIPT_EXTENSIONS)}',
+                }) + '\n')
+                continue
+            temp_file_path = save_upload_to_temp(uploaded_file, file_ext)
+            future = executor.submit(_scan_temp_file, ocr_service, temp_file_path, file_ext)
+            self.futures[future] = (index, uploaded_file.name, temp_file_path)
+
+    def result_line(self, future):
+        index, filename, _ = self.futures[future]
+        result = future.result()
+        line = {'index': index, 'filename': filename, 'success': result['success']}
+        if result['success']:
+            self.succeeded += 1
+            line.update({
+                'data': result['data'],
+                'confidence': result.get('confidence', 0),
+                'extracted_text_preview': result.get('extracted_text', '')[:200],
+            })
+            if self.create_drafts and line['confidence'] >= self.min_confidence:
+                draft = _build_draft(self.user, result['data'])
+                if draft is not None:
+                    self.drafts.append((index, draft))
+        else:
+            line['error'] = result.get('error', 'Failed to process receipt')
+        return json.dumps(line) + '\n'
+
+    def summary_line(self):
+        """Save the drafts and describe the batch; runs a query, so not on the event loop."""
+        created = Warranty.objects.bulk_create([draft for _, draft in self.drafts]) if self.drafts else []
+        return json.dumps({
+            'done': True,
+            'total': self.total,
+            'succeeded': self.succeeded,
+            'failed': self.total - self.succeeded,
+            'created_warranties': [
+                {'index': index, 'id': warranty.pk}
+                for (index, _), warranty in zip(self.drafts, created)
+            ],
+        }) + '\n'
+
+    def cancel_pending(self):
+        # Client went away or something failed: drop queued work and
+        # clean up the temp files no pool thread will get to.
+        for future, (_, _, temp_file_path) in self.futures.items():
+            if future.cancel() and os.path.exists(temp_file_path):
+                os.unlink(temp_file_path)
+
+    def lines(self):
+        try:
+            yield from self.rejected
+            for future in as_completed(self.futures):
+                yield self.result_line(future)
+            yield self.summary_line()
+        finally:
+            self.cancel_pending()
+
+    async def alines(self):
+        try:
+            for line in self.rejected:
+                yield line
+            pending = {asyncio.wrap_future(future): future for future in self.futures}
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for waiter in done:
+                    yield self.result_line(pending.pop(waiter))
+            yield await sync_to_async(self.summary_line)()
+        finally:
+            self.cancel_pending()
+
+
+def scan_receipts_stream(user, uploaded_files, create_drafts=False, min_confidence=None, asynchronous=False):
+    """
+    Scan many uploaded receipts and yield one NDJSON line per file.
+
+    Uploads are copied to temp files up front (they belong to the request),
+    then OCR runs on the shared pool and each result is yielded as soon as it
+    finishes, so lines arrive in completion order and carry the file's
+    `index` in the upload. With `create_drafts`, results at or above
+    `min_confidence` are saved with a single bulk insert after the last
+    file, and a final summary line lists the created warranty ids.
+
+    Pass `asynchronous=True` under ASGI to get an async generator: Django
+    drains a sync iterator to a list before sending any of it there, which
+    would hold every line back until the whole batch is done.
+    """
+    if min_confidence is None:
+        min_confidence = settings.OCR_DRAFT_MIN_CONFIDENCE
+
+    batch = _ReceiptBatch(user, uploaded_files, create_drafts, min_confidence)
+    return batch.alines() if asynchronous else batch.lines()
@@ -0,0 +1,1100 @@
+import asyncio
+import contextlib
+import gc
+import gzip
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+
+import brotli
+from asgiref.sync import ThreadSensitiveContext, sync_to_async
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.utils import ConnectionHandler
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from django.urls import resolve
+import psycopg2
+from PIL import Image
+from psycopg2 import extensions as psycopg2_extensions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from notifications.counters import get_unread_counts, repair_unread_counters
+from notifications.models import Notification
+from notifications.views import NotificationViewSet
+from users.models import User
+from warranty_vault.db_router import ReplicaRouter, RequestState, _request_state, pin_key
+from warranty_vault.metrics import MetricsRegistry, merge_snapshots, registry
+from warranty_vault.postgresql_pool import base as postgresql_pool
+from warranty_vault.renderers import FastJSONRenderer
+from warranty_vault.postgresql_pool.base import ConnectionPool
+from warranty_vault.slow_queries import SlowQueryLog, capture, log as slow_query_log, normalize, params_shape
+from warranty_vault.warmup import warm_up, warm_up_database
+
+from .cloud_ocr import CircuitBreaker, CloudOCRClient, CloudOCRError, CloudOCRUnavailable
+from .models import CalendarFeed, Warranty
+from .views import WarrantyViewSet, public_warranty_view
+from .receipt_parser import CATEGORY_KEYWORDS, CompiledReceiptParser, ReceiptTextParser
+from .seeding import VaultSeeder
+from .serializers import WarrantyListSerializer
+
+
+RECEIPT_CORPUS = [
+    '',
+    'RECEIPT\n',
+    'BEST BUY\nStore #123\nSony WH-1000XM5 Headphones\n01/15/2024\nTotal $349.99\n2 year warranty',
+    'Invoice 4411\nSamsung 55" Smart TV\nBrand: Samsung Electronics\nDate: 2023-11-05\nWarranty: 24 months',
+    'AMAZON.COM\nOrder Receipt\nApple MacBook Air M2 laptop\nManufacturer: Apple\nMarch 3, 2024\n1 yr warranty',
+    'IKEA\nKIVIK sofa 3-seat\nmake: Ikea\n15-03-2024\nguarantee 10 years',
+    'Home Depot\nLG Refrigerator 26 cu ft\nDec 24 2023\nwarranty 5 year',
+    'Car battery Exide\n13/05/2024\n6 months warranty\nauto parts',
+    '12/31/23\nBill\nDyson V15 vacuum cleaner\nManufacturer:\nDyson\nwarranty: 2 years',
+    '02/30/2024 then 2024/02/28\nBosch dishwasher',
+    'make: brand: Panasonic\nmicrowave oven',
+    'Sept 5, 2024\nSeptember 5, 2024\nwatch strap and wallet',
+    '1234\n$19.99\n05/06/2024\nsmartwatch charger tablet table',
+    'Total 45.00\nscarf and infant fan\n2024-13-01\n2024-12-01',
+    'Receipt\n\n\n   Nintendo Switch OLED console   \nMAKE:Nintendo Co Ltd\n07-04-2024',
+    'Purchased: JAN 9, 2022\naccessory bag with accessories',
+    'air conditioner install\nac unit\nwarranty:3 yrs\n12 month warranty',
+    'Motorcycle helmet\nautomotive / vehicle / bike\n2 years warranty and 18 months warranty',
+    '9/9/2099\nwashing machine washer dryer\n',
+    'ALL CAPS HEADER LINE\nno brand keyword here at all\nok',
+    '\u017fep 5, 2024\nmaKe: Acme\n12/1\u0665/2024\nWARRANTY: \u0663 yrs',
+]
+
+
+def generate_receipts(count, seed=0):
+    """Build synthetic receipt texts mixing every pattern the parsers look for."""
+    rng = random.Random(seed)
+    keywords = [keyword for words in CATEGORY_KEYWORDS.values() for keyword in words]
+    fragments = [
+        lambda: f'{rng.randint(0, 13):02d}/{rng.randint(0, 32):02d}/{rng.randint(1999, 2026)}',
+        lambda: f'{rng.randint(1, 31)}-{rng.randint(1, 13)}-{rng.randint(20, 2026)}',
+        lambda: f'{rng.randint(1990, 2030)}/{rng.randint(1, 13)}/{rng.randint(1, 32)}',
+        lambda: f'{rng.choice(["Jan", "Feb", "Mar", "May", "Sep", "Sept", "Dec"])}{rng.choice(["", "uary", "ember", "ch"])} '
+                f'{rng.randint(1, 32)}{rng.choice([",", ""])} {rng.randint(2000, 2026)}',
+        lambda: f'{rng.randint(1, 5)} {rng.choice(["year", "years", "yr", "yrs", "month", "months"])} warranty',
+        lambda: f'Warranty{rng.choice([":", ": ", " "])}{rng.randint(1, 36)} {rng.choice(["years", "months", "days"])}',
+        lambda: f'{rng.choice(["Brand", "BRAND", "Manufacturer", "make"])}{rng.choice([":", ": ", " "])}'
+                f'{rng.choice(["Sony", "LG Electronics", "Apple", "Bosch", ""])}',
+        lambda: rng.choice(['RECEIPT', 'Invoice #99', 'TAX INVOICE', 'Bill of sale', 'Thank you!']),
+        lambda: f'${rng.randint(1, 999)}.{rng.randint(0, 99):02d}',
+        lambda: str(rng.randint(1, 10 ** 6)),
+        lambda: ' '.join(rng.sample(keywords, rng.randint(1, 4))),
+        lambda: rng.choice(['Samsung Galaxy S24 Ultra', 'WHIRLPOOL fridge', 'Office desk chair', 'Car tire 205/55']),
+    ]
+    receipts = []
+    for _ in range(count):
+        lines = [rng.choice(fragments)() for _ in range(rng.randint(1, 25))]
+        receipts.append(rng.choice(['\n', '\n', ' ', '\r\n']).join(lines))
+    return receipts
+
+
+class CompiledReceiptParserTests(SimpleTestCase):
+    """The compiled parser must match the reference parsers field for field."""
+
+    def setUp(self):
+        self.reference = ReceiptTextParser()
+        self.compiled = CompiledReceiptParser()
+
+    def assertSameFields(self, text):
+        self.assertEqual(self.compiled.extract(text), self.reference.extract(text), msg=repr(text))
+
+    def test_regression_corpus(self):
+        for text in RECEIPT_CORPUS:
+            self.assertSameFields(text)
+
+    def test_generated_corpus(self):
+        for text in generate_receipts(2000, seed=26):
+            self.assertSameFields(text)
+
+    def test_extracted_fields(self):
+        fields = self.compiled.extract(RECEIPT_CORPUS[3])
+        self.assertEqual(fields['brand'], 'Samsung Electronics\nDate')
+        self.assertEqual(fields['purchase_date'], '2023-11-05')
+        self.assertEqual(fields['warranty_period'], 24)
+        self.assertEqual(fields['category'], 'Electronics')
+
+
+class StubOCRHandler(BaseHTTPRequestHandler):
+    """Answers like OCR.space's /parse/image and records what it received."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body
+        )
+        upload = next(part for part in message.iter_parts() if part.get_param('name', header='content-disposition') == 'file')
+        content = upload.get_payload(decode=True)
+        with Image.open(io.BytesIO(content)) as image:
+            server.uploads.append({
+                'content_type': upload.get_content_type(),
+                'format': image.format,
+                'size': image.size,
+                'client_port': self.client_address[1],
+            })
+
+        if server.delay:
+            time.sleep(server.delay)
+        if server.status != 200:
+            payload, status = b'Service Unavailable', server.status
+        else:
+            payload, status = json.dumps({
+                'ParsedResults': [{'ParsedText': 'Sony TV\r\n01/15/2024', 'FileParseExitCode': 1}],
+                'OCRExitCode': 1,
+                'IsErroredOnProcessing': False,
+            }).encode(), 200
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubReceiptOCRService:
+    """
+    Stands in for ReceiptOCRService (ocr_service.py is disabled here).
+
+    A file's content is the JSON of its OCR data, with a `confidence` key;
+    "error" makes the scan raise and "wait" blocks it until `release` is set.
+    """
+
+    paths = []
+    release = None
+
+    def parse_receipt(self, path, file_ext):
+        self.paths.append(path)
+        with open(path) as f:
+            content = f.read()
+        if content == 'error':
+            raise ValueError('unreadable receipt')
+        if content == 'wait':
+            self.release.wait(5)
+            content = '{"confidence": 10}'
+        data = json.loads(content)
+        return {'success': True, 'data': data, 'confidence': data.pop('confidence'), 'extracted_text': 'RECEIPT'}
+
+
+class ReceiptBatchScanTests(TestCase):
+    """scan_receipt_batch: NDJSON lines, validation, drafts and temp file cleanup."""
+
+    def setUp(self):
+        StubReceiptOCRService.paths = []
+        patcher = mock.patch.dict(sys.modules, {'warranties.ocr_service': SimpleNamespace(
+            ReceiptOCRService=StubReceiptOCRService,
+        )})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='scan@example.com', name='Scan', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def receipt(name, content):
+        if not isinstance(content, str):
+            content = json.dumps(content)
+        return SimpleUploadedFile(name, content.encode())
+
+    def scan(self, files, **data):
+        return self.client.post('/api/warranties/scan_receipt_batch/', {'files': files, **data})
+
+    def lines(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        return [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+
+    def test_streams_a_line_per_file_then_summary(self):
+        lines = self.lines(self.scan([
+            self.receipt('tv.jpg', {'confidence': 90, 'product_name': 'TV', 'brand': 'Sony', 'category': 'Electronics',
+                                    'purchase_date': '2025-01-15', 'warranty_period': 24}),
+            self.receipt('notes.txt', 'not a receipt'),
+            self.receipt('blurry.png', 'error'),
+        ]))
+        *files, summary = lines
+        self.assertEqual(files[0], {
+            'index': 1, 'filename': 'notes.txt', 'success': False,
+            'error': 'Unsupported file type. Allowed: jpg, jpeg, png, pdf, bmp, tiff',
+        })
+        by_index = {line['index']: line for line in files}
+        self.assertEqual(sorted(by_index), [0, 1, 2])
+        self.assertEqual(by_index[0]['data']['product_name'], 'TV')
+        self.assertEqual(by_index[0]['confidence'], 90)
+        self.assertEqual(by_index[0]['extracted_text_preview'], 'RECEIPT')
+        self.assertEqual(by_index[2], {'index': 2, 'filename': 'blurry.png', 'success': False,
+                                       'error': 'unreadable receipt'})
+        self.assertEqual(summary, {'done': True, 'total': 3, 'succeeded': 1, 'failed': 2, 'created_warranties': []})
+        self.assertFalse(Warranty.objects.exists())
+        self.assertEqual(len(StubReceiptOCRService.paths), 2)
+        self.assertFalse(any(os.path.exists(path) for path in StubReceiptOCRService.paths))
+
+    def test_creates_drafts_above_min_confidence(self):
+        data = {'brand': 'Sony', 'category': 'Electronics', 'purchase_date': '2025-01-15', 'warranty_period': 12}
+        lines = self.lines(self.scan([
+            self.receipt('sure.jpg', {**data, 'confidence': 80, 'product_name': 'TV'}),
+            self.receipt('unsure.jpg', {**data, 'confidence': 50, 'product_name': 'Radio'}),
+            self.receipt('invalid.jpg', {**data, 'confidence': 95, 'product_name': 'Lamp', 'purchase_date': 'soon'}),
+        ], create_drafts='true', min_confidence='60'))
+        warranty = Warranty.objects.get()
+        self.assertEqual(lines[-1]['created_warranties'], [{'index': 0, 'id': warranty.pk}])
+        self.assertEqual((warranty.user, warranty.product_name), (self.user, 'TV'))
+        self.assertEqual(warranty.expiry_date, date(2026, 1, 15))
+
+    async def test_asgi_streams_lines_before_the_batch_finishes(self):
+        StubReceiptOCRService.release = threading.Event()
+        self.addCleanup(StubReceiptOCRService.release.set)
+        response = await AsyncClient().post(
+            '/api/warranties/scan_receipt_batch/',
+            {'files': [self.receipt('slow.jpg', 'wait'), self.receipt('fast.jpg', {'confidence': 90})]},
+            headers={'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'},
+        )
+        self.assertEqual(response.status_code, 200)
+        lines = aiter(response.streaming_content)
+        first = json.loads(await asyncio.wait_for(anext(lines), timeout=5))
+        self.assertEqual((first['index'], first['filename']), (1, 'fast.jpg'))
+
+        StubReceiptOCRService.release.set()
+        rest = [json.loads(line) async for line in lines]
+        self.assertEqual([line.get('index') for line in rest], [0, None])
+        self.assertEqual(rest[-1]['succeeded'], 2)
+
+    @override_settings(OCR_BATCH_MAX_FILES=2)
+    def test_validation(self):
+        self.assertEqual(self.scan([]).status_code, 400)
+        files = [self.receipt(f'{i}.jpg', {'confidence': 1}) for i in range(3)]
+        self.assertEqual(self.scan(files).status_code, 400)
+        response = self.scan(files[:1], min_confidence='high')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'min_confidence must be an integer'})
+        self.assertEqual(StubReceiptOCRService.paths, [])
+
+
+class CloudOCRClientTests(SimpleTestCase):
+    """CloudOCRClient against a local stub of the OCR.space API."""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubOCRHandler)
+        self.server.uploads = []
+        self.server.status = 200
+        self.server.delay = 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/parse/image'
+        self.now = 1000.0
+
+    def make_client(self, **kwargs):
+        kwargs.setdefault('breaker', CircuitBreaker(failure_threshold=2, reset_timeout=30, clock=lambda: self.now))
+        client = CloudOCRClient('test-key', self.url, **kwargs)
+        self.addCleanup(client.session.close)
+        return client
+
+    def make_image(self, size, image_format):
+        handle, path = tempfile.mkstemp(suffix=f'.{image_format.lower()}')
+        os.close(handle)
+        self.addCleanup(os.unlink, path)
+        Image.linear_gradient('L').resize(size).convert('RGB').save(path, format=image_format)
+        return path
+
+    def test_reuses_one_connection(self):
+        client = self.make_client()
+        path = self.make_image((200, 300), 'PNG')
+        for _ in range(3):
+            self.assertEqual(client.extract_text(path), 'Sony TV\r\n01/15/2024')
+        self.assertEqual(len({upload['client_port'] for upload in self.server.uploads}), 1)
+
+    def test_downscales_and_labels_upload(self):
+        client = self.make_client(max_dimension=1000)
+        client.extract_text(self.make_image((3000, 2000), 'PNG'))
+        upload = self.server.uploads[0]
+        self.assertEqual(upload['format'], 'JPEG')
+        self.assertEqual(upload['content_type'], 'image/jpeg')
+        self.assertEqual(upload['size'], (1000, 667))
+
+    def test_circuit_opens_and_recovers(self):
+        client = self.make_client()
+        path = self.make_image((100, 100), 'JPEG')
+        self.server.status = 503
+        for _ in range(2):
+            with self.assertRaises(CloudOCRError):
+                client.extract_text(path)
+        with self.assertRaises(CloudOCRUnavailable):
+            client.extract_text(path)
+        self.assertEqual(len(self.server.uploads), 2)
+
+        self.server.status = 200
+        self.now += 31
+        self.assertEqual(client.extract_text(path), 'Sony TV\r\n01/15/2024')
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_prepares_images_only_for_calls_that_go_out(self):
+        client = self.make_client()
+        path = self.make_image((100, 100), 'JPEG')
+        self.server.status = 503
+        for _ in range(2):
+            with self.assertRaises(CloudOCRError):
+                client.extract_text(path)
+        self.now += 31
+        self.assertTrue(client.breaker.allow())  # another request's trial call
+        with mock.patch('warranties.cloud_ocr.prepare_image') as prepare:
+            with self.assertRaises(CloudOCRUnavailable):
+                client.extract_text(path)
+        prepare.assert_not_called()
+
+        # A trial that never went out lets the next one through
+        client.breaker.cancel()
+        self.server.status = 200
+        with mock.patch('warranties.cloud_ocr.prepare_image', side_effect=OSError):
+            with self.assertRaises(OSError):
+                client.extract_text(path)
+        self.assertEqual(client.extract_text(path), 'Sony TV\r\n01/15/2024')
+
+    def test_caps_concurrent_requests(self):
+        client = self.make_client(max_concurrency=1, acquire_timeout=0.05)
+        path = self.make_image((100, 100), 'JPEG')
+        self.server.delay = 0.5
+        worker = threading.Thread(target=client.extract_text, args=(path,))
+        worker.start()
+        time.sleep(0.1)
+        with self.assertRaises(CloudOCRUnavailable):
+            client.extract_text(path)
+        worker.join()
+        self.assertEqual(len(self.server.uploads), 1)
+
+
+@override_settings(METRICS_TOKEN='scrape-me')
+class MetricsTests(TestCase):
+    """/metrics reports per-view latency, query counts and sizes in Prometheus format."""
+
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(email='metrics@example.com', name='Metrics', password='pass12345')
+        Warranty.objects.create(
+            user=self.user, product_name='TV', brand='Sony', category='Electronics',
+            purchase_date=date(2024, 1, 1), warranty_period=12,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scrape(self, token='scrape-me'):
+        return APIClient().get('/metrics', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_records_requests(self):
+        self.client.get('/api/warranties/')
+        self.client.get('/api/warranties/')
+        self.client.get('/api/notifications/unread_count/')
+
+        response = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        self.assertIn('http_requests_total{view="warranty-list",method="GET",status="200"} 2', text)
+        self.assertIn('http_request_duration_seconds_count{view="warranty-list",method="GET"} 2', text)
+        self.assertIn('http_request_db_queries_bucket{view="warranty-list",method="GET",le="+Inf"} 2', text)
+        self.assertIn('http_response_size_bytes_count{view="notification-unread-count",method="GET"} 1', text)
+
+    def test_query_wrappers_survive_reconnect(self):
+        self.client.get('/api/notifications/')
+        before = list(connection.execute_wrappers)
+        get_queryset = NotificationViewSet.get_queryset
+
+        def passthrough(execute, sql, params, many, context):
+            return execute(sql, params, many, context)
+
+        def reconnecting(viewset):
+            # What a connection_created handler does when the connection is reopened mid-request
+            connection.execute_wrappers.append(passthrough)
+            return get_queryset(viewset)
+
+        with mock.patch.object(NotificationViewSet, 'get_queryset', reconnecting):
+            self.client.get('/api/notifications/')
+        connection.execute_wrappers.remove(passthrough)
+        self.client.get('/api/notifications/')
+        self.assertEqual(connection.execute_wrappers, before)
+
+    def test_requires_token_or_staff(self):
+        self.assertEqual(self.scrape('wrong').status_code, 401)
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+
+    def test_merges_workers_through_shared_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other_worker = MetricsRegistry(directory)
+            other_worker.record_request('warranty-list', 'GET', 200, 0.02, 3, 0.004, 512)
+            other_worker.flush()
+            os.rename(
+                os.path.join(directory, f'metrics-{os.getpid()}.json'),
+                os.path.join(directory, 'metrics-1.json')
+            )
+            this_worker = MetricsRegistry(directory)
+            this_worker.record_request('warranty-list', 'GET', 200, 0.5, 1, 0.001, 100)
+            counters, histograms = merge_snapshots(this_worker.collect())
+        self.assertEqual(counters[('http_requests_total', ('warranty-list', 'GET', '200'))], 2)
+        self.assertEqual(histograms[('http_request_db_queries', ('warranty-list', 'GET'))][-1], 4)
+
+
+class SlowQueryLogTests(TestCase):
+    """Slow statements are captured with their shape, origin and calling frame."""
+
+    def setUp(self):
+        slow_query_log.clear()
+        self.user = User.objects.create_user(email='slow@example.com', name='Slow', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_normalize(self):
+        self.assertEqual(
+            normalize('SELECT * FROM "w" WHERE "w"."id" IN (%s,%s, %s) AND name = \'TV\'\n LIMIT 21'),
+            'SELECT * FROM "w" WHERE "w"."id" IN (%s, ...) AND name = %s LIMIT %s'
+        )
+        self.assertEqual(
+            normalize('INSERT INTO "n" ("a", "b") VALUES (%s, %s), (%s, %s), (%s, %s)'),
+            'INSERT INTO "n" ("a", "b") VALUES (%s, ...), ...'
+        )
+        self.assertEqual(params_shape((1, 2, 'x', None)), '(int x2, str, NoneType)')
+        self.assertEqual(params_shape([(1, 'a'), (2, 'b')], many=True), '2 x (int, str)')
+
+    def test_captures_view_queries(self):
+        with capture(threshold_ms=0):
+            self.client.get('/api/notifications/')
+        entries = slow_query_log.entries()
+        self.assertTrue(entries)
+        entry = next(entry for entry in entries if 'FROM "notifications"' in entry['sql'])
+        self.assertEqual(entry['source'], 'GET notification-list')
+        # values() rows are fetched where serialize_notification_values() iterates them
+        self.assertTrue(entry['frame'].startswith('notifications/serializers.py:'), entry['frame'])
+        self.assertNotIn('slow@example.com', json.dumps(entries))
+
+    def test_capture_removes_its_own_wrapper(self):
+        before = list(connection.execute_wrappers)
+        with capture(threshold_ms=10_000):
+            self.client.get('/api/warranties/')
+            # A wrapper added mid-block, as connection_created handlers do on reconnect
+            connection.execute_wrappers.append(print)
+        connection.execute_wrappers.remove(print)
+        self.assertEqual(connection.execute_wrappers, before)
+
+    def test_threshold_and_ring_buffer(self):
+        buffer = SlowQueryLog(threshold_ms=50, size=2)
+        for duration in (0.01, 0.06, 0.07, 0.08):
+            if duration >= buffer.threshold:
+                buffer.record('SELECT %s', (1,), False, duration)
+        self.assertEqual([entry['duration_ms'] for entry in buffer.entries()], [80.0, 70.0])
+
+    @override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+    def test_command_and_admin_page(self):
+        out = io.StringIO()
+        call_command(
+            'slow_queries', '--json', '--group', '--threshold', '0', '--run', 'check_warranty_expiry',
+            stdout=out, stderr=io.StringIO()
+        )
+        groups = json.loads(out.getvalue())
+        self.assertTrue(any(
+            group['sources'] == ['manage.py check_warranty_expiry'] and '"warranties"' in group['normalized']
+            for group in groups
+        ))
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/admin/slow-queries/').status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/admin/slow-queries/')
+        self.assertContains(response, 'manage.py check_warranty_expiry')
+
+
+class WarrantyListSerializerTests(TestCase):
+    """serialize_values() gives exactly the serializer's output."""
+
+    def test_serialize_values(self):
+        user = User.objects.create_user(email='list@example.com', name='List', password='pass12345')
+        today = date.today()
+        for days in (-400, -1, 0, 1, 30, 31, 365):
+            Warranty.objects.create(
+                user=user, product_name=f'Item {days}', brand='Sony', category='Electronics',
+                purchase_date=today - timedelta(days=10), warranty_period=1, warranty_period_unit='days',
+                expiry_date=today + timedelta(days=days),
+            )
+        warranties = Warranty.objects.filter(user=user)
+        expected = WarrantyListSerializer(warranties, many=True).data
+        data = WarrantyListSerializer.serialize_values(
+            warranties.values_list(*WarrantyListSerializer.value_fields), today=today
+        )
+        self.assertEqual(JSONRenderer().render(data), JSONRenderer().render(expected))
+        self.assertEqual(
+            [(row['status'], row['days_remaining']) for row in data][::-1],
+            [('Expired', 0), ('Expired', 0), ('Expiring Soon', 0), ('Expiring Soon', 1),
+             ('Expiring Soon', 30), ('Active', 31), ('Active', 365)],
+        )
+
+
+class AsyncReadViewTests(TestCase):
+    """The async read views answer exactly like the DRF views they replace."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='async@example.com', name='Async', password='pass12345')
+        self.warranties = [
+            Warranty.objects.create(
+                user=self.user, product_name=f'Item {i}', brand='Sony', category='Electronics',
+                purchase_date=date.today() - timedelta(days=30 * i), warranty_period=12,
+            )
+            for i in range(25)
+        ]
+        self.client = AsyncClient()
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def drf(self, view, path, **kwargs):
+        """The DRF view's rendered response for the same request."""
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=self.user)
+        response = view(request, **kwargs)
+        response.render()
+        return response
+
+    async def assertSameAs(self, path, view, **kwargs):
+        response = await self.client.get(path, headers=self.auth)
+        expected = await sync_to_async(self.drf)(view, path, **kwargs)
+        self.assertEqual(response.status_code, expected.status_code, response.content)
+        self.assertEqual(response['Content-Type'], expected['Content-Type'])
+        self.assertEqual(response.json(), json.loads(expected.content))
+        return response
+
+    async def test_list_and_stats(self):
+        listing = WarrantyViewSet.as_view({'get': 'list'})
+        first = await self.assertSameAs('/api/warranties/', listing)
+        self.assertEqual(first.json()['count'], 25)
+        self.assertIn('page=2', first.json()['next'])
+        await self.assertSameAs('/api/warranties/?page=2', listing)
+        await self.assertSameAs('/api/warranties/?page=9', listing)
+        await self.assertSameAs('/api/warranties/stats/', WarrantyViewSet.as_view({'get': 'stats'}))
+        await self.assertSameAs('/api/notifications/unread_count/', NotificationViewSet.as_view({'get': 'unread_count'}))
+
+    async def test_share_and_errors(self):
+        token = self.warranties[0].share_token
+        await self.assertSameAs(f'/api/share/{token}/', public_warranty_view, share_token=token)
+        missing = await self.client.get('/api/share/00000000-0000-0000-0000-000000000000/', headers=self.auth)
+        self.assertEqual(missing.status_code, 404)
+
+        anonymous = await self.client.get('/api/warranties/stats/')
+        self.assertEqual(anonymous.status_code, 401)
+        self.assertEqual(anonymous['WWW-Authenticate'], 'Bearer realm="api"')
+        bad_token = await self.client.get('/api/warranties/', headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(bad_token.status_code, 401)
+        self.assertEqual(bad_token.json()['code'], 'token_not_valid')
+
+    async def test_writes_fall_back_to_drf(self):
+        response = await self.client.post('/api/warranties/', {
+            'product_name': 'Kettle', 'brand': 'Bosch', 'category': 'Home Appliances',
+            'purchase_date': '2026-01-01', 'warranty_period': 24,
+        }, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['expiry_date'], '2028-01-01')
+        self.assertEqual((await self.client.delete('/api/warranties/stats/', headers=self.auth)).status_code, 405)
+
+
+class StubConnection:
+    """Just the psycopg2 connection surface ConnectionPool touches."""
+
+    def __init__(self):
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=psycopg2_extensions.TRANSACTION_STATUS_IDLE)
+        self.pings_fail = False
+
+    def rollback(self):
+        self.info.transaction_status = psycopg2_extensions.TRANSACTION_STATUS_IDLE
+
+    def cursor(self):
+        if self.pings_fail:
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        return contextlib.nullcontext(SimpleNamespace(execute=lambda sql: None))
+
+    def close(self):
+        self.closed = 1
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    """The pooled backend reuses healthy connections and drops broken ones."""
+
+    def setUp(self):
+        self.pool = ConnectionPool(max_size=2, timeout=0.05)
+        self.opened = []
+
+    def connect(self):
+        self.opened.append(StubConnection())
+        return self.opened[-1]
+
+    def test_reuses_returned_connections(self):
+        first = self.pool.getconn(self.connect)
+        self.pool.putconn(first)
+        self.assertIs(self.pool.getconn(self.connect), first)
+        second = self.pool.getconn(self.connect)
+        self.assertIsNot(second, first)
+        self.assertEqual(len(self.opened), 2)
+
+        with self.assertRaises(psycopg2.OperationalError):
+            self.pool.getconn(self.connect)
+        self.pool.putconn(second)
+        self.assertIs(self.pool.getconn(self.connect), second)
+
+    def test_rolls_back_or_discards(self):
+        dirty = self.pool.getconn(self.connect)
+        dirty.info.transaction_status = psycopg2_extensions.TRANSACTION_STATUS_INERROR
+        self.pool.putconn(dirty)
+        self.assertEqual(self.pool.idle_count, 1)
+
+        broken = self.pool.getconn(self.connect)
+        broken.info.transaction_status = psycopg2_extensions.TRANSACTION_STATUS_UNKNOWN
+        self.pool.putconn(broken)
+        self.assertTrue(broken.closed)
+        self.assertEqual(self.pool.idle_count, 0)
+
+    def test_pings_connections_that_sat_idle(self):
+        stale = self.pool.getconn(self.connect)
+        self.pool.putconn(stale)
+        stale.pings_fail = True
+        with mock.patch.object(postgresql_pool, 'IDLE_CHECK_SECONDS', -1):
+            fresh = self.pool.getconn(self.connect)
+        self.assertIsNot(fresh, stale)
+        self.assertTrue(stale.closed)
+
+    def test_aborted_request_gives_its_slot_back(self):
+        connections = ConnectionHandler({
+            'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'},
+            'pooled': {'ENGINE': 'warranty_vault.postgresql_pool', 'NAME': 'vault', 'POOL': {'max_size': 1, 'timeout': 0.05}},
+        })
+        key = ('pooled', "[('dbname', 'vault')]")
+        self.addCleanup(postgresql_pool._pools.pop, key, None)
+
+        def query():
+            wrapper = connections['pooled']
+            wrapper.connection = wrapper.get_new_connection({'dbname': 'vault'})
+
+        async def request(queried):
+            # As Django's ASGIHandler runs a request: sync code in a thread of its own
+            async with ThreadSensitiveContext():
+                await sync_to_async(query)()
+                queried.set()
+                await asyncio.Event().wait()  # the client disconnects here
+
+        async def abort_request():
+            queried = asyncio.Event()
+            task = asyncio.create_task(request(queried))
+            await queried.wait()
+            with self.assertRaises(psycopg2.OperationalError):
+                postgresql_pool.get_pool(key).getconn(self.connect)
+            # What Django's ASGIHandler does: cancel, and never close the response
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        with mock.patch.object(postgresql_pool.base.DatabaseWrapper, 'get_new_connection',
+                               lambda wrapper, params: self.connect()):
+            asyncio.run(abort_request())
+        gc.collect()
+        self.assertIs(postgresql_pool.get_pool(key).getconn(self.connect), self.opened[0])
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaRouterTests(TestCase):
+    """Safe dashboard reads go to a replica unless the user just wrote."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='replica@example.com', name='Replica', password='pass12345')
+        self.router = ReplicaRouter()
+
+    def route(self, method, path, user=None):
+        request = getattr(RequestFactory(), method)(path)
+        request.resolver_match = resolve(path)
+        if user is not None:
+            request.user = user  # as DRF sets it once it has authenticated
+        return RequestState(request)
+
+    def read(self, state, model=Warranty):
+        token = _request_state.set(state)
+        try:
+            return self.router.db_for_read(model)
+        finally:
+            _request_state.reset(token)
+
+    def test_routes_safe_reads_only(self):
+        self.assertEqual(self.read(self.route('get', '/api/warranties/', self.user)), 'replica_1')
+        self.assertEqual(self.read(self.route('get', '/api/warranties/stats/', self.user)), 'replica_1')
+        self.assertEqual(self.read(self.route('get', '/api/warranties/', self.user), model=User), 'default')
+        self.assertEqual(self.read(self.route('get', '/api/auth/profile/', self.user)), 'default')
+        self.assertEqual(self.read(self.route('post', '/api/warranties/', self.user)), 'default')
+        # Before DRF has authenticated, request.user is the lazy session user
+        self.assertEqual(self.read(self.route('get', '/api/warranties/')), 'default')
+        # Outside a request (management commands)
+        self.assertEqual(self.router.db_for_read(Warranty), 'default')
+
+    def test_writes_pin_the_user_to_the_primary(self):
+        state = self.route('get', '/api/warranties/', self.user)
+        token = _request_state.set(state)
+        try:
+            self.assertEqual(self.router.db_for_write(Warranty), 'default')
+            self.assertEqual(self.router.db_for_read(Warranty), 'default')
+        finally:
+            _request_state.reset(token)
+        self.assertEqual(state.pin(), pin_key(self.user.pk))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/warranties/', {
+            'product_name': 'Kettle', 'brand': 'Bosch', 'category': 'Home Appliances',
+            'purchase_date': '2026-01-01', 'warranty_period': 24,
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(cache.get(pin_key(self.user.pk)))
+        self.assertEqual(self.read(self.route('get', '/api/warranties/', self.user)), 'default')
+
+
+class CalendarFeedTests(TestCase):
+    """The ICS feed: content, revalidation from one query, token rotation."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='calendar@example.com', name='Calendar', password='pass12345')
+        self.warranties = [
+            Warranty.objects.create(
+                user=self.user, product_name=name, brand='Sony', category='Electronics',
+                purchase_date=date(2025, 1, 15), warranty_period=months,
+            )
+            for name, months in (('Headphones, noise cancelling; WH-1000XM5 ' + 'é' * 40, 12), ('TV', 24))
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.urls = self.client.get('/api/warranties/calendar/').json()
+
+    def get_feed(self, url=None, **headers):
+        return APIClient().get(url or self.urls['url'], headers=headers)
+
+    def test_feed(self):
+        response = self.get_feed()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        body = response.content
+        self.assertTrue(body.startswith(b'BEGIN:VCALENDAR\r\n') and body.endswith(b'END:VCALENDAR\r\n'))
+        lines = body.split(b'\r\n')[:-1]
+        self.assertTrue(all(len(line) <= 75 for line in lines))
+        unfolded = body.replace(b'\r\n ', b'').decode()
+        self.assertIn('SUMMARY:Warranty expires: Headphones\\, noise cancelling\\; WH-1000XM5 ' + 'é' * 40, unfolded)
+        self.assertEqual(
+            [line for line in unfolded.split('\r\n') if line.startswith('DTSTART')],
+            ['DTSTART;VALUE=DATE:20260115', 'DTSTART;VALUE=DATE:20270115'],
+        )
+        self.assertNotIn('VALARM', unfolded)
+
+        with_alarms = self.get_feed(self.urls['alarms_url']).content.decode()
+        self.assertEqual(with_alarms.count('BEGIN:VALARM'), 14)
+        self.assertIn('TRIGGER:-P30D', with_alarms)
+        self.assertNotEqual(self.get_feed(self.urls['alarms_url'])['ETag'], response['ETag'])
+
+    def test_revalidation(self):
+        etag = self.get_feed()['ETag']
+        with self.assertNumQueries(1):
+            response = self.get_feed(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.warranties[1].product_name = 'OLED TV'
+        self.warranties[1].save()
+        response = self.get_feed(**{'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'OLED TV', response.content)
+        edited = response['ETag']
+        self.assertNotEqual(edited, etag)
+
+        self.warranties[0].delete()
+        self.assertNotEqual(self.get_feed()['ETag'], edited)
+
+    def test_rotate_token(self):
+        old = self.urls['url']
+        rotated = self.client.post('/api/warranties/calendar/').json()
+        self.assertNotEqual(rotated['url'], old)
+        self.assertEqual(self.get_feed(old).status_code, 404)
+        self.assertEqual(self.get_feed(rotated['url']).status_code, 200)
+        self.assertEqual(CalendarFeed.objects.filter(user=self.user).count(), 1)
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Query-count and latency ceilings for the API endpoints, measured for a
+    user with hundreds of warranties and notifications. A failure lists the
+    SQL that ran; raise a budget only as a deliberate, reviewed decision.
+    """
+
+    WARRANTIES = 300
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='budget@example.com', name='Budget', password='pass12345')
+        other = User.objects.create_user(email='neighbour@example.com', name='Neighbour', password='pass12345')
+        today = date.today()
+        categories = [choice for choice, _ in Warranty.CATEGORY_CHOICES]
+        warranties = Warranty.objects.bulk_create([
+            Warranty(
+                user=owner, product_name=f'Product {i}', brand=f'Brand {i % 17}',
+                category=categories[i % len(categories)], purchase_date=date(2024, 1, 1),
+                warranty_period=12, expiry_date=today + timedelta(days=i - 100), notes='Bought online',
+            )
+            for owner, count in ((cls.user, cls.WARRANTIES), (other, 50))
+            for i in range(count)
+        ])
+        Notification.objects.bulk_create([
+            Notification(
+                user=warranty.user, warranty=warranty, notification_type=notification_type,
+                title=f'{warranty.product_name} expiring', message='Your warranty expires soon.',
+                is_read=i % 3 == 0,
+            )
+            for i, warranty in enumerate(warranties)
+            for notification_type in ('30_days', '10_days')
+        ])
+        repair_unread_counters([cls.user.pk, other.pk])
+        cls.warranty = warranties[0]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertWithinBudget(self, request, queries, seconds):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = request()
+            elapsed = time.perf_counter() - start
+        self.assertLess(response.status_code, 300, response.content[:500])
+        if len(captured) > queries:
+            sql = '\n'.join(f'  {i}. {query["sql"]}' for i, query in enumerate(captured.captured_queries, 1))
+            self.fail(f'{len(captured)} queries, budget is {queries}:\n{sql}')
+        self.assertLessEqual(elapsed, seconds, f'took {elapsed * 1000:.0f}ms, budget is {seconds * 1000:.0f}ms')
+        return response
+
+    def test_list(self):
+        response = self.assertWithinBudget(lambda: self.client.get('/api/warranties/'), queries=2, seconds=0.5)
+        self.assertEqual(response.json()['count'], self.WARRANTIES)
+
+    def test_retrieve(self):
+        response = self.assertWithinBudget(
+            lambda: self.client.get(f'/api/warranties/{self.warranty.pk}/'), queries=1, seconds=0.25
+        )
+        self.assertEqual(response.data['user_email'], self.user.email)
+
+    def test_create(self):
+        payload = {
+            'product_name': 'Kettle', 'brand': 'Bosch', 'category': 'Home Appliances',
+            'purchase_date': '2024-05-01', 'warranty_period': 24,
+        }
+        self.assertWithinBudget(
+            lambda: self.client.post('/api/warranties/', payload, format='json'), queries=1, seconds=0.25
+        )
+
+    def test_update(self):
+        self.assertWithinBudget(
+            lambda: self.client.patch(f'/api/warranties/{self.warranty.pk}/', {'warranty_period': 24}, format='json'),
+            queries=2, seconds=0.25
+        )
+        self.warranty.refresh_from_db()
+        self.assertEqual(self.warranty.expiry_date, date(2026, 1, 1))
+
+    def test_stats(self):
+        response = self.assertWithinBudget(lambda: self.client.get('/api/warranties/stats/'), queries=1, seconds=0.25)
+        self.assertEqual(response.json()['total_warranties'], self.WARRANTIES)
+        # Expiry dates run from 100 days ago to 199 days ahead
+        self.assertEqual(response.json()['expired_warranties'], 100)
+        self.assertEqual(response.json()['expiring_soon'], 31)
+        self.assertEqual(response.json()['active_warranties'], 169)
+
+    def test_share(self):
+        anonymous = APIClient()
+        self.assertWithinBudget(
+            lambda: anonymous.get(f'/api/share/{self.warranty.share_token}/'), queries=1, seconds=0.25
+        )
+        self.assertWithinBudget(
+            lambda: anonymous.get(f'/api/warranty/{self.warranty.pk}/'), queries=1, seconds=0.25
+        )
+
+    def test_notifications_list(self):
+        response = self.assertWithinBudget(lambda: self.client.get('/api/notifications/'), queries=1, seconds=1)
+        self.assertEqual(len(response.data), 2 * self.WARRANTIES)
+
+    def test_unread_count(self):
+        self.assertWithinBudget(lambda: self.client.get('/api/notifications/unread_count/'), queries=1, seconds=0.25)
+
+    def test_mark_all_read(self):
+        # Read ids, update them, adjust the counter, log the changes, plus the
+        # savepoint pair; SQLite's parameter limit splits the log insert in two
+        self.assertWithinBudget(lambda: self.client.post('/api/notifications/mark_all_read/'), queries=7, seconds=1)
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+
+class WarrantySaveTests(TestCase):
+    """save() recomputes expiry_date against the values the row was loaded with."""
+
+    def setUp(self):
+        user = User.objects.create_user(email='save@example.com', name='Save', password='pass12345')
+        self.warranty = Warranty.objects.create(
+            user=user, product_name='Kettle', brand='Bosch', category='Home Appliances',
+            purchase_date=date(2024, 1, 1), warranty_period=12,
+        )
+
+    def test_update_does_not_read_the_row_again(self):
+        warranty = Warranty.objects.get(pk=self.warranty.pk)
+        warranty.warranty_period = 24
+        with self.assertNumQueries(1):
+            warranty.save()
+        self.assertEqual(warranty.expiry_date, date(2026, 1, 1))
+        # The next save() compares against what was just saved
+        warranty.purchase_date = date(2024, 7, 1)
+        with self.assertNumQueries(1):
+            warranty.save()
+        self.assertEqual(Warranty.objects.get(pk=warranty.pk).expiry_date, date(2026, 7, 1))
+
+    def test_keeps_an_expiry_date_set_by_hand(self):
+        warranty = Warranty.objects.get(pk=self.warranty.pk)
+        warranty.warranty_period = 24
+        warranty.expiry_date = date(2030, 1, 1)
+        warranty.save()
+        self.assertEqual(Warranty.objects.get(pk=warranty.pk).expiry_date, date(2030, 1, 1))
+
+    def test_compares_against_the_refreshed_row(self):
+        warranty = Warranty.objects.get(pk=self.warranty.pk)
+        moved = {'purchase_date': date(2024, 7, 1), 'expiry_date': date(2025, 7, 1)}
+        for fields in (None, ['purchase_date', 'expiry_date']):
+            with self.subTest(fields=fields):
+                Warranty.objects.filter(pk=warranty.pk).update(warranty_period=12, **moved)
+                warranty.refresh_from_db(fields=fields)
+                warranty.warranty_period = 24
+                warranty.save()
+                self.assertEqual(warranty.expiry_date, date(2026, 7, 1))
+
+
+
+class SeedVaultTests(TestCase):
+    """seed_vault output depends only on --seed and --today."""
+
+    def seed(self, **options):
+        call_command(
+            'seed_vault', users=4, warranties_per_user=30, seed=3, today=date(2026, 1, 15),
+            stdout=io.StringIO(), **options
+        )
+        return list(
+            Warranty.objects.order_by('user__email', 'id')
+            .values_list('user__email', 'product_name', 'category', 'expiry_date', 'share_token', 'created_at')
+        ), sorted(Notification.objects.values_list('warranty__share_token', 'notification_type', 'is_read'))
+
+    def test_deterministic(self):
+        warranties, notifications = self.seed(batch_size=7)
+        self.assertEqual(len(warranties), 120)
+        self.assertTrue(notifications)
+        users = list(User.objects.values_list('pk', flat=True))
+        self.assertEqual(repair_unread_counters(users), 0)
+        self.assertEqual(sum(get_unread_counts(users).values()), Notification.objects.filter(is_read=False).count())
+
+        User.objects.all().delete()
+        self.assertEqual(self.seed(batch_size=10000), (warranties, notifications))
+
+    def test_rejects_out_of_range_options(self):
+        for option, value in (('users', 0), ('warranties_per_user', -1), ('batch_size', 0)):
+            with self.subTest(option=option), self.assertRaisesMessage(
+                CommandError, f'--{option.replace("_", "-")} must be at least {value + 1}'
+            ):
+                call_command('seed_vault', stdout=io.StringIO(), **{option: value})
+        self.assertFalse(Warranty.objects.exists())
+
+    @skipUnless(connection.vendor == 'postgresql', 'COPY is only used on PostgreSQL')
+    def test_copy_writes_the_same_rows_as_inserts(self):
+        self.assertTrue(VaultSeeder().uses_copy)
+        copied = self.seed()
+        User.objects.all().delete()
+        self.assertEqual(self.seed(no_copy=True), copied)
+
+
+class WarmUpTests(TestCase):
+    """The master-side warm-up must run cleanly without the database."""
+
+    def test_warm_up(self):
+        with self.assertNoLogs('warranty_vault.warmup', level='ERROR'), self.assertNumQueries(0):
+            stages = warm_up()
+        self.assertEqual(
+            list(stages), ['imports', 'urls', 'models', 'serializers', 'regex', 'templates', 'translations', 'auth']
+        )
+
+    def test_warm_up_database(self):
+        with self.assertNoLogs('warranty_vault.warmup', level='ERROR'):
+            self.assertEqual(list(warm_up_database()), ['connection', 'revocation_filter'])
+
+
+class ResponseEncodingTests(TestCase):
+    """orjson rendering matches DRF's; large bodies go out compressed."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='encoding@example.com', name='Encoding', password='pass12345')
+        for i in range(20):
+            Warranty.objects.create(
+                user=self.user, product_name=f'Item {i}', brand='Sony', category='Electronics',
+                purchase_date=date.today() - timedelta(days=30 * i), warranty_period=12,
+            )
+        self.auth = {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'token': uuid.uuid4(), 'day': date(2024, 2, 29), 'price': Decimal('19.99'), 1: 'key',
+            'utc': datetime(2024, 1, 1, 12, 30, 15, 250000, tzinfo=dt_timezone.utc),
+            'naive': datetime(2024, 1, 1, 12, 30), 'lazy': gettext_lazy('This field is required.'),
+            'separators': 'a\u2028b\u2029c', 'nested': [{'period': timedelta(days=1)}, (1, None, True)],
+        }
+        for media_type in (None, 'application/json; indent=2'):
+            self.assertEqual(FastJSONRenderer().render(data, media_type), JSONRenderer().render(data, media_type))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_renderer_handles_integers_beyond_64_bits(self):
+        data = {'big': 2 ** 64, 'small': -2 ** 63 - 1, 'nested': [{'id': 10 ** 30}]}
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(json.loads(FastJSONRenderer().render({'ratio': 1e-05})), {'ratio': 1e-05})
+
+    def test_compression(self):
+        identity = self.client.get('/api/warranties/', headers=self.auth)
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertIn('Accept-Encoding', identity['Vary'])
+
+        response = self.client.get('/api/warranties/', headers={**self.auth, 'Accept-Encoding': 'gzip, deflate, br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), identity.content)
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+
+        response = self.client.get('/api/warranties/', headers={**self.auth, 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), identity.content)
+
+        # Below RESPONSE_COMPRESSION_MIN_SIZE
+        response = self.client.get('/api/warranties/stats/', headers={**self.auth, 'Accept-Encoding': 'br'})
+        self.assertNotIn('Content-Encoding', response)
+
+    async def test_compression_async(self):
+        client = AsyncClient()
+        identity = await client.get('/api/warranties/', headers=self.auth)
+        response = await client.get('/api/warranties/', headers={**self.auth, 'Accept-Encoding': 'br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(brotli.decompress(response.content), identity.content)
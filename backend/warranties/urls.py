@@ -1,14 +1,25 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import async_views, views
 from .views import WarrantyViewSet, PublicWarrantyView
 
 router = DefaultRouter()
 router.register(r'warranties', WarrantyViewSet, basename='warranty')
 router.register(r'warranty', PublicWarrantyView, basename='public-warranty')
 
-urlpatterns = [
+urlpatterns = []
+if settings.ASYNC_READ_VIEWS:
+    # Ahead of the router, which still serves every other method and route
+    urlpatterns += [
+        path('warranties/', async_views.warranty_list, name='warranty-list'),
+        path('warranties/stats/', async_views.warranty_stats, name='warranty-stats'),
+        path('share/<uuid:share_token>/', async_views.public_warranty, name='public-warranty-share'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
     path('share/<uuid:share_token>/', views.public_warranty_view, name='public-warranty-share'),
+    path('calendar/<uuid:token>.ics', views.calendar_feed_view, name='calendar-feed'),
     path('cron/check-expiry/', views.check_expiry_cron, name='check-expiry-cron'),
 ]
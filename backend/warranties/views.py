@@ -1,10 +1,21 @@
 from rest_framework import viewsets, status, parsers, permissions
-from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes, throttle_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Count, Q
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
 from datetime import date, timedelta
-from .models import Warranty
+import uuid
+from warranty_vault.throttling import CronThrottle, PublicShareIPThrottle, ShareTokenThrottle
+from .ics import feed_state, render_feed
+from .models import CalendarFeed, Warranty
+from .services import RECEIPT_EXTENSIONS, get_file_extension, save_upload_to_temp, scan_receipts_stream
 from .serializers import (
     WarrantySerializer,
     WarrantyListSerializer,
@@ -13,6 +24,26 @@ from .serializers import (
 )
 
 
+def stats_aggregates(today):
+    """Aggregates for the dashboard counts, computed in one query."""
+    expiring_soon_date = today + timedelta(days=30)
+    return {
+        'total': Count('id'),
+        'expired': Count('id', filter=Q(expiry_date__lt=today)),
+        'expiring_soon': Count('id', filter=Q(expiry_date__gte=today, expiry_date__lte=expiring_soon_date)),
+    }
+
+
+def format_stats(counts):
+    total, expired, expiring_soon = counts['total'], counts['expired'], counts['expiring_soon']
+    return {
+        'total_warranties': total,
+        'active_warranties': total - expired - expiring_soon,
+        'expiring_soon': expiring_soon,
+        'expired_warranties': expired
+    }
+
+
 class WarrantyViewSet(viewsets.ModelViewSet):
     """
     ViewSet for warranty CRUD operations.
@@ -30,6 +61,20 @@ class WarrantyViewSet(viewsets.ModelViewSet):
         """Return warranties for the authenticated user only."""
         return Warranty.objects.filter(user=self.request.user)
     
+    def get_object(self):
+        warranty = super().get_object()
+        # Only the owner gets here: reuse request.user for user_email instead of a query
+        warranty.user = self.request.user
+        return warranty
+    
+    def list(self, request, *args, **kwargs):
+        """List from values_list() rows; see WarrantyListSerializer.serialize_values."""
+        queryset = self.filter_queryset(self.get_queryset()).values_list(*WarrantyListSerializer.value_fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(WarrantyListSerializer.serialize_values(page))
+        return Response(WarrantyListSerializer.serialize_values(queryset))
+    
     def get_serializer_class(self):
         """Return appropriate serializer based on action."""
         if self.action == 'list':
@@ -65,50 +110,42 @@ class WarrantyViewSet(viewsets.ModelViewSet):
         - Expiring soon (within 30 days)
         - Expired warranties
         """
-        user_warranties = self.get_queryset()
-        today = date.today()
-        expiring_soon_date = today + timedelta(days=30)
-        
-        total = user_warranties.count()
-        expired = user_warranties.filter(expiry_date__lt=today).count()
-        expiring_soon = user_warranties.filter(
-            expiry_date__gte=today,
-            expiry_date__lte=expiring_soon_date
-        ).count()
-        active = total - expired - expiring_soon
-        
-        return Response({
-            'total_warranties': total,
-            'active_warranties': active,
-            'expiring_soon': expiring_soon,
-            'expired_warranties': expired
-        })
+        counts = self.get_queryset().aggregate(**stats_aggregates(date.today()))
+        return Response(format_stats(counts))
+    
+    @action(detail=False, methods=['get', 'post'])
+    def calendar(self, request):
+        """
+        URLs of the user's calendar feed, created on first use.
+        POST replaces the token, which revokes every existing subscription.
+        """
+        feed, created = CalendarFeed.objects.get_or_create(user=request.user)
+        if request.method == 'POST' and not created:
+            feed.token = uuid.uuid4()
+            feed.save(update_fields=['token'])
+        url = request.build_absolute_uri(reverse('calendar-feed', args=[feed.token]))
+        return Response({'url': url, 'alarms_url': f'{url}?alarms=1'})
     
     @action(detail=False, methods=['post'], parser_classes=[parsers.MultiPartParser, parsers.FormParser])
     def scan_receipt(self, request):
         """Scan uploaded receipt and extract warranty information using OCR."""
         from .ocr_service import ReceiptOCRService
         import os
-        import tempfile
         
         if 'file' not in request.FILES:
             return Response({'error': 'No file uploaded'}, status=status.HTTP_400_BAD_REQUEST)
         
         uploaded_file = request.FILES['file']
-        allowed_extensions = ['jpg', 'jpeg', 'png', 'pdf', 'bmp', 'tiff']
-        file_ext = uploaded_file.name.split('.')[-1].lower()
+        file_ext = get_file_extension(uploaded_file)
         
-        if file_ext not in allowed_extensions:
+        if file_ext not in RECEIPT_EXTENSIONS:
             return Response(
-                {'error': f'Unsupported file type. Allowed: {", ".join(allowed_extensions)}'},
+                {'error': f'Unsupported file type. Allowed: {", ".join(RECEIPT_EXTENSIONS)}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=f'.{file_ext}') as temp_file:
-                for chunk in uploaded_file.chunks():
-                    temp_file.write(chunk)
-                temp_file_path = temp_file.name
+            temp_file_path = save_upload_to_temp(uploaded_file, file_ext)
             
             ocr_service = ReceiptOCRService()
             result = ocr_service.parse_receipt(temp_file_path, file_ext)
@@ -136,10 +173,53 @@ class WarrantyViewSet(viewsets.ModelViewSet):
                 {'error': f'Failed to process receipt: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+    
+    @action(detail=False, methods=['post'], parser_classes=[parsers.MultiPartParser, parsers.FormParser])
+    def scan_receipt_batch(self, request):
+        """
+        Scan several receipts in one request.
+        
+        Accepts any number of `files` parts (up to OCR_BATCH_MAX_FILES) and
+        streams back NDJSON: one line per file as soon as its OCR finishes,
+        then a summary line. Pass `create_drafts=true` to save results with
+        confidence >= `min_confidence` as warranties in one bulk insert.
+        """
+        uploaded_files = request.FILES.getlist('files')
+        if not uploaded_files:
+            return Response({'error': 'No files uploaded'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(uploaded_files) > settings.OCR_BATCH_MAX_FILES:
+            return Response(
+                {'error': f'Too many files. Maximum per batch: {settings.OCR_BATCH_MAX_FILES}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        create_drafts = str(request.data.get('create_drafts', '')).lower() in ('1', 'true', 'yes')
+        try:
+            min_confidence = int(request.data.get('min_confidence', settings.OCR_DRAFT_MIN_CONFIDENCE))
+        except (TypeError, ValueError):
+            return Response({'error': 'min_confidence must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            stream = scan_receipts_stream(
+                request.user, uploaded_files, create_drafts, min_confidence,
+                asynchronous=isinstance(request._request, ASGIRequest)
+            )
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to process receipts: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        response = StreamingHttpResponse(stream, content_type='application/x-ndjson')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
 
 @api_view(['GET', 'POST'])
 @permission_classes([AllowAny])
+@throttle_classes([CronThrottle])
 def check_expiry_cron(request):
     """
     Endpoint for external cron services to trigger warranty expiry checks.
@@ -170,6 +250,7 @@ def check_expiry_cron(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])  # No authentication required
+@throttle_classes([PublicShareIPThrottle, ShareTokenThrottle])
 def public_warranty_view(request, share_token):
     """Public view for shared warranty via QR code. No authentication required."""
     try:
@@ -183,6 +264,37 @@ def public_warranty_view(request, share_token):
         )
 
 
+@require_safe
+def calendar_feed_view(request, token):
+    """
+    iCalendar feed of a user's warranty expiries; the token is the only credential.
+    
+    A plain Django view: calendar apps may ask for text/calendar only, which
+    DRF's content negotiation would refuse. Not throttled per IP, since
+    calendar services fetch every subscriber's feed from a few addresses.
+    Unchanged feeds are answered 304 from a single query (see warranties.ics).
+    """
+    alarms = request.GET.get('alarms') in ('1', 'true')
+    state = feed_state(token, alarms)
+    if state is None:
+        return HttpResponse('Calendar not found\n', status=404, content_type='text/plain')
+    user_id, version = state
+    etag = f'"{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        key = f'calendar-feed:{version}'
+        body = cache.get(key)
+        if body is None:
+            body = render_feed(user_id, alarms)
+            cache.set(key, body, settings.CALENDAR_FEED_CACHE_SECONDS)
+        response = HttpResponse(body, content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="warranties.ics"'
+    response['ETag'] = etag
+    # Revalidate on every poll; unchanged feeds cost a 304
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 class PublicWarrantyView(viewsets.ReadOnlyModelViewSet):
     """
     Public view for warranty details (for QR code scanning).
@@ -190,6 +302,7 @@ class PublicWarrantyView(viewsets.ReadOnlyModelViewSet):
     """
     
     permission_classes = (AllowAny,)
+    throttle_classes = (PublicShareIPThrottle, ShareTokenThrottle)
     serializer_class = WarrantySerializer
-    queryset = Warranty.objects.all()
+    queryset = Warranty.objects.select_related('user')
     lookup_field = 'id'
@@ -1,5 +1,9 @@
 """
 ASGI config for warranty_vault project.
+
+Production runs this under gunicorn with uvicorn workers (see Procfile).
+The notification event stream is routed to its own lightweight handler so
+thousands of idle streams can share one worker.
 """
 
 import os
@@ -8,4 +12,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'warranty_vault.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from notifications.stream import STREAM_PATH, NotificationStreamHandler  # noqa: E402
+
+notification_stream_application = NotificationStreamHandler()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        await notification_stream_application(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,141 @@
+"""
+Async read views that answer exactly like their DRF counterparts.
+
+DRF 3.14 views are sync: under ASGI each request hops to a thread and
+holds it for the whole view. `async_api_view` runs the same
+authentication, permission and throttle classes (one hop, as they may hit
+the database or a shared cache), then the view itself awaits the async ORM
+and returns plain data, rendered with the API's JSON renderer on the event loop.
+Errors come out of DRF's exception handler, so bodies and headers match.
+
+These views only serve GET/HEAD; other methods on the same URL are passed to
+the `fallback` DRF view (e.g. POST warranties/ to WarrantyViewSet.create).
+"""
+
+from functools import wraps
+from types import SimpleNamespace
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .renderers import FastJSONRenderer
+
+
+renderer = FastJSONRenderer()
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        renderer.render(data), status=status, headers=headers, content_type=renderer.media_type
+    )
+
+
+def _check_request(request, view, permission_classes, throttle_classes):
+    """APIView.initial(): authenticate, check permissions, then throttles."""
+    request.user  # noqa: B018 - authenticates, raising on a bad token
+
+    for permission in (permission() for permission in permission_classes):
+        if not permission.has_permission(request, view):
+            if request.authenticators and not request.successful_authenticator:
+                raise exceptions.NotAuthenticated()
+            raise exceptions.PermissionDenied(getattr(permission, 'message', None))
+
+    waits = []
+    for throttle in (throttle() for throttle in throttle_classes):
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+    if waits:
+        raise exceptions.Throttled(max((wait for wait in waits if wait is not None), default=None))
+
+
+def _error_response(exc, request, view):
+    """APIView.handle_exception() + the configured exception handler."""
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        authenticators = request.authenticators
+        auth_header = authenticators[0].authenticate_header(request) if authenticators else None
+        if auth_header:
+            exc.auth_header = auth_header
+        else:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    context = {'request': request, 'view': view, 'args': view.args, 'kwargs': view.kwargs}
+    response = api_settings.EXCEPTION_HANDLER(exc, context)
+    if response is None:
+        raise exc
+    headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+    return json_response(response.data, status=response.status_code, headers=headers)
+
+
+def async_api_view(fallback=None, permission_classes=None, throttle_classes=None):
+    """
+    Turn `async def view(request, **kwargs) -> data` into a GET/HEAD endpoint.
+
+    `request` is a DRF Request (query_params, user); the view returns the
+    response data, or an HttpResponse for anything other than 200.
+    Permission and throttle classes default to the REST_FRAMEWORK settings,
+    like any DRF view.
+    """
+    def decorator(func):
+        if fallback is not None:
+            run_fallback = sync_to_async(fallback)
+
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                if fallback is not None:
+                    return await run_fallback(request, *args, **kwargs)
+                return json_response(
+                    {'detail': f'Method "{request.method}" not allowed.'},
+                    status=status.HTTP_405_METHOD_NOT_ALLOWED,
+                    headers={'Allow': ', '.join(SAFE_METHODS)},
+                )
+
+            drf_request = Request(
+                request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+            )
+            view_context = SimpleNamespace(args=args, kwargs=kwargs, request=drf_request)
+            try:
+                await sync_to_async(_check_request)(
+                    drf_request, view_context,
+                    api_settings.DEFAULT_PERMISSION_CLASSES if permission_classes is None else permission_classes,
+                    api_settings.DEFAULT_THROTTLE_CLASSES if throttle_classes is None else throttle_classes,
+                )
+                result = await func(drf_request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return _error_response(exc, drf_request, view_context)
+
+            if isinstance(result, HttpResponseBase):
+                return result
+            return json_response(result)
+
+        # Like every DRF view: JWT clients send no CSRF token
+        return csrf_exempt(view)
+    return decorator
+
+
+async def paginate(request, queryset, serialize):
+    """
+    The default pagination class's response for `queryset`, built from an
+    async count and an async fetch of just the requested page.
+    """
+    if api_settings.DEFAULT_PAGINATION_CLASS is None:
+        return serialize([row async for row in queryset])
+    paginator = api_settings.DEFAULT_PAGINATION_CLASS()
+    count = await queryset.acount()
+    # Paginate the row positions; that validates the page number and sets
+    # up next/previous links exactly as for the queryset itself.
+    positions = paginator.paginate_queryset(range(count), request)
+    if positions is None:
+        rows = [row async for row in queryset]
+    elif positions:
+        rows = [row async for row in queryset[positions[0]:positions[-1] + 1]]
+    else:
+        rows = []
+    data = serialize(rows)
+    return data if positions is None else paginator.get_paginated_response(data).data
@@ -0,0 +1,153 @@
+"""
+Read replica routing.
+
+With DATABASE_REPLICA_URLS set, the database reads made while serving one
+of REPLICA_READ_VIEWS with GET/HEAD go to a random replica. Everything
+else stays on `default`: writes, every other view, management commands
+(the expiry sweep among them) and user lookups, so a token issued at
+sign-up always authenticates.
+
+Replicas lag behind the primary. A request that writes pins its user to
+the primary for DATABASE_REPLICA_PIN_SECONDS, through the default cache so
+every worker sees it (use REDIS_URL with several workers), and later reads
+in the same request stay on the primary too. So a user always sees the
+warranty they just added.
+"""
+
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.functional import SimpleLazyObject
+
+
+REPLICA_READ_VIEWS = frozenset({
+    'warranty-list',
+    'warranty-detail',
+    'warranty-stats',
+    'public-warranty-share',
+    'public-warranty-detail',
+    'notification-list',
+})
+SAFE_METHODS = ('GET', 'HEAD')
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def authenticated_user(request):
+    """
+    The user DRF authenticated, if it has by now. Before that request.user is
+    AuthenticationMiddleware's lazy session user, which must not be evaluated
+    from inside a query.
+    """
+    user = request.__dict__.get('user')
+    if user is None or type(user) is SimpleLazyObject or not user.is_authenticated:
+        return None
+    return user
+
+
+class RequestState:
+    """What the router needs to know about the request being served."""
+
+    __slots__ = ('request', 'wrote', 'pinned')
+
+    def __init__(self, request):
+        self.request = request
+        self.wrote = False
+        self.pinned = None
+
+    def replica_allowed(self):
+        if self.wrote or self.request.method not in SAFE_METHODS:
+            return False
+        match = self.request.resolver_match
+        if match is None or match.view_name not in REPLICA_READ_VIEWS:
+            return False
+        if self.pinned is None:
+            user = self.request.__dict__.get('user')
+            if user is None or type(user) is SimpleLazyObject:
+                return False  # not authenticated yet
+            self.pinned = bool(user.is_authenticated and cache.get(pin_key(user.pk)))
+        return not self.pinned
+
+    def pin(self):
+        """Cache key to set if this request wrote on behalf of a user, else None."""
+        user = authenticated_user(self.request) if self.wrote else None
+        return pin_key(user.pk) if user is not None else None
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.replicas = list(settings.DATABASE_REPLICAS)
+        self.user_model = get_user_model()
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if (
+            self.replicas and state is not None and model is not self.user_model
+            and state.replica_allowed()
+        ):
+            return random.choice(self.replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaPinMiddleware:
+    """Gives the router the request, and pins users who wrote to the primary."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        key = state.pin()
+        if key is not None:
+            cache.set(key, True, settings.DATABASE_REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        state = RequestState(request)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        key = state.pin()
+        if key is not None:
+            await cache.aset(key, True, settings.DATABASE_REPLICA_PIN_SECONDS)
+        return response
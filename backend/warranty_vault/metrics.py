@@ -0,0 +1,311 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+MetricsMiddleware records, per resolved URL name and method, request
+latency, the number and total time of DB queries (counted through
+an execute_wrapper on every connection) and the response size. Each worker keeps the
+aggregates in memory: one lock and a handful of list increments per request.
+
+With several gunicorn workers, set METRICS_DIR to a directory shared by
+them. Every worker writes its totals there (pid-named JSON, replaced
+atomically at most every METRICS_FLUSH_SECONDS and at exit) and `/metrics`
+adds up all the files, so any worker can answer the scrape. Files of exited
+workers are kept so counters never go backwards; clear the directory when
+the service (re)starts.
+
+`/metrics` needs `Authorization: Bearer <METRICS_TOKEN>` or a staff user's
+JWT.
+"""
+
+import atexit
+import bisect
+import hmac
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from users.authentication import CachedJWTAuthentication
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+QUERY_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+COUNTERS = {
+    'http_requests_total': ('Requests handled, by view, method and status code', ('view', 'method', 'status')),
+}
+HISTOGRAMS = {
+    'http_request_duration_seconds': ('Time to produce the response', LATENCY_BUCKETS),
+    'http_request_db_queries': ('Database queries per request', QUERY_COUNT_BUCKETS),
+    'http_request_db_seconds': ('Time spent in database queries per request', QUERY_TIME_BUCKETS),
+    'http_response_size_bytes': ('Response body size (streaming responses excluded)', SIZE_BUCKETS),
+}
+HISTOGRAM_LABELS = ('view', 'method')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class QueryTimer:
+    """execute_wrapper that counts queries and the time spent in them."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """
+    Counters and histograms for this process.
+
+    Histograms are stored as [per-bucket counts..., +Inf count, sum], not
+    cumulative, so an observation touches two list slots.
+    """
+
+    def __init__(self, directory='', flush_interval=5):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.counters = {}
+            self.histograms = {}
+
+    def _observe(self, name, labels, value):
+        buckets = HISTOGRAMS[name][1]
+        key = (name, labels)
+        values = self.histograms.get(key)
+        if values is None:
+            values = self.histograms[key] = [0] * (len(buckets) + 2)
+        values[bisect.bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    def record_request(self, view, method, status, duration, queries, query_time, size=None):
+        labels = (view, method)
+        with self._lock:
+            key = ('http_requests_total', (view, method, str(status)))
+            self.counters[key] = self.counters.get(key, 0) + 1
+            self._observe('http_request_duration_seconds', labels, duration)
+            self._observe('http_request_db_queries', labels, queries)
+            self._observe('http_request_db_seconds', labels, query_time)
+            if size is not None:
+                self._observe('http_response_size_bytes', labels, size)
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def flush(self):
+        """Write this process's totals to METRICS_DIR (atomic replace)."""
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f'metrics-{os.getpid()}.json')
+        temp_path = f'{path}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump(self.snapshot(), f)
+            os.replace(temp_path, path)
+        except OSError:
+            # Metrics must never fail a request; the next flush retries
+            pass
+
+    def collect(self):
+        """Return the totals of every worker sharing METRICS_DIR (or just this one)."""
+        if not self.directory:
+            return [self.snapshot()]
+        self.flush()
+        snapshots = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return [self.snapshot()]
+        for name in names:
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+def merge_snapshots(snapshots):
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot['histograms']:
+            key = (name, tuple(labels))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = list(values)
+    return counters, histograms
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshots):
+    """Prometheus text exposition of the merged snapshots."""
+    counters, histograms = merge_snapshots(snapshots)
+    lines = []
+    for name, (help_text, label_names) in COUNTERS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{_format_labels(label_names, labels)} {value}')
+    for name, (help_text, buckets) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+        for (metric, labels), values in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets + ('+Inf',), values[:-1]):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f'{name}_bucket{_format_labels(HISTOGRAM_LABELS, labels, le)} {cumulative}')
+            label_text = _format_labels(HISTOGRAM_LABELS, labels)
+            lines.append(f'{name}_sum{label_text} {_format_number(values[-1])}')
+            lines.append(f'{name}_count{label_text} {cumulative}')
+    return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry(settings.METRICS_DIR, settings.METRICS_FLUSH_SECONDS)
+if registry.directory:
+    atexit.register(registry.flush)
+
+
+# Every connection carries one permanent wrapper that finds the current
+# request's timer through this context variable. That also covers async
+# views, whose queries run in threads asgiref starts for the request, on
+# connections opened there; and unlike connection.execute_wrapper() it
+# cannot leave timers behind when another wrapper is added mid-request.
+_request_timer = ContextVar('metrics_query_timer', default=None)
+
+
+def _time_query(execute, sql, params, many, context):
+    timer = _request_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def _attach_query_timer(sender, connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+connection_created.connect(_attach_query_timer, dispatch_uid='metrics_query_timer')
+
+
+class MetricsMiddleware:
+    """Records every request in `registry`; goes first in MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all():
+            _attach_query_timer(None, connection)  # opened before this module was loaded
+        timer = QueryTimer()
+        token = _request_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = _request_timer.set(timer)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_timer.reset(token)
+        self.record(request, response, time.perf_counter() - start, timer)
+        return response
+
+    @staticmethod
+    def record(request, response, duration, timer):
+        match = getattr(request, 'resolver_match', None)
+        registry.record_request(
+            view=match.view_name if match else 'unmatched',
+            method=request.method,
+            status=response.status_code,
+            duration=duration,
+            queries=timer.count,
+            query_time=timer.duration,
+            size=None if response.streaming else len(response.content),
+        )
+
+
+def is_authorized(request):
+    header = request.headers.get('Authorization', '')
+    if settings.METRICS_TOKEN and hmac.compare_digest(
+        header.encode(), f'Bearer {settings.METRICS_TOKEN}'.encode()
+    ):
+        return True
+    try:
+        result = CachedJWTAuthentication().authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return False
+    return result is not None and result[0].is_staff
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint."""
+    if not is_authorized(request):
+        response = HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(render(registry.collect()), content_type=CONTENT_TYPE)
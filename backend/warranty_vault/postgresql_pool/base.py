@@ -0,0 +1,199 @@
+"""
+PostgreSQL backend that reuses connections through a per-process pool.
+
+Django opens a connection per thread and, with CONN_MAX_AGE=0, closes it
+when the request ends. Under ASGI every request runs in a thread of its
+own, so persistent connections are never picked up again. This backend's
+close() hands the psycopg2 connection back to a pool instead, and the next
+request - in whichever thread - checks it out again without paying for
+TCP, TLS and authentication.
+
+DATABASES['default']['POOL'] sets `max_size` (connections per process,
+checked out or idle) and `timeout` (seconds to wait for a free one before
+the query fails with OperationalError). A connection idle for more than
+IDLE_CHECK_SECONDS is pinged before it is handed out; ones idle longer than
+MAX_IDLE_SECONDS or older than MAX_LIFETIME_SECONDS are closed, so the
+pool shrinks back after a burst and never holds a connection the server
+(or a proxy in front of it) has already dropped.
+
+A slot is normally given back when Django closes the connection at the end
+of a request. Some connections are never closed: Django's ASGI handler
+cancels the request when the client disconnects and skips
+request_finished, and nothing closes the connections of
+sync_to_async(thread_sensitive=False) calls. Each checked-out connection is
+therefore also tied to the lifetime of its DatabaseWrapper, which lives in
+the request's (or call's) context: once that is garbage-collected, the
+connection goes back to the pool.
+"""
+
+import threading
+import time
+import weakref
+from collections import deque
+
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base, creation
+from psycopg2 import extensions
+
+
+IDLE_CHECK_SECONDS = 5
+MAX_IDLE_SECONDS = 300
+MAX_LIFETIME_SECONDS = 3600
+
+
+class ConnectionPool:
+    """At most `max_size` connections, each checked out by one thread at a time."""
+
+    def __init__(self, max_size=10, timeout=10):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._idle = deque()  # (connection, created_at, returned_at), most recently returned last
+        self._created_at = {}  # id(connection) -> created_at, for checked-out connections
+
+    def getconn(self, connect):
+        """An idle connection that still works, or a new one from `connect()`."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise base.Database.OperationalError(
+                f'No database connection became free within {self.timeout}s '
+                f'(pool of {self.max_size}); raise DB_POOL_MAX_SIZE or DB_POOL_TIMEOUT'
+            )
+        try:
+            connection, created_at = self._reuse()
+            if connection is None:
+                connection, created_at = connect(), time.monotonic()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._created_at[id(connection)] = created_at
+        return connection
+
+    def _reuse(self):
+        while True:
+            with self._lock:
+                if not self._idle:
+                    return None, None
+                connection, created_at, returned_at = self._idle.pop()
+            now = time.monotonic()
+            if now - returned_at > MAX_IDLE_SECONDS or now - created_at > MAX_LIFETIME_SECONDS:
+                self._discard(connection)
+            elif now - returned_at > IDLE_CHECK_SECONDS and not self._ping(connection):
+                self._discard(connection)
+            else:
+                return connection, created_at
+
+    def putconn(self, connection, close=False):
+        """Return a checked-out connection; broken, dirty or old ones are closed."""
+        created_at = self._created_at.pop(id(connection), 0.0)
+        try:
+            now = time.monotonic()
+            if close or now - created_at > MAX_LIFETIME_SECONDS or not self._reset(connection):
+                self._discard(connection)
+                return
+            with self._lock:
+                self._idle.append((connection, created_at, now))
+                expired = []
+                while self._idle and now - self._idle[0][2] > MAX_IDLE_SECONDS:
+                    expired.append(self._idle.popleft()[0])
+            for stale in expired:
+                self._discard(stale)
+        finally:
+            self._slots.release()
+
+    def close_idle(self):
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    @property
+    def idle_count(self):
+        return len(self._idle)
+
+    @staticmethod
+    def _reset(connection):
+        """Leave the connection outside any transaction; False if that's not possible."""
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_IDLE:
+            return True
+        if status in (extensions.TRANSACTION_STATUS_INTRANS, extensions.TRANSACTION_STATUS_INERROR):
+            try:
+                connection.rollback()
+                return True
+            except base.Database.Error:
+                return False
+        return False
+
+    @staticmethod
+    def _ping(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except base.Database.Error:
+            return False
+
+    @staticmethod
+    def _discard(connection):
+        try:
+            connection.close()
+        except base.Database.Error:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(key, max_size=10, timeout=10):
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(key, ConnectionPool(max_size, timeout))
+    return pool
+
+
+def close_pools():
+    """Close every idle pooled connection in this process."""
+    for pool in list(_pools.values()):
+        pool.close_idle()
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Pooled connections to the test database would block DROP DATABASE
+        close_pools()
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    connection_pool = None
+    _pool_release = None
+
+    def get_new_connection(self, conn_params):
+        # The connection used to create and drop databases is not pooled
+        if self.alias == NO_DB_ALIAS:
+            self.connection_pool = None
+            return super().get_new_connection(conn_params)
+        options = self.settings_dict.get('POOL') or {}
+        self.connection_pool = get_pool((self.alias, repr(sorted(conn_params.items()))), **options)
+        connection = self.connection_pool.getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(conn_params)
+        )
+        # Returns the connection if this wrapper is dropped without closing it
+        self._pool_release = weakref.finalize(self, self.connection_pool.putconn, connection)
+        return connection
+
+    def _close(self):
+        if self.connection is None or self.connection_pool is None:
+            return super()._close()
+        self._pool_release.detach()
+        with self.wrap_database_errors:
+            # Closed inside atomic(), Django keeps referring to the connection
+            # until the block exits, so it can't go back to the pool.
+            self.connection_pool.putconn(self.connection, close=self.in_atomic_block)
@@ -0,0 +1,49 @@
+"""
+JSON rendering with orjson.
+
+DRF's JSONRenderer goes through the stdlib encoder and calls back into
+Python for every date, datetime, UUID and Decimal. orjson serializes
+dicts, lists, strings, numbers, dates, datetimes and UUIDs natively, about
+an order of magnitude faster on full warranty lists. Anything else
+(Decimal, lazy translations, querysets...) is handed to DRF's own encoder,
+so strings, dates and the rest come out as JSONRenderer writes them.
+
+Floats are the same numbers but not always the same text: orjson writes
+1e-05 as 0.00001 and 1e+16 as 1e16. NaN and infinity become null where
+DRF raises. Integers outside the 64-bit range, which orjson refuses, send
+the whole response through JSONRenderer.
+
+Without orjson installed, or when indented output is asked for (the
+browsable API, `Accept: application/json; indent=4`), it renders exactly
+like JSONRenderer.
+"""
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+# Datetimes in UTC end in "Z", like DRF's encoder writes them
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or not self.compact or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder.default, option=OPTIONS)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits; anything else fails the same way there
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped by JSONRenderer too, so the JSON is also valid JavaScript
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -50,8 +50,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'warranty_vault.metrics.MetricsMiddleware',  # First, so it times the whole chain
+    'warranty_vault.slow_queries.SlowQuerySourceMiddleware',
+    'warranty_vault.db_router.ReplicaPinMiddleware',  # Only active with DATABASE_REPLICA_URLS
+    'warranty_vault.middleware.CompressionMiddleware',  # Below metrics, which then count bytes sent
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Add WhiteNoise for static files
+    'warranty_vault.middleware.AsyncWhiteNoiseMiddleware',  # WhiteNoise for static files, async-capable
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -103,6 +107,40 @@ else:
         }
     }
 
+# Connection reuse. The Procfile serves ASGI, where each request runs in a
+# thread of its own and persistent connections are never picked up again;
+# there a per-process pool (warranty_vault/postgresql_pool) of
+# DB_POOL_MAX_SIZE connections does the reuse. Under WSGI, set
+# DB_POOL_MAX_SIZE=0 and DB_CONN_MAX_AGE instead. Behind pgbouncer in
+# transaction mode set DB_PGBOUNCER: server-side cursors (QuerySet.iterator())
+# don't survive a transaction-mode pooler.
+DB_POOL_MAX_SIZE = config('DB_POOL_MAX_SIZE', default=10, cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=float)
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=0, cast=int)
+DB_PGBOUNCER = config('DB_PGBOUNCER', default=False, cast=bool)
+
+
+# Read replicas (comma-separated URLs). The dashboard's and share links'
+# reads go to them, and users who just wrote stay on the primary for
+# DATABASE_REPLICA_PIN_SECONDS; see warranty_vault/db_router.py
+DATABASE_REPLICA_URLS = config('DATABASE_REPLICA_URLS', default='', cast=Csv())
+DATABASE_REPLICA_PIN_SECONDS = config('DATABASE_REPLICA_PIN_SECONDS', default=10, cast=int)
+DATABASE_REPLICAS = []
+for index, url in enumerate(DATABASE_REPLICA_URLS, 1):
+    DATABASES[f'replica_{index}'] = {**dj_database_url.parse(url), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica_{index}')
+DATABASE_ROUTERS = ['warranty_vault.db_router.ReplicaRouter']
+
+for database in DATABASES.values():
+    database.update(
+        CONN_MAX_AGE=DB_CONN_MAX_AGE,
+        CONN_HEALTH_CHECKS=True,
+        DISABLE_SERVER_SIDE_CURSORS=DB_PGBOUNCER,
+    )
+    if DB_POOL_MAX_SIZE and database['ENGINE'] == 'django.db.backends.postgresql':
+        database['ENGINE'] = 'warranty_vault.postgresql_pool'
+        database['POOL'] = {'max_size': DB_POOL_MAX_SIZE, 'timeout': DB_POOL_TIMEOUT}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -132,6 +170,11 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 # WhiteNoise configuration for production
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+# API responses of at least this many bytes are sent with brotli or gzip
+# (warranty_vault.middleware.CompressionMiddleware); static files are
+# compressed ahead of time by the storage above
+RESPONSE_COMPRESSION_MIN_SIZE = config('RESPONSE_COMPRESSION_MIN_SIZE', default=1024, cast=int)
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -150,15 +193,47 @@ AUTHENTICATION_BACKENDS = [
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson, same output as DRF's JSONRenderer (warranty_vault/renderers.py)
+    'DEFAULT_RENDERER_CLASSES': (
+        'warranty_vault.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
+    # Proxies in front of the app (Render/Railway router); used for client IPs
+    'NUM_PROXIES': config('NUM_PROXIES', default=1, cast=int),
+    # Rates for warranty_vault.throttling (AllowAny endpoints only)
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': config('THROTTLE_LOGIN_IP', default='20/min'),
+        'login_email': config('THROTTLE_LOGIN_EMAIL', default='5/min'),
+        'register_ip': config('THROTTLE_REGISTER_IP', default='10/hour'),
+        'token_refresh_ip': config('THROTTLE_TOKEN_REFRESH_IP', default='60/min'),
+        'share_ip': config('THROTTLE_SHARE_IP', default='60/min'),
+        'share_token': config('THROTTLE_SHARE_TOKEN', default='120/min'),
+        'cron': config('THROTTLE_CRON', default='12/hour'),
+        # Roughly what two workers can hash per second; beyond it login and
+        # register are shed with 503
+        'password_hashing': config('THROTTLE_PASSWORD_HASHING', default='6/s'),
+    },
 }
 
+# Shared cache for rate limit counters (and JWT_USER_CACHE_ALIAS if set).
+# Without REDIS_URL each worker process keeps its own counters.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='default')
+
 # JWT Settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
@@ -168,6 +243,57 @@ SIMPLE_JWT = {
     'UPDATE_LAST_LOGIN': True,
 }
 
+# Cached user lookup for JWT-authenticated requests (users.cache)
+JWT_USER_CACHE_TTL = config('JWT_USER_CACHE_TTL', default=300, cast=int)
+JWT_USER_CACHE_MAX_ENTRIES = config('JWT_USER_CACHE_MAX_ENTRIES', default=2048, cast=int)
+# Name of a CACHES alias shared by all workers (e.g. Redis); empty = per process only
+JWT_USER_CACHE_ALIAS = config('JWT_USER_CACHE_ALIAS', default='')
+
+# Revoked refresh tokens (users.revocation); purge with `purge_revoked_tokens`
+TOKEN_REVOCATION_BLOOM_CAPACITY = config('TOKEN_REVOCATION_BLOOM_CAPACITY', default=500000, cast=int)
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = config('TOKEN_REVOCATION_BLOOM_ERROR_RATE', default=0.001, cast=float)
+TOKEN_REVOCATION_SYNC_SECONDS = config('TOKEN_REVOCATION_SYNC_SECONDS', default=2, cast=float)
+TOKEN_REVOCATION_REBUILD_SECONDS = config('TOKEN_REVOCATION_REBUILD_SECONDS', default=3600, cast=float)
+
+# Notification event stream (notifications.stream, ASGI only)
+# Fallback poll for changes made by other processes (cron, other workers)
+NOTIFICATION_STREAM_POLL_SECONDS = config('NOTIFICATION_STREAM_POLL_SECONDS', default=15, cast=float)
+NOTIFICATION_STREAM_HEARTBEAT_SECONDS = config('NOTIFICATION_STREAM_HEARTBEAT_SECONDS', default=25, cast=float)
+NOTIFICATION_STREAM_RETRY_MS = config('NOTIFICATION_STREAM_RETRY_MS', default=5000, cast=int)
+# Lifetime of a single-use stream ticket; tickets live in the default cache,
+# which must be shared (Redis) when there is more than one worker
+NOTIFICATION_STREAM_TICKET_SECONDS = config('NOTIFICATION_STREAM_TICKET_SECONDS', default=30, cast=int)
+
+# Calendar feeds (/api/calendar/<token>.ics): how long a rendered feed is
+# cached; a change to the user's warranties makes it stale sooner
+CALENDAR_FEED_CACHE_SECONDS = config('CALENDAR_FEED_CACHE_SECONDS', default=86400, cast=int)
+
+# Notification retention (enforced by `manage.py compact_notifications`)
+NOTIFICATION_RETENTION_READ_DAYS = config('NOTIFICATION_RETENTION_READ_DAYS', default=90, cast=int)
+NOTIFICATION_RETENTION_EXPIRED_WARRANTY_DAYS = config('NOTIFICATION_RETENTION_EXPIRED_WARRANTY_DAYS', default=180, cast=int)
+NOTIFICATION_CHANGE_LOG_RETENTION_DAYS = config('NOTIFICATION_CHANGE_LOG_RETENTION_DAYS', default=30, cast=int)
+# Delta sync keeps its watermark below changes younger than this, so a
+# change id that commits out of order is not skipped
+NOTIFICATION_CHANGE_SETTLE_SECONDS = config('NOTIFICATION_CHANGE_SETTLE_SECONDS', default=5, cast=float)
+
+# Request metrics, scraped from /metrics (warranty_vault.metrics)
+# Directory shared by all workers of this instance; empty keeps per-process numbers
+METRICS_DIR = config('METRICS_DIR', default='')
+METRICS_FLUSH_SECONDS = config('METRICS_FLUSH_SECONDS', default=5, cast=float)
+# Bearer token for the scraper; staff users' JWTs are accepted as well
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Serve the hottest reads (warranty list and stats, share links, unread count)
+# with async views; needs the ASGI server. Turn off when running under WSGI.
+ASYNC_READ_VIEWS = config('ASYNC_READ_VIEWS', default=True, cast=bool)
+
+# Slow query capture (warranty_vault.slow_queries), read at /admin/slow-queries/
+SLOW_QUERY_LOG = config('SLOW_QUERY_LOG', default=False, cast=bool)
+SLOW_QUERY_THRESHOLD_MS = config('SLOW_QUERY_THRESHOLD_MS', default=100, cast=float)
+SLOW_QUERY_BUFFER_SIZE = config('SLOW_QUERY_BUFFER_SIZE', default=200, cast=int)
+# Directory shared by all workers and management commands; empty = per process only
+SLOW_QUERY_DIR = config('SLOW_QUERY_DIR', default='')
+
 # CORS Settings
 # In development, allow all origins; in production, specify allowed origins
 if DEBUG:
@@ -191,6 +317,18 @@ POPPLER_PATH = config('POPPLER_PATH', default='')
 # Cloud OCR Configuration (for production deployment)
 USE_CLOUD_OCR = config('USE_CLOUD_OCR', default=False, cast=bool)
 OCR_API_KEY = config('OCR_API_KEY', default='')
+OCR_API_URL = config('OCR_API_URL', default='https://api.ocr.space/parse/image')
+OCR_API_CONNECT_TIMEOUT = config('OCR_API_CONNECT_TIMEOUT', default=5, cast=float)
+OCR_API_READ_TIMEOUT = config('OCR_API_READ_TIMEOUT', default=30, cast=float)
+OCR_CLOUD_MAX_CONCURRENCY = config('OCR_CLOUD_MAX_CONCURRENCY', default=4, cast=int)
+OCR_CLOUD_MAX_DIMENSION = config('OCR_CLOUD_MAX_DIMENSION', default=2000, cast=int)
+OCR_CIRCUIT_FAILURE_THRESHOLD = config('OCR_CIRCUIT_FAILURE_THRESHOLD', default=5, cast=int)
+OCR_CIRCUIT_RESET_SECONDS = config('OCR_CIRCUIT_RESET_SECONDS', default=60, cast=int)
+
+# Batch receipt scanning (/api/warranties/scan_receipt_batch/)
+OCR_BATCH_MAX_FILES = config('OCR_BATCH_MAX_FILES', default=25, cast=int)
+OCR_BATCH_WORKERS = config('OCR_BATCH_WORKERS', default=4, cast=int)
+OCR_DRAFT_MIN_CONFIDENCE = config('OCR_DRAFT_MIN_CONFIDENCE', default=70, cast=int)
 
 # Email Configuration
 
@@ -0,0 +1,325 @@
+"""
+Slow query capture.
+
+With SLOW_QUERY_LOG on, every database connection gets an execute_wrapper
+that times each statement; statements slower than SLOW_QUERY_THRESHOLD_MS
+go to a bounded ring buffer (SLOW_QUERY_BUFFER_SIZE entries per process)
+with their normalized SQL, the shape of their parameters (types only, never
+values), the duration, the view or management command that ran them and
+the first frame of project code on the stack. Fast statements cost two
+perf_counter() calls.
+
+Staff read the buffer at /admin/slow-queries/ and with
+`manage.py slow_queries`, which can also run a command under capture
+(`manage.py slow_queries --run check_warranty_expiry`). Like the metrics,
+workers only see their own buffer unless SLOW_QUERY_DIR points at a
+directory they share.
+"""
+
+import atexit
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import asgiref
+import django
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.shortcuts import render
+
+
+SQL_MAX_LENGTH = 2000
+
+_source = ContextVar('slow_query_source', default=None)
+
+_WHITESPACE = re.compile(r'\s+')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%s(?:, %s)+')
+_ROWS = re.compile(r'(\([^()]*\))(?:, \1)+')
+
+_PROJECT_DIR = str(settings.BASE_DIR) + os.sep
+# Middleware and other plumbing: on every request's stack, so never the answer
+_PLUMBING_DIR = os.path.dirname(os.path.abspath(__file__)) + os.sep
+_DJANGO_DIR = os.path.dirname(os.path.abspath(django.__file__)) + os.sep
+_ASGIREF_DIR = os.path.dirname(os.path.abspath(asgiref.__file__)) + os.sep
+_LIBRARY_DIR = os.path.dirname(os.path.dirname(_DJANGO_DIR)) + os.sep
+
+
+def normalize(sql):
+    """SQL with literals replaced and IN lists / VALUES rows collapsed, for grouping."""
+    sql = _WHITESPACE.sub(' ', sql).strip()
+    sql = _STRING.sub('%s', sql)
+    sql = _NUMBER.sub('%s', sql)
+    sql = _WHITESPACE.sub(' ', sql.replace(' ,', ',').replace(',', ', '))
+    sql = _PLACEHOLDERS.sub('%s, ...', sql)
+    return _ROWS.sub(r'\1, ...', sql)
+
+
+def _type_list(values):
+    names = []
+    for value in values:
+        name = type(value).__name__
+        if names and names[-1][0] == name:
+            names[-1][1] += 1
+        else:
+            names.append([name, 1])
+    return ', '.join(name if count == 1 else f'{name} x{count}' for name, count in names)
+
+
+def params_shape(params, many=False):
+    """Types of the parameters, e.g. '(int, str x3)' or '500 x (int, str)'."""
+    if params is None:
+        return '-'
+    if many:
+        rows = list(params) if not isinstance(params, (list, tuple)) else params
+        return f'{len(rows)} x {params_shape(rows[0])}' if rows else '0 rows'
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{key}: {type(value).__name__}' for key, value in params.items()) + '}'
+    return f'({_type_list(params)})'
+
+
+def _describe(frame, base):
+    return f'{frame.f_code.co_filename[len(base):]}:{frame.f_lineno} in {frame.f_code.co_name}'
+
+
+def calling_frame():
+    """
+    'path.py:line in function' of the innermost frame outside Django and
+    the middleware. When that is library code (e.g. DRF's ListModelMixin for
+    a view that doesn't override list()), the nearest project frame is added.
+    """
+    library = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith((_PLUMBING_DIR, _DJANGO_DIR, _ASGIREF_DIR)):
+            pass
+        elif filename.startswith(_PROJECT_DIR) and 'site-packages' not in filename:
+            if library:
+                return f'{library} via {_describe(frame, _PROJECT_DIR)}'
+            return _describe(frame, _PROJECT_DIR)
+        elif library is None and filename.startswith(_LIBRARY_DIR):
+            library = _describe(frame, _LIBRARY_DIR)
+        frame = frame.f_back
+    return library or '-'
+
+
+def current_source():
+    source = _source.get()
+    if isinstance(source, str):
+        return source
+    if source is not None:
+        # The request; its URL is resolved by the time it queries anything
+        match = getattr(source, 'resolver_match', None)
+        return f'{source.method} {match.view_name if match else source.path}'
+    if len(sys.argv) > 1 and os.path.basename(sys.argv[0]) == 'manage.py':
+        return f'manage.py {sys.argv[1]}'
+    return '-'
+
+
+class SlowQueryLog:
+    """execute_wrapper keeping the last `size` statements slower than `threshold_ms`."""
+
+    def __init__(self, threshold_ms=100, size=200, directory='', flush_interval=5):
+        self.threshold = threshold_ms / 1000
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+        self._dirty = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.record(sql, params, many, duration, context['connection'].alias)
+
+    def record(self, sql, params, many, duration, alias='default'):
+        entry = {
+            'at': time.time(),
+            'duration_ms': round(duration * 1000, 3),
+            'sql': sql if len(sql) <= SQL_MAX_LENGTH else sql[:SQL_MAX_LENGTH] + '...',
+            'normalized': normalize(sql),
+            'params': params_shape(params, many),
+            'source': current_source(),
+            'frame': calling_frame(),
+            'database': alias,
+            'pid': os.getpid(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+            self._dirty = True
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def entries(self):
+        """This process's entries, newest first."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._dirty = True
+        if self.directory:
+            self.flush()
+            for name in self._files():
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _files(self):
+        try:
+            return [
+                name for name in os.listdir(self.directory)
+                if name.startswith('slow-queries-') and name.endswith('.json')
+            ]
+        except OSError:
+            return []
+
+    def flush(self):
+        """Write this process's buffer to SLOW_QUERY_DIR (atomic replace)."""
+        self._last_flush = time.monotonic()
+        if not self._dirty:
+            return
+        path = os.path.join(self.directory, f'slow-queries-{os.getpid()}.json')
+        temp_path = f'{path}.tmp'
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp_path, 'w') as f:
+                json.dump(self.entries(), f)
+            os.replace(temp_path, path)
+            self._dirty = False
+        except OSError:
+            pass
+
+    def collect(self):
+        """Entries of every process sharing SLOW_QUERY_DIR (or just this one), newest first."""
+        if not self.directory:
+            return self.entries()
+        self.flush()
+        entries = []
+        for name in self._files():
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    entries.extend(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(entries, key=lambda entry: entry['at'], reverse=True)
+
+
+def summarize(entries):
+    """Entries grouped by normalized SQL, biggest total time first."""
+    groups = {}
+    for entry in entries:
+        group = groups.get(entry['normalized'])
+        if group is None:
+            group = groups[entry['normalized']] = {
+                'normalized': entry['normalized'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                'sources': set(), 'frames': set(),
+            }
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+        group['sources'].add(entry['source'])
+        group['frames'].add(entry['frame'])
+    for group in groups.values():
+        group['sources'] = sorted(group['sources'])
+        group['frames'] = sorted(group['frames'])
+    return sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+
+
+log = SlowQueryLog(
+    settings.SLOW_QUERY_THRESHOLD_MS, settings.SLOW_QUERY_BUFFER_SIZE, settings.SLOW_QUERY_DIR,
+)
+
+
+def _attach(sender, connection, **kwargs):
+    if log not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log)
+
+
+def install():
+    """Attach the log to every connection when SLOW_QUERY_LOG is on (called at startup)."""
+    if settings.SLOW_QUERY_LOG:
+        connection_created.connect(_attach, dispatch_uid='slow_query_log')
+        if log.directory:
+            atexit.register(log.flush)
+
+
+@contextmanager
+def capture(threshold_ms=None, source=None):
+    """Record slow queries inside the block even when SLOW_QUERY_LOG is off."""
+    previous = log.threshold
+    if threshold_ms is not None:
+        log.threshold = threshold_ms / 1000
+    token = _source.set(source) if source else None
+    # Not connection.execute_wrapper(): that pops the last wrapper, which is
+    # someone else's if a connection is opened (and wrapped) inside the block.
+    added = [connection for connection in connections.all() if log not in connection.execute_wrappers]
+    for connection in added:
+        connection.execute_wrappers.append(log)
+    try:
+        yield log
+    finally:
+        for connection in added:
+            connection.execute_wrappers.remove(log)
+        log.threshold = previous
+        if token is not None:
+            _source.reset(token)
+
+
+class SlowQuerySourceMiddleware:
+    """Tags slow queries with the method and URL name of the request that ran them."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _source.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _source.reset(token)
+
+    async def __acall__(self, request):
+        token = _source.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _source.reset(token)
+
+
+@staff_member_required
+def slow_queries_view(request):
+    """Admin page listing the captured statements, grouped and most recent."""
+    entries = log.collect()
+    return render(request, 'admin/slow_queries.html', {
+        'title': 'Slow queries',
+        'enabled': settings.SLOW_QUERY_LOG,
+        'threshold_ms': log.threshold * 1000,
+        'groups': summarize(entries),
+        'entries': entries[:100],
+    })
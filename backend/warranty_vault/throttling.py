@@ -0,0 +1,205 @@
+"""
+Rate limiting and load shedding for the unauthenticated endpoints.
+
+Counters are sliding windows approximated from two fixed-window counters
+(current and previous) stored in the THROTTLE_CACHE_ALIAS cache, so a check
+costs one get_many() and an allowed request one add() + incr(). Point that
+alias at a cache shared by every worker (REDIS_URL) for deployment-wide
+limits; with the default in-process cache each worker counts on its own.
+
+Rates live in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] under each class's
+`scope`. Over-limit requests get 429 with Retry-After. The password hashing
+budget is shared by login and register and answers 503 instead: it protects
+the worker CPU, not any one account, and is checked before any hashing.
+"""
+
+import math
+import time
+
+from django.core.cache import caches
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class ServiceBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server is busy, please retry shortly.'
+    default_code = 'service_busy'
+
+    def __init__(self, wait=None):
+        super().__init__()
+        self.wait = wait
+
+
+class SlidingWindowCounter:
+    """Approximate sliding-window request counter on top of a Django cache."""
+
+    def __init__(self, cache, key, limit, duration, timer=time.time):
+        self.cache = cache
+        self.key = key
+        self.limit = limit
+        self.duration = duration
+        self.timer = timer
+
+    def _keys(self, now):
+        window = int(now // self.duration)
+        return f'{self.key}:{window}', f'{self.key}:{window - 1}', (now % self.duration) / self.duration
+
+    def hit(self):
+        """
+        Count a request if it fits in the window.
+
+        Returns 0 when allowed, otherwise the seconds to wait. Rejected
+        requests are not counted, so a client that backs off gets through
+        again once its earlier requests slide out of the window.
+        """
+        now = self.timer()
+        current_key, previous_key, elapsed = self._keys(now)
+        counts = self.cache.get_many([current_key, previous_key])
+        current = counts.get(current_key, 0)
+        previous = counts.get(previous_key, 0)
+
+        if previous * (1 - elapsed) + current >= self.limit:
+            return self._wait(current, previous, elapsed)
+
+        self.cache.add(current_key, 0, timeout=self.duration * 2)
+        try:
+            self.cache.incr(current_key)
+        except ValueError:
+            # Expired between add() and incr()
+            self.cache.set(current_key, 1, timeout=self.duration * 2)
+        return 0
+
+    def _wait(self, current, previous, elapsed):
+        remaining = (1 - elapsed) * self.duration
+        if current >= self.limit or not previous:
+            return remaining
+        # Time until the previous window's weight drops enough to fit one more
+        fraction = 1 - (self.limit - current) / previous
+        return max(fraction - elapsed, 0) * self.duration or remaining
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle that counts with a SlidingWindowCounter.
+
+    Subclasses set `scope` and implement get_cache_key(); returning None
+    skips the check.
+    """
+
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        self.cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        self._wait = 0
+
+    def get_rate(self):
+        # Read the rates at request time (not import time) so overrides apply
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        counter = SlidingWindowCounter(self.cache, key, self.num_requests, self.duration)
+        self._wait = counter.hit()
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class ClientIPThrottle(SlidingWindowThrottle):
+    """Per client IP (honours REST_FRAMEWORK['NUM_PROXIES'])."""
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginIPThrottle(ClientIPThrottle):
+    scope = 'login_ip'
+
+
+class LoginEmailThrottle(SlidingWindowThrottle):
+    """Per submitted email, so one account can't be guessed at from many IPs."""
+
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': email.strip().lower()}
+
+
+class RegisterIPThrottle(ClientIPThrottle):
+    scope = 'register_ip'
+
+
+class TokenRefreshIPThrottle(ClientIPThrottle):
+    scope = 'token_refresh_ip'
+
+
+class PublicShareIPThrottle(ClientIPThrottle):
+    scope = 'share_ip'
+
+
+class ShareTokenThrottle(SlidingWindowThrottle):
+    """Per share token, whoever is scanning the QR code."""
+
+    scope = 'share_token'
+
+    def get_cache_key(self, request, view):
+        token = view.kwargs.get('share_token') or view.kwargs.get('id')
+        if token is None:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': token}
+
+
+class CronThrottle(SlidingWindowThrottle):
+    """One global budget for the expiry-check trigger."""
+
+    scope = 'cron'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': 'global'}
+
+
+class PasswordHashingBudget(SlidingWindowThrottle):
+    """
+    Deployment-wide budget of password hashes per period.
+
+    Don't list it in throttle_classes: DRF runs every throttle before
+    raising, so requests the per-client throttles reject would still spend
+    it. Views use HashingBudgetMixin instead. When the budget is spent the
+    request is shed with 503 before any hashing starts.
+    """
+
+    scope = 'password_hashing'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': 'global'}
+
+    def allow_request(self, request, view):
+        if not super().allow_request(request, view):
+            raise ServiceBusy(wait=math.ceil(self._wait))
+        return True
+
+
+class HashingBudgetMixin:
+    """
+    For views that hash passwords: charge PasswordHashingBudget only for
+    requests the view's own throttles let through, so one client over its
+    limit can't spend the budget everyone shares.
+    """
+
+    def check_throttles(self, request):
+        super().check_throttles(request)
+        PasswordHashingBudget().allow_request(request, self)
@@ -6,6 +6,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.http import JsonResponse
+from .metrics import metrics_view
+from .slow_queries import slow_queries_view
 
 def api_root(request):
     """Root API endpoint providing information about available endpoints"""
@@ -29,7 +31,9 @@ def api_root(request):
 
 urlpatterns = [
     path('', api_root, name='api-root'),
+    path('admin/slow-queries/', slow_queries_view, name='slow-queries'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api/auth/', include('users.urls')),
     path('api/', include('warranties.urls')),
     path('api/notifications/', include('notifications.urls')),
@@ -0,0 +1,163 @@
+"""
+Worker warm-up.
+
+A fresh process only imports what Django's setup needs. The URL
+resolver, every view and serializer module, DRF's field mappings, the
+translation catalogs and the templates are loaded by whichever requests
+come first, and those requests pay tens of milliseconds each for it.
+`warm_up()` does that work up front. It never touches the database, so
+gunicorn.conf.py runs it in the master before forking (with preload_app),
+and the workers share the result copy-on-write.
+`warm_up_database()` is the per-worker part: it opens the first connection
+and loads the token revocation filter.
+
+Each returns {stage: seconds}; a failing stage is logged and skipped, since
+warming up must never keep a worker from starting.
+"""
+
+import importlib
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.template.loader import get_template
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+from rest_framework import serializers
+
+
+logger = logging.getLogger(__name__)
+
+# Imported inside functions so the app starts without them
+# (ocr_service is absent while OCR is disabled)
+DEFERRED_MODULES = (
+    'warranties.ocr_service',
+    'warranties.receipt_parser',
+    'warranties.cloud_ocr',
+    'django.contrib.admin.views.main',
+)
+TEMPLATES = ('admin/slow_queries.html', 'admin/index.html', 'admin/login.html')
+SAMPLE_RECEIPT = 'BEST BUY\nSony WH-1000XM5 Headphones\nBrand: Sony\n01/15/2024\nTotal $349.99\n2 year warranty'
+
+
+def _imports():
+    for name in DEFERRED_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+
+
+def _walk(patterns):
+    for pattern in patterns:
+        yield pattern
+        if isinstance(pattern, URLResolver):
+            yield from _walk(pattern.url_patterns)
+
+
+def _urls():
+    """Import every view and compile every URL pattern's regex."""
+    resolver = get_resolver()
+    resolver.reverse_dict  # noqa: B018 - populates the reverse lookup tables
+    for pattern in _walk(resolver.url_patterns):
+        pattern.pattern.regex  # noqa: B018 - compiled and cached on first access
+
+
+def _serializers():
+    """Build the fields of every project serializer (DRF does it per model field on first use)."""
+    for config in apps.get_app_configs():
+        if not config.path.startswith(str(settings.BASE_DIR)):
+            continue
+        try:
+            module = importlib.import_module(f'{config.name}.serializers')
+        except ImportError:
+            continue
+        for value in vars(module).values():
+            if (
+                isinstance(value, type) and issubclass(value, serializers.BaseSerializer)
+                and value.__module__ == module.__name__
+            ):
+                value().fields  # noqa: B018
+
+
+def _models():
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def _regex():
+    from warranties.receipt_parser import CompiledReceiptParser, ReceiptTextParser
+
+    # ReceiptTextParser goes through re's own cache of compiled patterns
+    CompiledReceiptParser().extract(SAMPLE_RECEIPT)
+    ReceiptTextParser().extract(SAMPLE_RECEIPT)
+
+
+def _templates():
+    for name in TEMPLATES:
+        get_template(name)
+
+
+def _translations():
+    # Loads the gettext catalogs of every app, used by DRF's error messages
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('This field is required.')
+
+
+def _auth():
+    get_hasher()
+    from rest_framework_simplejwt.state import token_backend  # noqa: F401
+
+
+def _run(stages):
+    timings = {}
+    for name, stage in stages:
+        start = time.perf_counter()
+        try:
+            stage()
+        except Exception:
+            logger.exception('Warm-up stage %s failed', name)
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def warm_up():
+    """Load and build everything first requests would; no database access."""
+    return _run([
+        ('imports', _imports),
+        ('urls', _urls),
+        ('models', _models),
+        ('serializers', _serializers),
+        ('regex', _regex),
+        ('templates', _templates),
+        ('translations', _translations),
+        ('auth', _auth),
+    ])
+
+
+def _connection():
+    from django.db import connection
+
+    connection.ensure_connection()
+
+
+def _revocation_filter():
+    from users.revocation import revocation_store
+
+    revocation_store.is_revoked('warm-up')
+
+
+def warm_up_database():
+    """Per-worker warm-up that needs the database; call after forking."""
+    from django.db import close_old_connections
+
+    try:
+        return _run([
+            ('connection', _connection),
+            ('revocation_filter', _revocation_filter),
+        ])
+    finally:
+        # Back to the pool (or closed), like at the end of a request
+        close_old_connections()
@@ -25,13 +25,77 @@ export default function NotificationBell() {
         }
     };
 
-    // Initial fetch
+    // Initial fetch, then live updates from the event stream
     useEffect(() => {
         fetchNotifications();
 
-        // Poll for new notifications every 5 minutes
-        const interval = setInterval(fetchNotifications, 5 * 60 * 1000);
-        return () => clearInterval(interval);
+        let stream = null;
+        let fallback = null;
+        let closed = false;
+        let retryDelay = 5 * 1000;
+
+        // Catch up by polling, then reconnect with a new ticket (fetching
+        // one also refreshes an expired token), backing off up to a minute
+        // while that keeps failing.
+        const scheduleReconnect = () => {
+            if (fallback) {
+                return;
+            }
+            fallback = setTimeout(async () => {
+                await fetchNotifications();
+                fallback = null;
+                connect();
+            }, retryDelay);
+            retryDelay = Math.min(retryDelay * 2, 60 * 1000);
+        };
+
+        const connect = async () => {
+            const opened = await notificationService.openStream();
+            if (closed) {
+                if (opened) {
+                    opened.close();
+                }
+                return;
+            }
+            stream = opened;
+            if (!stream) {
+                // No ticket (or no EventSource support): keep polling instead
+                scheduleReconnect();
+                return;
+            }
+            stream.onopen = () => {
+                retryDelay = 5 * 1000;
+            };
+            stream.addEventListener('notification', (event) => {
+                const notification = JSON.parse(event.data);
+                setNotifications((current) => [
+                    notification,
+                    ...current.filter((item) => item.id !== notification.id),
+                ]);
+            });
+            stream.addEventListener('unread_count', (event) => {
+                setUnreadCount(JSON.parse(event.data).count);
+            });
+            stream.onerror = () => {
+                // The browser retries dropped connections by itself, but a
+                // ticket opens one stream only, so a retry is refused and the
+                // stream closes.
+                if (stream.readyState === EventSource.CLOSED) {
+                    scheduleReconnect();
+                }
+            };
+        };
+
+        connect();
+        return () => {
+            closed = true;
+            if (stream) {
+                stream.close();
+            }
+            if (fallback) {
+                clearTimeout(fallback);
+            }
+        };
     }, []);
 
     // Close dropdown when clicking outside
@@ -43,8 +43,12 @@ api.interceptors.response.use(
                         refresh: refreshToken,
                     });
 
-                    const { access } = response.data;
+                    const { access, refresh } = response.data;
                     localStorage.setItem('access_token', access);
+                    // Refresh tokens are single-use: keep the rotated one
+                    if (refresh) {
+                        localStorage.setItem('refresh_token', refresh);
+                    }
 
                     // Retry the original request with new token
                     originalRequest.headers.Authorization = `Bearer ${access}`;
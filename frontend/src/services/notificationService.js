@@ -1,4 +1,4 @@
-import api from '../config/api';
+import api, { API_BASE_URL } from '../config/api';
 
 const notificationService = {
     /**
@@ -40,6 +40,38 @@ const notificationService = {
         }
     },
 
+    /**
+     * Get notifications changed since a watermark returned by a previous call.
+     * Resolves to null when nothing changed. A watermark older than the
+     * server's change log (410) falls back to a full sync.
+     */
+    getChanges: async (since) => {
+        try {
+            const params = since === undefined || since === null ? {} : { since };
+            const response = await api.get('/notifications/changes/', { params });
+            return response.status === 204 ? null : response.data;
+        } catch (error) {
+            if (error.response?.status === 410) {
+                return notificationService.getChanges(null);
+            }
+            console.error('Failed to fetch notification changes:', error);
+            throw error;
+        }
+    },
+
+    /**
+     * Mark several notifications as read in one request
+     */
+    markManyAsRead: async (ids) => {
+        try {
+            const response = await api.post('/notifications/mark_read/', { ids });
+            return response.data;
+        } catch (error) {
+            console.error('Failed to mark notifications as read:', error);
+            throw error;
+        }
+    },
+
     /**
      * Mark all notifications as read
      */
@@ -53,6 +85,27 @@ const notificationService = {
         }
     },
 
+    /**
+     * Open the server-sent events stream of new notifications and unread
+     * count changes. EventSource cannot send headers, so the stream is
+     * opened with a single-use ticket rather than the access token, which
+     * would end up in server logs.
+     */
+    openStream: async () => {
+        if (!localStorage.getItem('access_token') || typeof EventSource === 'undefined') {
+            return null;
+        }
+        try {
+            const response = await api.post('/notifications/stream_ticket/');
+            return new EventSource(
+                `${API_BASE_URL}/notifications/stream/?ticket=${encodeURIComponent(response.data.ticket)}`
+            );
+        } catch (error) {
+            console.error('Failed to open notification stream:', error);
+            return null;
+        }
+    },
+
     /**
      * Clear all read notifications
      */